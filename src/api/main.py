@@ -1,12 +1,18 @@
 """
 FastAPI应用主入口
 """
+import time
+
+# 记录进程开始导入应用的时间，用于统计启动到开始监听的耗时
+_import_start = time.perf_counter()
+
+import asyncio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import os
 from dotenv import load_dotenv
 
-from src.api.routes import router, initialize_rag_engine
+from src.api.routes import router, initialize_rag_engine, record_time_to_listen
 
 load_dotenv()
 
@@ -31,7 +37,7 @@ app.include_router(router)
 
 @app.on_event("startup")
 async def startup_event():
-    """应用启动时初始化RAG引擎"""
+    """应用启动时初始化RAG引擎（只登记数据库），模型和数据库在后台预热"""
     config_path = os.getenv("DATABASE_CONFIG_PATH", "config/database_config.yaml")
     use_local_model = os.getenv("USE_LOCAL_MODEL", "false").lower() == "true"
     model_name = os.getenv("MODEL_NAME", "gpt-3.5-turbo")
@@ -45,12 +51,25 @@ async def startup_event():
         print("RAG引擎初始化成功")
     except Exception as e:
         print(f"RAG引擎初始化失败: {str(e)}")
+    
+    from src.api.routes import rag_engine
+    if rag_engine:
+        # 保存任务引用，避免预热任务被垃圾回收
+        app.state.warmup_task = asyncio.create_task(rag_engine.warmup())
+    
+    # 启动事件结束后uvicorn即开始监听端口
+    time_to_listen = time.perf_counter() - _import_start
+    record_time_to_listen(time_to_listen)
+    print(f"服务启动耗时: {time_to_listen:.2f} 秒")
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """应用关闭时清理资源"""
     from src.api.routes import rag_engine
+    warmup_task = getattr(app.state, "warmup_task", None)
+    if warmup_task and not warmup_task.done():
+        warmup_task.cancel()
     if rag_engine:
         await rag_engine.close()
 
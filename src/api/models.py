@@ -19,6 +19,19 @@ class QueryRequest(BaseModel):
         description="指定使用的公共数据库名称列表（None表示使用全部）"
     )
     top_k: int = Field(5, description="每个数据库返回的top k结果", ge=1, le=20)
+    genes: Optional[List[str]] = Field(
+        None,
+        description="基因过滤条件（None表示从问题中提取）"
+    )
+    variants: Optional[List[str]] = Field(
+        None,
+        description="变异过滤条件，如rsID、p.V600E、c.215C>G（None表示从问题中提取）"
+    )
+    samples: Optional[List[str]] = Field(
+        None,
+        description="样本过滤条件（None表示从问题中提取）"
+    )
+    bypass_cache: bool = Field(False, description="是否跳过语义缓存（强制重新检索和生成）")
 
 
 class QueryResponse(BaseModel):
@@ -27,6 +40,46 @@ class QueryResponse(BaseModel):
     local_db_results: dict = Field(default_factory=dict, description="本地数据库检索结果")
     public_db_results: dict = Field(default_factory=dict, description="公共数据库检索结果")
     answer: str = Field(..., description="生成的答案")
+    timed_out_sources: List[str] = Field(default_factory=list, description="检索超时的数据库名称列表")
+    cache_hit: bool = Field(False, description="是否命中语义缓存")
+    completion_cache_hit: bool = Field(False, description="答案是否来自LLM补全缓存（提示词与之前的生成完全相同）")
+    context_stats: Optional[dict] = Field(
+        None,
+        description="上下文打包统计（候选数、选中数、去重数、截断数、打包前后token数和节省的token数）"
+    )
+
+
+class BatchQueryRequest(BaseModel):
+    """批量查询请求模型"""
+    questions: List[str] = Field(..., description="用户问题列表", min_length=1)
+    use_local_db: bool = Field(True, description="是否使用本地数据库")
+    use_public_db: bool = Field(True, description="是否使用公共数据库")
+    local_db_names: Optional[List[str]] = Field(
+        None,
+        description="指定使用的本地数据库名称列表（None表示使用全部）"
+    )
+    public_db_names: Optional[List[str]] = Field(
+        None,
+        description="指定使用的公共数据库名称列表（None表示使用全部）"
+    )
+    top_k: int = Field(5, description="每个数据库返回的top k结果", ge=1, le=20)
+    genes: Optional[List[str]] = Field(
+        None,
+        description="基因过滤条件（None表示从各问题中提取）"
+    )
+    variants: Optional[List[str]] = Field(
+        None,
+        description="变异过滤条件，如rsID、p.V600E、c.215C>G（None表示从各问题中提取）"
+    )
+    samples: Optional[List[str]] = Field(
+        None,
+        description="样本过滤条件（None表示从各问题中提取）"
+    )
+
+
+class BatchQueryResponse(BaseModel):
+    """批量查询响应模型"""
+    results: List[QueryResponse] = Field(..., description="与问题一一对应的查询结果")
 
 
 class DatabaseListResponse(BaseModel):
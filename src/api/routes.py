@@ -2,15 +2,24 @@
 API路由定义
 """
 from fastapi import APIRouter, HTTPException
-from typing import Optional
+from fastapi.responses import StreamingResponse, JSONResponse
+from typing import Dict, Optional
+import json
 
-from src.api.models import QueryRequest, QueryResponse, DatabaseListResponse
+from src.api.models import (
+    QueryRequest, QueryResponse, BatchQueryRequest, BatchQueryResponse,
+    DatabaseListResponse
+)
 from src.config.database_manager import DatabaseManager
 from src.rag.rag_engine import RAGEngine
+from src.rag.executors import get_executors
+from src.rag.http_transport import get_http_client
 
 # 全局实例（在实际应用中应该使用依赖注入）
 db_manager: Optional[DatabaseManager] = None
 rag_engine: Optional[RAGEngine] = None
+# 从进程导入应用到开始监听端口的耗时（秒）
+time_to_listen: Optional[float] = None
 
 router = APIRouter()
 
@@ -31,6 +40,22 @@ def initialize_rag_engine(
     )
 
 
+def record_time_to_listen(seconds: float) -> None:
+    """记录服务启动到开始监听端口的耗时"""
+    global time_to_listen
+    time_to_listen = seconds
+
+
+def _startup_status() -> Dict:
+    """启动和预热状态"""
+    status = {"time_to_listen": time_to_listen}
+    if rag_engine:
+        status.update(rag_engine.warmup_status())
+    else:
+        status["ready"] = False
+    return status
+
+
 @router.get("/", tags=["健康检查"])
 async def root():
     """根路径，健康检查"""
@@ -61,6 +86,8 @@ async def query(request: QueryRequest):
     - **local_db_names**: 指定使用的本地数据库名称列表
     - **public_db_names**: 指定使用的公共数据库名称列表
     - **top_k**: 每个数据库返回的top k结果
+    - **genes** / **variants** / **samples**: 基因、变异、样本过滤条件（未指定时从问题中提取）
+    - **bypass_cache**: 是否跳过语义缓存
     """
     if not rag_engine:
         raise HTTPException(status_code=500, detail="RAG引擎未初始化")
@@ -72,7 +99,11 @@ async def query(request: QueryRequest):
             use_public_db=request.use_public_db,
             local_db_names=request.local_db_names,
             public_db_names=request.public_db_names,
-            top_k=request.top_k
+            top_k=request.top_k,
+            use_cache=not request.bypass_cache,
+            genes=request.genes,
+            variants=request.variants,
+            samples=request.samples
         )
         
         return QueryResponse(**result)
@@ -80,11 +111,113 @@ async def query(request: QueryRequest):
         raise HTTPException(status_code=500, detail=f"查询失败: {str(e)}")
 
 
+@router.post("/query/batch", response_model=BatchQueryResponse, tags=["查询"])
+async def query_batch(request: BatchQueryRequest):
+    """
+    批量执行RAG查询（适用于批量重注释等离线任务）
+    
+    - **questions**: 用户问题列表
+    - 其余参数与 /query 相同，作用于所有问题
+    
+    每个本地数据库只获取一次数据，所有问题批量编码，结果按问题顺序返回
+    """
+    if not rag_engine:
+        raise HTTPException(status_code=500, detail="RAG引擎未初始化")
+    
+    try:
+        results = await rag_engine.query_many(
+            questions=request.questions,
+            use_local_db=request.use_local_db,
+            use_public_db=request.use_public_db,
+            local_db_names=request.local_db_names,
+            public_db_names=request.public_db_names,
+            top_k=request.top_k,
+            genes=request.genes,
+            variants=request.variants,
+            samples=request.samples
+        )
+        
+        return BatchQueryResponse(results=[QueryResponse(**result) for result in results])
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"批量查询失败: {str(e)}")
+
+
+@router.post("/query/stream", tags=["查询"])
+async def query_stream(request: QueryRequest):
+    """
+    流式执行RAG查询（Server-Sent Events）
+    
+    请求参数与 /query 相同。事件类型：
+    
+    - **source**: 单个数据库检索完成，包含该数据库的结果
+    - **token**: 答案片段（来自LLM的流式输出）
+    - **done**: 查询结束，包含完整答案
+    - **error**: 查询过程中出错
+    """
+    if not rag_engine:
+        raise HTTPException(status_code=500, detail="RAG引擎未初始化")
+    
+    async def event_stream():
+        try:
+            async for event in rag_engine.query_stream(
+                question=request.question,
+                use_local_db=request.use_local_db,
+                use_public_db=request.use_public_db,
+                local_db_names=request.local_db_names,
+                public_db_names=request.public_db_names,
+                top_k=request.top_k,
+                genes=request.genes,
+                variants=request.variants,
+                samples=request.samples
+            ):
+                yield _format_sse(event["event"], event)
+        except Exception as e:
+            yield _format_sse("error", {"detail": f"查询失败: {str(e)}"})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def _format_sse(event: str, data: dict) -> str:
+    """格式化为一条SSE消息"""
+    payload = json.dumps(data, ensure_ascii=False, default=str)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+@router.get("/metrics", tags=["健康检查"])
+async def metrics():
+    """运行指标（缓存命中率、执行器队列深度、HTTP连接池、公共数据库熔断状态、上下文打包节省的token数等）"""
+    if not rag_engine:
+        raise HTTPException(status_code=500, detail="RAG引擎未初始化")
+    
+    return {
+        "semantic_cache": rag_engine.semantic_cache.stats(),
+        "executors": get_executors().stats(),
+        "http_pool": get_http_client().stats(),
+        "public_db_resilience": rag_engine.public_db_client.resilience.stats(),
+        "context_packing": rag_engine.context_packer.stats(),
+        "completion_cache": rag_engine.completion_cache.stats() if rag_engine.completion_cache else None,
+        "generation": rag_engine.generation_stats(),
+        "startup": _startup_status()
+    }
+
+
 @router.get("/health", tags=["健康检查"])
 async def health_check():
-    """健康检查端点"""
+    """存活检查端点（进程能响应即返回healthy，不依赖预热是否完成）"""
     return {
         "status": "healthy",
         "db_manager_initialized": db_manager is not None,
         "rag_engine_initialized": rag_engine is not None
     }
+
+
+@router.get("/ready", tags=["健康检查"])
+async def readiness_check():
+    """就绪检查端点（嵌入模型、LLM客户端和本地数据库预热完成前返回503）"""
+    status = _startup_status()
+    status["status"] = "ready" if status["ready"] else "warming_up"
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
@@ -4,9 +4,18 @@
 """
 import yaml
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import Any, List, Dict, Optional, Union
 from pydantic import BaseModel, Field
 
+# 公共数据库响应缓存的默认有效期（秒）
+DEFAULT_CACHE_TTL = 86400
+DEFAULT_NEGATIVE_CACHE_TTL = 3600
+# 公共数据库请求的默认容错参数
+DEFAULT_REQUEST_TIMEOUT = 10.0
+DEFAULT_MAX_RETRIES = 2
+DEFAULT_CIRCUIT_FAILURE_THRESHOLD = 5
+DEFAULT_CIRCUIT_RESET_TIMEOUT = 30.0
+
 
 class LocalDatabase(BaseModel):
     """本地数据库配置模型"""
@@ -17,6 +26,25 @@ class LocalDatabase(BaseModel):
     database_id: Optional[str] = Field(None, description="数据库ID（type为http_api时使用）")
     token: Optional[str] = Field(None, description="访问令牌（type为http_api时使用）")
     description: str = Field(default="", description="数据库描述")
+    mirror: bool = Field(default=True, description="是否将数据库镜像到本地后检索；关闭时每次查询流式拉取分页数据并维护top k（type为http_api时使用）")
+    mirror_dir: str = Field(default="./data/mirrors", description="本地镜像目录（type为http_api时使用）")
+    sync_interval: int = Field(default=300, description="镜像增量同步间隔（秒，type为http_api时使用）")
+    page_size: int = Field(default=100, description="分页拉取时每页记录数（type为http_api时使用）")
+    fetch_concurrency: int = Field(default=4, description="分页并发拉取的最大并发数（type为http_api时使用）")
+    index_type: str = Field(default="flat", description="向量索引类型（flat为精确检索，ivf为IVF-Flat近似检索，quantized为量化内存映射索引；chroma数据库仅支持quantized，其余类型使用Chroma自带索引）")
+    ivf_nlist: int = Field(default=256, description="IVF索引的聚类中心数量（index_type为ivf时使用）")
+    ivf_nprobe: int = Field(default=8, description="IVF索引检索时扫描的聚类数量（index_type为ivf时使用）")
+    ivf_retrain_factor: float = Field(default=2.0, description="向量数增长到上次训练时的多少倍后重新训练IVF聚类中心，不大于1表示不重新训练（index_type为ivf时使用）")
+    quantization: str = Field(default="int8", description="量化类型，int8或float16（index_type为quantized时使用）")
+    pca_dims: int = Field(default=0, description="量化前PCA降维的目标维度，0表示不降维（index_type为quantized时使用）")
+    rerank_factor: int = Field(default=10, description="粗排候选数为top k的倍数，候选集用原始向量精确重排（index_type为quantized时使用）")
+    hybrid_search: bool = Field(default=True, description="是否融合BM25词法检索与向量检索结果（倒数排名融合）")
+    rrf_k: int = Field(default=60, description="倒数排名融合的排名平滑常数")
+    filter_fields: Dict[str, Union[str, Dict[str, Any]]] = Field(default_factory=dict, description="查询过滤条件使用的字段名（键为gene、variant、sample，值为字段名或{field, template}），有镜像时在镜像上过滤，否则下推到API filtersIn；未映射的条件不生效（type为http_api时使用）")
+    variant_index: bool = Field(default=True, description="是否构建变异结构化索引，查询包含变异记号时先按标识符和坐标区间查找，未命中时再向量检索")
+    lexical_prefilter: bool = Field(default=False, description="流式检索时只编码至少包含一个查询记号的记录（mirror为false时使用）")
+    rate_limit: float = Field(default=0, description="对base_url所在主机的请求速率上限（每秒请求数，0表示不限制；type为http_api时使用）")
+    rate_burst: int = Field(default=1, description="速率限制允许的突发请求数（rate_limit大于0时使用）")
 
 
 class PublicDatabase(BaseModel):
@@ -27,6 +55,15 @@ class PublicDatabase(BaseModel):
     api_endpoint: Optional[str] = Field(None, description="API端点")
     description: str = Field(default="", description="数据库描述")
     access_method: str = Field(default="api", description="访问方式")
+    cache_ttl: int = Field(default=DEFAULT_CACHE_TTL, description="响应缓存有效期（秒）")
+    negative_cache_ttl: int = Field(default=DEFAULT_NEGATIVE_CACHE_TTL, description="空结果（负缓存）有效期（秒）")
+    request_timeout: float = Field(default=DEFAULT_REQUEST_TIMEOUT, description="单次请求超时（秒），超时按失败重试")
+    max_retries: int = Field(default=DEFAULT_MAX_RETRIES, description="网络错误、超时或429/5xx响应后的最大重试次数（指数退避加随机抖动）")
+    hedge_requests: bool = Field(default=True, description="请求耗时超过该数据源近期p95延迟时发出一个重复请求，取先成功返回的结果")
+    circuit_failure_threshold: int = Field(default=DEFAULT_CIRCUIT_FAILURE_THRESHOLD, description="连续失败多少次后熔断")
+    circuit_reset_timeout: float = Field(default=DEFAULT_CIRCUIT_RESET_TIMEOUT, description="熔断持续时间（秒），之后放行一个探测请求")
+    rate_limit: float = Field(default=0, description="对api_endpoint所在主机的请求速率上限（每秒请求数，0表示不限制；重试和对冲请求同样计入）")
+    rate_burst: int = Field(default=1, description="速率限制允许的突发请求数（rate_limit大于0时使用）")
 
 
 class DatabaseConfig(BaseModel):
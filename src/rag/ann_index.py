@@ -0,0 +1,699 @@
+"""
+近似最近邻索引模块
+为本地数据库提供持久化的向量索引（精确Flat索引、基于NumPy的IVF-Flat索引和内存映射的量化索引），
+向量id即记录下标，支持增量插入。多个工作进程共享同一索引目录时，写入由跨进程文件锁串行化，
+数据文件只追加或覆盖未确认的尾部、从不截断，读取时以meta.json中的行数为准
+"""
+import json
+import os
+import threading
+from pathlib import Path
+from typing import BinaryIO, List, Optional, Tuple
+
+import numpy as np
+
+from src.config.database_manager import LocalDatabase
+from src.rag.file_lock import file_lock
+
+
+class FlatIndex:
+    """精确索引：对所有向量做一次矩阵乘法"""
+
+    index_type = "flat"
+
+    def __init__(self, directory: Path, model_name: str):
+        """
+        初始化索引
+
+        Args:
+            directory: 索引持久化目录
+            model_name: 生成向量的嵌入模型名称（模型变化时索引需要重建）
+        """
+        self.directory = directory
+        self.model_name = model_name
+        self.lock_path = directory / "index.lock"
+        self.dim: Optional[int] = None
+        self.vectors = np.zeros((0, 0), dtype=np.float32)
+        # 索引代数：每次清空时递增，其他工作进程据此发现索引已重建
+        self.generation = 0
+        # 写入时整体替换内部状态，检索时在锁内取快照
+        self._lock = threading.Lock()
+
+    @property
+    def size(self) -> int:
+        """已索引的向量数"""
+        return self.vectors.shape[0]
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        """归一化，使内积即为余弦相似度"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        return vectors / (np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-8)
+
+    def add(self, vectors: np.ndarray) -> None:
+        """
+        追加向量并持久化（id按插入顺序递增，新向量的id从当前size开始）
+
+        持有跨进程文件锁写入；其他工作进程已经写入了其中部分向量时，先重新加载磁盘上的索引，
+        只写入剩余的部分（索引被其他工作进程清空时不写入，由调用方下次同步时补齐）
+
+        Args:
+            vectors: 新增向量矩阵
+        """
+        vectors = self._normalize(vectors)
+        start = self.size
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with file_lock(self.lock_path):
+            self._refresh()
+            vectors = vectors[self.size - start:] if self.size >= start else vectors[:0]
+            if len(vectors):
+                self._append(vectors)
+
+    def _append(self, vectors: np.ndarray) -> None:
+        """写入已归一化的新向量（调用方持有文件锁）"""
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+
+        with _open_at(self.directory / "vectors.f32", self.size * self.dim * 4) as f:
+            f.write(vectors.tobytes())
+
+        self._extend_vectors(vectors)
+        self._save_meta()
+
+    def _refresh(self) -> None:
+        """其他工作进程修改过磁盘上的索引时重新加载（调用方持有文件锁）"""
+        meta = _read_meta(self.directory)
+        if meta == self._meta():
+            return
+        self._reset_state()
+        if meta is not None and self._compatible(meta):
+            self._load(meta)
+
+    def _extend_vectors(self, vectors: np.ndarray) -> None:
+        """将新向量并入内存中的向量矩阵"""
+        all_vectors = np.vstack([self.vectors, vectors]) if self.size else vectors
+        with self._lock:
+            self.vectors = all_vectors
+
+    def clear(self) -> None:
+        """清空索引及其持久化文件（镜像被重建时使用）"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with file_lock(self.lock_path):
+            self._clear()
+
+    def _clear(self) -> None:
+        """
+        清空索引（调用方持有文件锁）：删除数据文件并写入代数加一的空元数据。
+        已映射旧文件的其他工作进程在重新加载前仍可安全读取（删除不会截断已映射的文件）
+        """
+        try:
+            meta = _read_meta(self.directory) or {}
+        except (OSError, ValueError):
+            meta = {}
+        generation = max(self.generation, meta.get("generation", 0)) + 1
+        for path in self.directory.iterdir():
+            if path != self.lock_path:
+                path.unlink()
+        self._reset_state()
+        self.generation = generation
+        self._save_meta()
+
+    def _reset_state(self) -> None:
+        """重置内存中的索引状态"""
+        with self._lock:
+            self.dim = None
+            self.vectors = np.zeros((0, 0), dtype=np.float32)
+
+    def search(self, queries: np.ndarray, k: int, exact: bool = False) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        检索top k
+
+        Args:
+            queries: 查询向量矩阵（每行一个查询）
+            k: 返回结果数
+            exact: 是否强制精确检索
+
+        Returns:
+            与查询一一对应的(id数组, 相似度数组)，按相似度降序
+        """
+        with self._lock:
+            vectors = self.vectors
+        return self._exact_search(vectors, self._normalize(np.atleast_2d(queries)), k)
+
+    def search_ids(self, queries: np.ndarray, ids: np.ndarray, k: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        只在给定id的子集上精确检索（例如按过滤条件筛出的记录）
+
+        Args:
+            queries: 查询向量矩阵（每行一个查询）
+            ids: 候选向量id数组（尚未索引的id被忽略）
+            k: 返回结果数
+
+        Returns:
+            与查询一一对应的(id数组, 相似度数组)，按相似度降序
+        """
+        with self._lock:
+            vectors = self.vectors
+        queries = self._normalize(np.atleast_2d(queries))
+        ids = np.asarray(ids, dtype=np.int64)
+        ids = ids[ids < vectors.shape[0]]
+        if not len(ids):
+            return [(ids, np.zeros(0, dtype=np.float32)) for _ in queries]
+        similarities = queries @ np.asarray(vectors[ids]).T
+        return [self._top_k(ids, row, k) for row in similarities]
+
+    @classmethod
+    def _exact_search(
+        cls,
+        vectors: np.ndarray,
+        queries: np.ndarray,
+        k: int
+    ) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """在全部向量上精确检索"""
+        ids = np.arange(vectors.shape[0])
+        if not len(ids):
+            return [(ids, np.zeros(0, dtype=np.float32)) for _ in queries]
+        similarities = queries @ vectors.T
+        return [cls._top_k(ids, row, k) for row in similarities]
+
+    @staticmethod
+    def _top_k(ids: np.ndarray, scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """从候选中取相似度最高的k个"""
+        k = min(k, len(ids))
+        if k == 0:
+            return ids[:0], scores[:0]
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return ids[top], scores[top]
+
+    def _meta(self) -> dict:
+        return {
+            "index_type": self.index_type,
+            "model": self.model_name,
+            "dim": self.dim,
+            "size": self.size,
+            "generation": self.generation
+        }
+
+    def _save_meta(self) -> None:
+        """原子写入元数据（size之外的向量视为未确认数据，加载时丢弃）"""
+        tmp_path = self.directory / "meta.json.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._meta(), f)
+        os.replace(tmp_path, self.directory / "meta.json")
+
+    def _compatible(self, meta: dict) -> bool:
+        """磁盘上的索引是否可以按当前配置继续使用"""
+        return meta.get("index_type") == self.index_type and meta.get("model") == self.model_name
+
+    def _load(self, meta: dict) -> None:
+        """从磁盘加载前size个向量（之后的数据未确认，忽略）"""
+        self.dim = meta["dim"]
+        self.generation = meta.get("generation", 0)
+        if not meta["size"]:
+            return
+        vectors = np.fromfile(
+            self.directory / "vectors.f32", dtype=np.float32, count=meta["size"] * self.dim
+        ).reshape(-1, self.dim)
+        if vectors.shape[0] < meta["size"]:
+            raise ValueError("向量文件不完整")
+        with self._lock:
+            self.vectors = vectors
+
+
+class IVFFlatIndex(FlatIndex):
+    """
+    IVF-Flat索引：k-means聚类为nlist个倒排列表，检索时只扫描与查询最近的nprobe个列表
+
+    向量数不足以训练聚类中心，或候选数不足k个时，退化为精确检索。新向量只追加到其所属的列表；
+    向量数增长到上次训练时的retrain_factor倍后重新训练聚类中心，避免数据分布变化后列表失衡
+    """
+
+    index_type = "ivf"
+
+    def __init__(
+        self,
+        directory: Path,
+        model_name: str,
+        nlist: int = 256,
+        nprobe: int = 8,
+        retrain_factor: float = 2.0
+    ):
+        """
+        初始化IVF-Flat索引
+
+        Args:
+            directory: 索引持久化目录
+            model_name: 生成向量的嵌入模型名称
+            nlist: 聚类中心（倒排列表）数量
+            nprobe: 检索时扫描的倒排列表数量（越大召回越高、延迟越高）
+            retrain_factor: 向量数达到上次训练时的多少倍后重新训练（不大于1表示不重新训练）
+        """
+        super().__init__(directory, model_name)
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.retrain_factor = retrain_factor
+        self.centroids: Optional[np.ndarray] = None
+        self.assignments = np.zeros(0, dtype=np.int32)
+        self.lists: List[np.ndarray] = []
+        # 上次训练聚类中心时的向量数
+        self.trained_size = 0
+
+    @property
+    def min_train_size(self) -> int:
+        """训练聚类中心所需的最少向量数"""
+        return self.nlist * 16
+
+    def _needs_retrain(self) -> bool:
+        """向量数是否已增长到需要重新训练"""
+        return self.retrain_factor > 1 and self.size >= self.trained_size * self.retrain_factor
+
+    def _append(self, vectors: np.ndarray) -> None:
+        """追加向量；达到训练（或重新训练）规模时训练聚类中心，否则新向量只追加到最近的列表"""
+        super()._append(vectors)
+
+        if self.centroids is None:
+            if self.size >= self.min_train_size:
+                self._train()
+            return
+        if self._needs_retrain():
+            self._train()
+            return
+
+        start = len(self.assignments)
+        new_assignments = self._assign(self.centroids, self.vectors[start:])
+        with _open_at(self.directory / "assignments.i32", start * 4) as f:
+            f.write(new_assignments.tobytes())
+        assignments = np.concatenate([self.assignments, new_assignments])
+        lists = self._extend_lists(self.lists, new_assignments, start)
+        with self._lock:
+            self.assignments = assignments
+            self.lists = lists
+        self._save_meta()
+
+    def _reset_state(self) -> None:
+        super()._reset_state()
+        with self._lock:
+            self.centroids = None
+            self.assignments = np.zeros(0, dtype=np.int32)
+            self.lists = []
+        self.trained_size = 0
+
+    @staticmethod
+    def _assign(centroids: np.ndarray, vectors: np.ndarray) -> np.ndarray:
+        """将向量分配到最近的聚类中心"""
+        return np.argmax(vectors @ centroids.T, axis=1).astype(np.int32)
+
+    def _train(self, iterations: int = 10, max_samples: int = 64) -> None:
+        """在已有向量的采样上运行球面k-means，训练聚类中心并分配全部向量"""
+        rng = np.random.default_rng(0)
+        sample_size = min(self.size, self.nlist * max_samples)
+        sample = self.vectors[rng.choice(self.size, sample_size, replace=False)]
+        centroids = sample[rng.choice(sample_size, self.nlist, replace=False)].copy()
+
+        for _ in range(iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            for i in range(self.nlist):
+                members = sample[labels == i]
+                if len(members):
+                    centroids[i] = members.mean(axis=0)
+            centroids = self._normalize(centroids)
+
+        assignments = self._assign(centroids, self.vectors)
+        np.save(self.directory / "centroids.npy", centroids)
+        assignments.tofile(self.directory / "assignments.i32")
+        self._set_clusters(centroids, assignments)
+        self.trained_size = self.size
+        self._save_meta()
+
+    def _set_clusters(self, centroids: np.ndarray, assignments: np.ndarray) -> None:
+        """替换聚类中心和倒排列表"""
+        lists = self._build_lists(assignments)
+        with self._lock:
+            self.centroids = centroids
+            self.assignments = assignments
+            self.lists = lists
+
+    def _build_lists(self, assignments: np.ndarray) -> List[np.ndarray]:
+        """根据分配结果构建倒排列表"""
+        order = np.argsort(assignments, kind="stable")
+        bounds = np.searchsorted(assignments[order], np.arange(self.nlist + 1))
+        return [order[bounds[i]:bounds[i + 1]] for i in range(self.nlist)]
+
+    def _extend_lists(
+        self,
+        lists: List[np.ndarray],
+        new_assignments: np.ndarray,
+        start: int
+    ) -> List[np.ndarray]:
+        """
+        将id从start开始的新向量追加到其所属的倒排列表（只复制受影响的列表，
+        返回新的列表集合，检索中的快照不受影响）
+        """
+        order = np.argsort(new_assignments, kind="stable")
+        bounds = np.searchsorted(new_assignments[order], np.arange(self.nlist + 1))
+        lists = list(lists)
+        for i in np.flatnonzero(np.diff(bounds)):
+            lists[i] = np.concatenate([lists[i], order[bounds[i]:bounds[i + 1]] + start])
+        return lists
+
+    def search(self, queries: np.ndarray, k: int, exact: bool = False) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """检索top k；未训练、强制精确或候选不足k个时退化为精确检索"""
+        with self._lock:
+            vectors, centroids, lists = self.vectors, self.centroids, self.lists
+        queries = self._normalize(np.atleast_2d(queries))
+        if exact or centroids is None:
+            return self._exact_search(vectors, queries, k)
+
+        nprobe = min(self.nprobe, self.nlist)
+        probes = np.argpartition(-(queries @ centroids.T), nprobe - 1, axis=1)[:, :nprobe]
+        results = []
+        for query, query_probes in zip(queries, probes):
+            candidates = np.concatenate([lists[i] for i in query_probes])
+            if len(candidates) < k:
+                results.extend(self._exact_search(vectors, query[np.newaxis, :], k))
+                continue
+            results.append(self._top_k(candidates, vectors[candidates] @ query, k))
+        return results
+
+    def _meta(self) -> dict:
+        meta = super()._meta()
+        meta.update({
+            "nlist": self.nlist,
+            "trained": self.centroids is not None,
+            "assigned": len(self.assignments),
+            "trained_size": self.trained_size
+        })
+        return meta
+
+    def _load(self, meta: dict) -> None:
+        super()._load(meta)
+        if meta.get("trained") and meta.get("nlist") == self.nlist:
+            centroids = np.load(self.directory / "centroids.npy")
+            assignments = np.fromfile(
+                self.directory / "assignments.i32", dtype=np.int32, count=meta["assigned"]
+            )
+            self.trained_size = meta.get("trained_size", meta["assigned"])
+            if self._needs_retrain():
+                self._train()
+                return
+            # 分配结果落后于向量时补齐
+            if len(assignments) < self.size:
+                assignments = np.concatenate([
+                    assignments, self._assign(centroids, self.vectors[len(assignments):])
+                ])
+                assignments.tofile(self.directory / "assignments.i32")
+            self._set_clusters(centroids, assignments)
+            self._save_meta()
+        elif self.size >= self.min_train_size:
+            # nlist已调整或尚未训练，按当前配置重新训练
+            self._train()
+
+
+class QuantizedIndex(FlatIndex):
+    """
+    量化索引：int8或float16（可选PCA降维）的向量码和float32原始向量均以内存映射文件保存，
+    多个工作进程通过页缓存共享同一份数据；检索时先在向量码上分块粗排出候选集，再用原始向量精确重排
+
+    启用PCA且向量数不足以训练时，退化为精确检索
+    """
+
+    index_type = "quantized"
+
+    # 粗排时每块扫描的向量数（限制临时内存占用）
+    SCAN_BLOCK_SIZE = 65536
+
+    def __init__(
+        self,
+        directory: Path,
+        model_name: str,
+        quantization: str = "int8",
+        pca_dims: int = 0,
+        rerank_factor: int = 10
+    ):
+        """
+        初始化量化索引
+
+        Args:
+            directory: 索引持久化目录
+            model_name: 生成向量的嵌入模型名称
+            quantization: 量化类型（int8或float16）
+            pca_dims: PCA降维后的维度（0表示不降维）
+            rerank_factor: 粗排候选数为k的倍数
+        """
+        if quantization not in ("int8", "float16"):
+            raise ValueError(f"不支持的量化类型: {quantization}")
+        if pca_dims < 0:
+            raise ValueError(f"pca_dims不能为负数: {pca_dims}")
+        super().__init__(directory, model_name)
+        self.quantization = quantization
+        self.pca_dims = pca_dims
+        self.rerank_factor = rerank_factor
+        self.codes: Optional[np.ndarray] = None
+        self.scales: Optional[np.ndarray] = None
+        self.pca_components: Optional[np.ndarray] = None
+        self.pca_mean: Optional[np.ndarray] = None
+
+    @property
+    def code_dtype(self):
+        return np.int8 if self.quantization == "int8" else np.float16
+
+    @property
+    def code_dim(self) -> int:
+        return self.pca_dims or self.dim
+
+    @property
+    def min_train_size(self) -> int:
+        """训练PCA所需的最少向量数"""
+        return self.pca_dims * 16
+
+    @property
+    def trained(self) -> bool:
+        return not self.pca_dims or self.pca_components is not None
+
+    @property
+    def coded(self) -> int:
+        """已量化的向量数"""
+        return 0 if self.codes is None else self.codes.shape[0]
+
+    def _open(self, name: str, dtype, shape: Tuple[int, ...]) -> np.ndarray:
+        """以只读内存映射方式打开数据文件"""
+        if not shape[0]:
+            return np.zeros(shape, dtype=dtype)
+        return np.memmap(self.directory / name, dtype=dtype, mode="r", shape=shape)
+
+    def _extend_vectors(self, vectors: np.ndarray) -> None:
+        """原始向量不载入内存，重新映射追加后的文件"""
+        vectors = self._open("vectors.f32", np.float32, (self.size + len(vectors), self.dim))
+        with self._lock:
+            self.vectors = vectors
+
+    def _check_pca_dims(self, dim: int) -> None:
+        """PCA降维的目标维度不能超过向量维度"""
+        if self.pca_dims > dim:
+            raise ValueError(f"pca_dims（{self.pca_dims}）不能大于向量维度（{dim}）")
+
+    def _append(self, vectors: np.ndarray) -> None:
+        """追加向量；PCA已训练（或不降维）时同时写入向量码，达到训练规模时训练PCA"""
+        self._check_pca_dims(vectors.shape[1])
+        super()._append(vectors)
+        if self.trained:
+            self._encode_pending()
+        elif self.size >= self.min_train_size:
+            self._train()
+
+    def _reset_state(self) -> None:
+        super()._reset_state()
+        with self._lock:
+            self.codes = None
+            self.scales = None
+            self.pca_components = None
+            self.pca_mean = None
+
+    def _train(self, max_samples: int = 20000) -> None:
+        """在已有向量的采样上拟合PCA，并量化全部向量"""
+        rng = np.random.default_rng(0)
+        sample = self.vectors[np.sort(rng.choice(self.size, min(self.size, max_samples), replace=False))]
+        mean = sample.mean(axis=0)
+        _, _, vt = np.linalg.svd(sample - mean, full_matrices=False)
+        self.pca_mean = mean.astype(np.float32)
+        self.pca_components = vt[:self.pca_dims].astype(np.float32)
+        np.savez(self.directory / "pca.npz", mean=self.pca_mean, components=self.pca_components)
+        self._encode_pending()
+
+    def _encode(self, vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """计算向量码和每行的缩放系数"""
+        if self.pca_components is not None:
+            vectors = (vectors - self.pca_mean) @ self.pca_components.T
+        if self.quantization == "float16":
+            return vectors.astype(np.float16), np.ones(len(vectors), dtype=np.float32)
+        scales = (np.abs(vectors).max(axis=1) / 127 + 1e-12).astype(np.float32)
+        codes = np.clip(np.rint(vectors / scales[:, np.newaxis]), -127, 127).astype(np.int8)
+        return codes, scales
+
+    def _encode_pending(self) -> None:
+        """量化尚未编码的向量并追加到向量码文件"""
+        start = self.coded
+        code_bytes = self.code_dim * np.dtype(self.code_dtype).itemsize
+        with _open_at(self.directory / "codes.bin", start * code_bytes) as codes_file, \
+                _open_at(self.directory / "scales.f32", start * 4) as scales_file:
+            for block_start in range(start, self.size, self.SCAN_BLOCK_SIZE):
+                block = np.asarray(self.vectors[block_start:block_start + self.SCAN_BLOCK_SIZE])
+                codes, scales = self._encode(block)
+                codes_file.write(codes.tobytes())
+                scales_file.write(scales.tobytes())
+
+        codes = self._open("codes.bin", self.code_dtype, (self.size, self.code_dim))
+        scales = self._open("scales.f32", np.float32, (self.size,))
+        with self._lock:
+            self.codes = codes
+            self.scales = scales
+        self._save_meta()
+
+    def search(self, queries: np.ndarray, k: int, exact: bool = False) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """先在向量码上粗排出k * rerank_factor个候选，再用原始向量精确重排"""
+        with self._lock:
+            vectors, codes, scales = self.vectors, self.codes, self.scales
+            components = self.pca_components
+        queries = self._normalize(np.atleast_2d(queries))
+        size = vectors.shape[0]
+        if exact or codes is None or codes.shape[0] < size:
+            return self._exact_search(vectors, queries, k)
+
+        # 查询只投影不去中心化：对同一查询，均值项是常数，不影响排序
+        projected = queries @ components.T if components is not None else queries
+        n_candidates = min(size, k * self.rerank_factor)
+
+        candidate_ids = [np.zeros(0, dtype=np.int64) for _ in queries]
+        candidate_scores = [np.zeros(0, dtype=np.float32) for _ in queries]
+        for start in range(0, size, self.SCAN_BLOCK_SIZE):
+            end = min(start + self.SCAN_BLOCK_SIZE, size)
+            block_scores = (np.asarray(codes[start:end], dtype=np.float32) @ projected.T).T
+            block_scores *= scales[start:end]
+            block_ids = np.arange(start, end)
+            for i, row in enumerate(block_scores):
+                ids = np.concatenate([candidate_ids[i], block_ids])
+                row_scores = np.concatenate([candidate_scores[i], row])
+                if len(ids) > n_candidates:
+                    keep = np.argpartition(-row_scores, n_candidates - 1)[:n_candidates]
+                    ids, row_scores = ids[keep], row_scores[keep]
+                candidate_ids[i], candidate_scores[i] = ids, row_scores
+
+        results = []
+        for query, ids in zip(queries, candidate_ids):
+            ids = np.sort(ids)
+            results.append(self._top_k(ids, np.asarray(vectors[ids]) @ query, k))
+        return results
+
+    def _compatible(self, meta: dict) -> bool:
+        return (
+            super()._compatible(meta)
+            and meta.get("quantization") == self.quantization
+            and meta.get("pca_dims") == self.pca_dims
+        )
+
+    def _meta(self) -> dict:
+        meta = super()._meta()
+        meta.update({
+            "quantization": self.quantization,
+            "pca_dims": self.pca_dims,
+            "coded": self.coded
+        })
+        return meta
+
+    def _load(self, meta: dict) -> None:
+        if meta["dim"] is not None:
+            self._check_pca_dims(meta["dim"])
+        self.dim = meta["dim"]
+        self.generation = meta.get("generation", 0)
+        if not meta["size"]:
+            return
+        self.vectors = self._open("vectors.f32", np.float32, (meta["size"], self.dim))
+
+        if self.pca_dims:
+            pca_path = self.directory / "pca.npz"
+            if not pca_path.exists():
+                if self.size >= self.min_train_size:
+                    self._train()
+                return
+            with np.load(pca_path) as pca:
+                self.pca_mean = pca["mean"]
+                self.pca_components = pca["components"]
+
+        coded = meta.get("coded", 0)
+        if coded:
+            self.codes = self._open("codes.bin", self.code_dtype, (coded, self.code_dim))
+            self.scales = self._open("scales.f32", np.float32, (coded,))
+        # 向量码落后于原始向量时补齐
+        if coded < self.size:
+            self._encode_pending()
+
+
+def _open_at(path: Path, offset: int) -> BinaryIO:
+    """
+    打开数据文件并定位到写入位置offset（已确认数据的末尾）
+
+    不截断文件：其他工作进程可能正以内存映射方式读取，截断会导致其访问越界（SIGBUS）；
+    offset之后未确认的尾部数据直接被覆盖
+    """
+    f = open(path, "r+b" if path.exists() else "wb")
+    f.seek(offset)
+    return f
+
+
+def _read_meta(directory: Path) -> Optional[dict]:
+    """读取索引元数据（不存在时返回None）"""
+    meta_path = directory / "meta.json"
+    if not meta_path.exists():
+        return None
+    with open(meta_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _create_index(db_config: LocalDatabase, directory: Path, model_name: str) -> FlatIndex:
+    """根据数据库配置创建空索引"""
+    index_type = db_config.index_type.lower()
+    if index_type == "ivf":
+        return IVFFlatIndex(
+            directory, model_name, db_config.ivf_nlist, db_config.ivf_nprobe,
+            db_config.ivf_retrain_factor
+        )
+    if index_type == "quantized":
+        return QuantizedIndex(
+            directory, model_name, db_config.quantization.lower(),
+            db_config.pca_dims, db_config.rerank_factor
+        )
+    if index_type == "flat":
+        return FlatIndex(directory, model_name)
+    raise ValueError(f"不支持的索引类型: {db_config.index_type}")
+
+
+def load_index(db_config: LocalDatabase, directory: Path, model_name: str) -> FlatIndex:
+    """
+    根据数据库配置创建或加载索引；配置、模型不一致或文件损坏时清空旧索引（由调用方重新写入）
+
+    Args:
+        db_config: 本地数据库配置
+        directory: 索引持久化目录
+        model_name: 嵌入模型名称
+
+    Returns:
+        索引实例
+    """
+    index = _create_index(db_config, directory, model_name)
+    if not (directory / "meta.json").exists():
+        return index
+
+    # 加载过程中可能补齐向量码或重新训练，与其他工作进程的写入互斥
+    with file_lock(index.lock_path):
+        try:
+            meta = _read_meta(directory)
+            if index._compatible(meta):
+                index._load(meta)
+                return index
+        except (OSError, ValueError, KeyError):
+            pass
+
+        # 旧索引不可用，清空后重建
+        index._clear()
+    return index
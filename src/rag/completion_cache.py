@@ -0,0 +1,146 @@
+"""
+LLM补全缓存模块
+以模型名称、温度和提示词哈希为键，在SQLite中持久化LLM生成的答案，
+支持TTL和按总大小的LRU淘汰，WAL模式下可被多个uvicorn工作进程共享
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+from src.rag.executors import get_executors
+
+
+class CompletionCache:
+    """SQLite持久化的LLM补全缓存（精确匹配）"""
+
+    def __init__(
+        self,
+        db_path: Optional[str] = None,
+        ttl: Optional[float] = None,
+        max_bytes: Optional[int] = None
+    ):
+        """
+        初始化LLM补全缓存
+
+        Args:
+            db_path: SQLite文件路径（默认读取LLM_CACHE_PATH环境变量）
+            ttl: 条目有效期（秒，默认读取LLM_CACHE_TTL环境变量）
+            max_bytes: 缓存答案的总大小上限（字节，超出时淘汰最久未使用的条目，默认读取LLM_CACHE_MAX_MB环境变量）
+        """
+        self.db_path = Path(db_path or os.getenv("LLM_CACHE_PATH", "./data/llm_cache.sqlite3"))
+        self.ttl = ttl or float(os.getenv("LLM_CACHE_TTL", "604800"))
+        self.max_bytes = max_bytes or int(float(os.getenv("LLM_CACHE_MAX_MB", "256")) * 1024 * 1024)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS completions (
+                    key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    temperature REAL NOT NULL,
+                    completion TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    expires_at REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )
+                """
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS completions_last_used ON completions (last_used)"
+            )
+            conn.execute("DELETE FROM completions WHERE expires_at < ?", (time.time(),))
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """每次操作使用独立连接（事务结束后提交并关闭），避免跨线程/跨进程共享连接"""
+        conn = sqlite3.connect(self.db_path, timeout=30.0)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def make_key(model: str, temperature: float, prompt: str) -> str:
+        """根据模型名称、温度和提示词计算缓存键"""
+        prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        payload = json.dumps([model, round(float(temperature), 4), prompt_hash])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT completion FROM completions WHERE key = ? AND expires_at > ?",
+                (key, now)
+            ).fetchone()
+            if row is not None:
+                conn.execute("UPDATE completions SET last_used = ? WHERE key = ?", (now, key))
+        return row[0] if row else None
+
+    def _put(self, key: str, model: str, temperature: float, completion: str) -> int:
+        """写入条目，并按总大小淘汰最久未使用的条目；返回淘汰的条目数"""
+        now = time.time()
+        size = len(completion.encode("utf-8"))
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO completions "
+                "(key, model, temperature, completion, size, expires_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, model, temperature, completion, size, now + self.ttl, now)
+            )
+            evicted = conn.execute("DELETE FROM completions WHERE expires_at < ?", (now,)).rowcount
+
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM completions").fetchone()[0]
+            if total > self.max_bytes:
+                victims = []
+                for victim_key, victim_size in conn.execute(
+                    "SELECT key, size FROM completions WHERE key != ? ORDER BY last_used", (key,)
+                ):
+                    if total <= self.max_bytes:
+                        break
+                    victims.append((victim_key,))
+                    total -= victim_size
+                conn.executemany("DELETE FROM completions WHERE key = ?", victims)
+                evicted += len(victims)
+        return evicted
+
+    async def get(self, key: str) -> Optional[str]:
+        """读取未过期的缓存答案"""
+        completion = await get_executors().run_in_thread(self._get, key)
+        if completion is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return completion
+
+    async def put(self, key: str, model: str, temperature: float, completion: str) -> None:
+        """写入缓存答案"""
+        self.evictions += await get_executors().run_in_thread(
+            self._put, key, model, temperature, completion
+        )
+        self.stores += 1
+
+    def stats(self) -> Dict:
+        """缓存指标（命中数等为当前进程的计数）"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "ttl": self.ttl,
+            "max_bytes": self.max_bytes
+        }
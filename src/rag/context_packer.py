@@ -0,0 +1,330 @@
+"""
+上下文打包模块
+在生成答案前压缩检索结果：按模型的token预算选择上下文，去除重复和近似重复的记录，
+用MMR（最大边际相关性）在各数据源之间兼顾相关性和多样性，并截断过长的记录（保留变异字段）
+"""
+import hashlib
+import math
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.rag.embedding_service import EmbeddingService
+from src.rag.variant_index import record_variants
+
+# 各模型的上下文窗口（token数，按模型名前缀匹配，最长前缀优先）
+MODEL_CONTEXT_WINDOWS = {
+    "gpt-3.5-turbo": 16385,
+    "gpt-4": 8192,
+    "gpt-4-32k": 32768,
+    "gpt-4-turbo": 128000,
+    "gpt-4o": 128000,
+    "gpt-4.1": 1047576,
+    "o1": 200000,
+    "o3": 200000,
+}
+# 未知模型的上下文窗口
+DEFAULT_CONTEXT_WINDOW = 8192
+# 为提示词模板、问题和答案预留的token数
+PROMPT_RESERVE_TOKENS = 1536
+# 近似重复判定的嵌入余弦相似度阈值
+NEAR_DUPLICATE_THRESHOLD = 0.95
+# 与变异相关、截断记录时需要保留的元数据字段（小写）
+VARIANT_FIELDS = (
+    "gene", "gene_symbol", "genesymbol", "symbol",
+    "chrom", "chr", "chromosome", "#chrom", "pos", "position", "start", "end",
+    "ref", "reference", "alt", "alternate",
+    "rsid", "rs_id", "dbsnp", "variant", "variant_id", "mutation",
+    "hgvs", "hgvs_c", "hgvs_p", "hgvs_g", "transcript",
+    "consequence", "effect", "clinical_significance", "clinvar", "zygosity", "genotype",
+    "sample", "sample_id"
+)
+
+_CJK_PATTERN = re.compile("[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uff00-\uffef]")
+_WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+class TokenCounter:
+    """token计数：安装了tiktoken时使用模型对应的编码，否则按字符估算（中文每字约1个token，其余约4个字符1个token）"""
+
+    def __init__(self, model_name: str):
+        self.encoding = None
+        try:
+            import tiktoken
+            try:
+                self.encoding = tiktoken.encoding_for_model(model_name)
+            except KeyError:
+                self.encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            pass
+
+    def count(self, text: str) -> int:
+        """计算文本的token数"""
+        if not text:
+            return 0
+        if self.encoding is not None:
+            return len(self.encoding.encode(text, disallowed_special=()))
+        cjk = len(_CJK_PATTERN.findall(text))
+        return cjk + math.ceil((len(text) - cjk) / 4)
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """截断文本到最多max_tokens个token"""
+        if self.count(text) <= max_tokens:
+            return text
+        if self.encoding is not None:
+            return self.encoding.decode(self.encoding.encode(text, disallowed_special=())[:max_tokens])
+        # 二分查找满足预算的最长前缀
+        low, high = 0, len(text)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self.count(text[:middle]) <= max_tokens:
+                low = middle
+            else:
+                high = middle - 1
+        return text[:low]
+
+
+def context_window(model_name: str) -> int:
+    """模型的上下文窗口（按最长前缀匹配）"""
+    matches = [prefix for prefix in MODEL_CONTEXT_WINDOWS if model_name.startswith(prefix)]
+    if not matches:
+        return DEFAULT_CONTEXT_WINDOW
+    return MODEL_CONTEXT_WINDOWS[max(matches, key=len)]
+
+
+class ContextCandidate:
+    """一条候选上下文"""
+
+    def __init__(self, source: str, text: str, raw_tokens: int, truncated: bool):
+        """
+        Args:
+            source: 数据库名称
+            text: 压缩/截断后的文本
+            raw_tokens: 原始文本（“[数据库] 内容”）的token数
+            truncated: 是否被截断或压缩
+        """
+        self.source = source
+        self.text = text
+        self.raw_tokens = raw_tokens
+        self.truncated = truncated
+        self.tokens = 0
+
+    def render(self) -> str:
+        """写入提示词的形式"""
+        return f"[{self.source}] {self.text}"
+
+
+class ContextPacker:
+    """按token预算打包检索结果"""
+
+    def __init__(
+        self,
+        embedding_service: EmbeddingService,
+        model_name: str,
+        token_budget: Optional[int] = None,
+        max_record_tokens: Optional[int] = None,
+        mmr_lambda: Optional[float] = None
+    ):
+        """
+        初始化上下文打包器
+
+        Args:
+            embedding_service: 嵌入服务（用于MMR和近似重复判定）
+            model_name: 生成模型名称（决定上下文窗口和token编码）
+            token_budget: 上下文的token预算（默认读取CONTEXT_TOKEN_BUDGET环境变量，不超过模型窗口减去预留）
+            max_record_tokens: 单条记录的最大token数（默认读取CONTEXT_MAX_RECORD_TOKENS环境变量）
+            mmr_lambda: MMR中相关性的权重，越小越偏重多样性（默认读取CONTEXT_MMR_LAMBDA环境变量）
+        """
+        self.embedding_service = embedding_service
+        self.model_name = model_name
+        self.counter = TokenCounter(model_name)
+        self.token_budget = min(
+            token_budget or int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000")),
+            max(context_window(model_name) - PROMPT_RESERVE_TOKENS, 0)
+        )
+        self.max_record_tokens = max_record_tokens or int(os.getenv("CONTEXT_MAX_RECORD_TOKENS", "400"))
+        self.mmr_lambda = mmr_lambda if mmr_lambda is not None else float(
+            os.getenv("CONTEXT_MMR_LAMBDA", "0.7")
+        )
+        # 累计指标
+        self.packed = 0
+        self.tokens_before = 0
+        self.tokens_after = 0
+
+    def _compact(self, content: str, metadata: Dict) -> Tuple[str, bool]:
+        """
+        压缩单条记录：原始字典回退的内容改写为“字段: 值”列表（变异字段在前，空值和嵌套值省略），
+        超过max_record_tokens时截断，并在末尾保留截断部分中的变异信息
+
+        Returns:
+            (压缩后的文本, 是否被压缩或截断)
+        """
+        text = _WHITESPACE_PATTERN.sub(" ", str(content)).strip()
+        changed = False
+
+        # 没有内容字段的记录以str(dict)作为内容，改用元数据中的标量字段
+        if text.startswith("{") and metadata:
+            fields = [
+                (key, value) for key, value in metadata.items()
+                if isinstance(value, (str, int, float)) and not isinstance(value, bool) and str(value).strip()
+            ]
+            fields.sort(key=lambda field: str(field[0]).lower() not in VARIANT_FIELDS)
+            text = "; ".join(f"{key}: {value}" for key, value in fields)
+            changed = True
+
+        if self.counter.count(text) <= self.max_record_tokens:
+            return text, changed
+
+        # 压缩后的字段列表已将变异字段排在最前，无需重复
+        variant_fields = "" if changed else "; ".join(
+            f"{key}: {value}" for key, value in metadata.items()
+            if str(key).lower() in VARIANT_FIELDS and isinstance(value, (str, int, float)) and str(value).strip()
+        )
+        variant_keys = list(dict.fromkeys(
+            variant.key or variant.bare_key
+            for variant in record_variants(text, metadata)
+            if variant.key or variant.bare_key
+        ))
+        kept = [part for part in (variant_fields, ", ".join(variant_keys)) if part]
+        suffix = f" …（变异信息：{' | '.join(kept)}）" if kept else " …"
+        head = self.counter.truncate(text, max(self.max_record_tokens - self.counter.count(suffix), 0))
+        return head + suffix, True
+
+    def _candidates(self, retrieval_results: Dict) -> Tuple[List[ContextCandidate], int, int]:
+        """
+        收集所有数据源的候选上下文（去除完全重复的记录）
+
+        Returns:
+            (候选列表, 完全重复的记录数, 完全重复记录的原始token数)
+        """
+        candidates = []
+        seen = set()
+        duplicates = 0
+        duplicate_tokens = 0
+        for group in ("local_db_results", "public_db_results"):
+            for db_name, results in retrieval_results.get(group, {}).items():
+                if not isinstance(results, list):
+                    continue
+                for result in results:
+                    if "content" not in result:
+                        continue
+                    raw_tokens = self.counter.count(f"[{db_name}] {result['content']}")
+                    text, truncated = self._compact(result["content"], result.get("metadata") or {})
+                    digest = hashlib.sha1(text.lower().encode("utf-8")).hexdigest()
+                    if digest in seen:
+                        duplicates += 1
+                        duplicate_tokens += raw_tokens
+                        continue
+                    seen.add(digest)
+                    candidate = ContextCandidate(db_name, text, raw_tokens, truncated)
+                    candidate.tokens = self.counter.count(candidate.render())
+                    candidates.append(candidate)
+        return candidates, duplicates, duplicate_tokens
+
+    async def _select(
+        self,
+        question: str,
+        candidates: List[ContextCandidate]
+    ) -> Tuple[List[ContextCandidate], int]:
+        """
+        去除近似重复后按MMR依次选择候选，直到token预算用完（放不下的候选跳过，继续尝试更短的）
+
+        Returns:
+            (选中的候选（按选择顺序）, 近似重复的记录数)
+        """
+        try:
+            embeddings = await self.embedding_service.encode([question] + [c.text for c in candidates])
+            embeddings = np.asarray(embeddings, dtype=np.float32)
+            embeddings /= np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+        except Exception as e:
+            # 嵌入不可用时按检索顺序填充预算
+            print(f"上下文打包编码失败，按检索顺序选择: {str(e)}")
+            return self._fill(candidates), 0
+
+        relevance = embeddings[1:] @ embeddings[0]
+        similarity = embeddings[1:] @ embeddings[1:].T
+
+        # 按相关性从高到低，与已保留记录近似重复的记录丢弃
+        kept: List[int] = []
+        for i in np.argsort(-relevance, kind="stable"):
+            if all(similarity[i, j] < NEAR_DUPLICATE_THRESHOLD for j in kept):
+                kept.append(int(i))
+        near_duplicates = len(candidates) - len(kept)
+
+        selected: List[int] = []
+        remaining = set(kept)
+        budget = self.token_budget
+        while remaining:
+            def mmr(i: int) -> float:
+                redundancy = max((similarity[i, j] for j in selected), default=0.0)
+                return self.mmr_lambda * relevance[i] - (1 - self.mmr_lambda) * redundancy
+
+            best = max(remaining, key=lambda i: (mmr(i), -i))
+            remaining.discard(best)
+            if candidates[best].tokens <= budget:
+                selected.append(best)
+                budget -= candidates[best].tokens
+
+        return [candidates[i] for i in selected], near_duplicates
+
+    def _fill(self, candidates: List[ContextCandidate]) -> List[ContextCandidate]:
+        """按原有顺序选择放得进预算的候选"""
+        selected = []
+        budget = self.token_budget
+        for candidate in candidates:
+            if candidate.tokens <= budget:
+                selected.append(candidate)
+                budget -= candidate.tokens
+        return selected
+
+    async def pack(self, question: str, retrieval_results: Dict) -> Tuple[List[str], Dict]:
+        """
+        打包检索结果
+
+        Args:
+            question: 用户问题
+            retrieval_results: 检索结果（local_db_results、public_db_results）
+
+        Returns:
+            (写入提示词的上下文片段列表, 打包统计：候选数、选中数、去重数、截断数、打包前后token数和节省的token数)
+        """
+        candidates, duplicates, duplicate_tokens = self._candidates(retrieval_results)
+        tokens_before = sum(candidate.raw_tokens for candidate in candidates) + duplicate_tokens
+
+        near_duplicates = 0
+        selected: List[ContextCandidate] = []
+        if candidates:
+            selected, near_duplicates = await self._select(question, candidates)
+
+        parts = [candidate.render() for candidate in selected]
+        tokens_after = sum(candidate.tokens for candidate in selected)
+        stats = {
+            "model": self.model_name,
+            "token_budget": self.token_budget,
+            "candidates": len(candidates) + duplicates,
+            "selected": len(selected),
+            "duplicates_removed": duplicates + near_duplicates,
+            "truncated": sum(1 for candidate in selected if candidate.truncated),
+            "tokens_before": tokens_before,
+            "tokens_after": tokens_after,
+            "tokens_saved": max(tokens_before - tokens_after, 0)
+        }
+
+        self.packed += 1
+        self.tokens_before += tokens_before
+        self.tokens_after += tokens_after
+        return parts, stats
+
+    def stats(self) -> Dict:
+        """累计打包指标"""
+        return {
+            "model": self.model_name,
+            "token_budget": self.token_budget,
+            "max_record_tokens": self.max_record_tokens,
+            "packed": self.packed,
+            "tokens_before": self.tokens_before,
+            "tokens_after": self.tokens_after,
+            "tokens_saved": max(self.tokens_before - self.tokens_after, 0)
+        }
@@ -0,0 +1,249 @@
+"""
+嵌入向量缓存模块
+以“格式化内容 + 模型名称”的哈希为键，将嵌入向量持久化到内存映射的浮点矩阵中；
+键到矩阵行号的索引保存在SQLite中，写入和槽位分配由跨进程文件锁串行化，
+可被多个uvicorn工作进程共享（每个进程每个模型只有一个实例，见get_embedding_cache）
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from src.rag.file_lock import file_lock
+
+# SQLite单条语句的参数数量上限以内的批大小
+_SQL_BATCH = 500
+
+
+class EmbeddingCache:
+    """基于内存映射文件的嵌入向量缓存（LRU淘汰，容量上限为capacity条）"""
+
+    def __init__(
+        self,
+        model_name: str,
+        cache_dir: Optional[str] = None,
+        capacity: Optional[int] = None
+    ):
+        """
+        初始化嵌入向量缓存
+
+        Args:
+            model_name: 嵌入模型名称（参与缓存键计算）
+            cache_dir: 缓存目录（默认读取EMBEDDING_CACHE_DIR环境变量）
+            capacity: 最大缓存条数（默认读取EMBEDDING_CACHE_SIZE环境变量）
+        """
+        self.model_name = model_name
+        cache_dir = cache_dir or os.getenv("EMBEDDING_CACHE_DIR", "./data/embedding_cache")
+        self.capacity = capacity or int(os.getenv("EMBEDDING_CACHE_SIZE", "200000"))
+        self.directory = Path(cache_dir) / model_name.replace("/", "_")
+        self.db_path = self.directory / "index.sqlite3"
+        self.lock_path = self.directory / "cache.lock"
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        # 当前映射的矩阵版本 (维度, 容量, 代数) 及内存映射
+        self.shape: Optional[Tuple[int, int, int]] = None
+        self.vectors: Optional[np.memmap] = None
+        self._lock = threading.Lock()
+
+        with file_lock(self.lock_path), self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    slot INTEGER NOT NULL UNIQUE,
+                    last_used REAL NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """每次操作使用独立连接（事务结束后提交并关闭），避免跨线程/跨进程共享连接"""
+        conn = sqlite3.connect(self.db_path, timeout=30.0)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _key(self, text: str) -> str:
+        """计算缓存键"""
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def _vectors_path(self, shape: Tuple[int, ...]) -> Path:
+        """矩阵文件路径（形状写入文件名，形状变化时换用新文件，不截断其他进程正在映射的文件）"""
+        return self.directory / f"vectors-{shape[0]}x{shape[1]}.f32"
+
+    @staticmethod
+    def _read_shape(conn: sqlite3.Connection) -> Optional[Tuple[int, int, int]]:
+        """读取当前缓存矩阵的版本 (维度, 容量, 代数)，代数在每次重建时递增"""
+        meta = dict(conn.execute("SELECT name, value FROM meta").fetchall())
+        if not meta.get("dim") or not meta.get("capacity"):
+            return None
+        return meta["dim"], meta["capacity"], meta.get("generation", 0)
+
+    def _map(self, shape: Optional[Tuple[int, int, int]]) -> None:
+        """按版本映射矩阵文件（版本变化时重新映射，文件不存在时不映射）"""
+        if shape == self.shape and self.vectors is not None:
+            return
+        self.shape, self.vectors = None, None
+        path = self._vectors_path(shape) if shape else None
+        if path is None or not path.exists():
+            return
+        self.vectors = np.memmap(path, dtype=np.float32, mode="r+", shape=(shape[1], shape[0]))
+        self.shape = shape
+
+    def _reset(self, conn: sqlite3.Connection, shape: Tuple[int, int]) -> None:
+        """
+        以新形状重建缓存（调用方持有排他文件锁）：清空索引，创建新的矩阵文件后原子替换，
+        旧文件直接删除（已映射旧文件的进程在重新映射前仍可安全访问其内容）
+        """
+        old_shape = self._read_shape(conn)
+        conn.execute("DELETE FROM entries")
+        conn.executemany(
+            "INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)",
+            [("dim", shape[0]), ("capacity", shape[1]), ("generation", (old_shape[2] + 1) if old_shape else 1)]
+        )
+
+        path = self._vectors_path(shape)
+        tmp_path = path.with_suffix(f".tmp{os.getpid()}")
+        with open(tmp_path, "wb") as f:
+            f.truncate(shape[0] * shape[1] * 4)
+        os.replace(tmp_path, path)
+        if old_shape and old_shape[:2] != shape:
+            self._vectors_path(old_shape).unlink(missing_ok=True)
+        self.shape, self.vectors = None, None
+
+    def get_many(self, texts: List[str]) -> Tuple[List[Optional[np.ndarray]], List[int]]:
+        """
+        批量查询缓存
+
+        Args:
+            texts: 待查询的文本列表
+
+        Returns:
+            (与texts一一对应的向量列表（未命中为None）, 未命中的下标列表)
+        """
+        keys = [self._key(text) for text in texts]
+        slots: Dict[str, int] = {}
+
+        with self._lock, file_lock(self.lock_path, exclusive=False), self._connect() as conn:
+            self._map(self._read_shape(conn))
+            if self.vectors is not None:
+                unique_keys = list(dict.fromkeys(keys))
+                for start in range(0, len(unique_keys), _SQL_BATCH):
+                    batch = unique_keys[start:start + _SQL_BATCH]
+                    slots.update(conn.execute(
+                        f"SELECT key, slot FROM entries WHERE key IN ({','.join('?' * len(batch))})",
+                        batch
+                    ).fetchall())
+                now = time.time()
+                conn.executemany(
+                    "UPDATE entries SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in slots]
+                )
+
+            vectors: List[Optional[np.ndarray]] = []
+            missing: List[int] = []
+            for i, key in enumerate(keys):
+                slot = slots.get(key)
+                if slot is None:
+                    vectors.append(None)
+                    missing.append(i)
+                else:
+                    vectors.append(np.array(self.vectors[slot]))
+
+        return vectors, missing
+
+    def put_many(self, texts: List[str], embeddings: np.ndarray) -> None:
+        """
+        批量写入缓存，容量不足时淘汰最久未使用的条目
+
+        只写入本批次涉及的行和索引条目；矩阵通过共享内存映射对其他进程立即可见，
+        不逐批刷盘（缓存内容可重新计算）
+
+        Args:
+            texts: 文本列表
+            embeddings: 与texts一一对应的向量矩阵
+        """
+        if not texts:
+            return
+
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        shape = (int(embeddings.shape[1]), self.capacity)
+        # 同一批次内重复的文本只保留最后一次；超过容量时只保留最后capacity条
+        pending = dict(zip((self._key(text) for text in texts), embeddings))
+        pending = dict(list(pending.items())[-self.capacity:])
+        keys = list(pending)
+
+        with self._lock, file_lock(self.lock_path), self._connect() as conn:
+            current = self._read_shape(conn)
+            if current is None or current[:2] != shape or not self._vectors_path(shape).exists():
+                self._reset(conn, shape)
+                current = self._read_shape(conn)
+            self._map(current)
+
+            existing: Dict[str, int] = {}
+            for start in range(0, len(keys), _SQL_BATCH):
+                batch = keys[start:start + _SQL_BATCH]
+                existing.update(conn.execute(
+                    f"SELECT key, slot FROM entries WHERE key IN ({','.join('?' * len(batch))})",
+                    batch
+                ).fetchall())
+
+            now = time.time()
+            # 先刷新已有条目的使用时间，避免它们被选为淘汰对象
+            conn.executemany(
+                "UPDATE entries SET last_used = ? WHERE key = ?",
+                [(now, key) for key in existing]
+            )
+
+            new_keys = [key for key in keys if key not in existing]
+            count = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            free = min(self.capacity - count, len(new_keys))
+            new_slots = list(range(count, count + free))
+            if len(new_keys) > free:
+                victims = conn.execute(
+                    "SELECT key, slot FROM entries ORDER BY last_used, rowid LIMIT ?",
+                    (len(new_keys) - free,)
+                ).fetchall()
+                conn.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key, _ in victims])
+                new_slots.extend(slot for _, slot in victims)
+
+            assigned = dict(existing)
+            assigned.update(zip(new_keys, new_slots))
+            for key, slot in assigned.items():
+                self.vectors[slot] = pending[key]
+            conn.executemany(
+                "INSERT INTO entries (key, slot, last_used) VALUES (?, ?, ?)",
+                [(key, slot, now) for key, slot in zip(new_keys, new_slots)]
+            )
+
+
+_caches: Dict[str, EmbeddingCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_embedding_cache(model_name: str) -> EmbeddingCache:
+    """
+    获取进程级共享的嵌入向量缓存（同一模型只有一个实例，所有数据库客户端共用）
+
+    Args:
+        model_name: 嵌入模型名称
+
+    Returns:
+        嵌入向量缓存实例
+    """
+    with _caches_lock:
+        if model_name not in _caches:
+            _caches[model_name] = EmbeddingCache(model_name)
+        return _caches[model_name]
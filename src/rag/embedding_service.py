@@ -0,0 +1,280 @@
+"""
+共享嵌入服务模块
+进程内只加载一份SentenceTransformer模型，供VectorStoreManager、所有LocalDatabaseClient
+和Chroma向量库共同使用，并将并发的编码请求合并为微批次；
+也可切换为多进程后端，由进程池中的工作进程完成编码
+"""
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import List, Dict, Optional, Tuple, Union
+
+import numpy as np
+
+from src.rag import embedding_workers
+from src.rag.executors import get_executors
+
+DEFAULT_EMBEDDING_MODEL = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+
+
+class ProcessEmbeddingPool:
+    """多进程嵌入后端：每个工作进程加载一份模型，文本按块分发，通过共享内存传递输入和输出"""
+
+    def __init__(
+        self,
+        model_name: str,
+        workers: Optional[int] = None,
+        chunk_size: Optional[int] = None,
+        batch_size: int = 64
+    ):
+        """
+        初始化多进程嵌入后端
+
+        Args:
+            model_name: 嵌入模型名称
+            workers: 工作进程数（默认读取EMBEDDING_PROCESS_WORKERS环境变量，未设置时为CPU核数）
+            chunk_size: 每个工作进程单次处理的文本数（默认读取EMBEDDING_CHUNK_SIZE环境变量）
+            batch_size: 工作进程内模型编码的批次大小
+        """
+        self.workers = workers or int(os.getenv("EMBEDDING_PROCESS_WORKERS", str(os.cpu_count() or 1)))
+        self.chunk_size = chunk_size or int(os.getenv("EMBEDDING_CHUNK_SIZE", "256"))
+        self.batch_size = batch_size
+        # 使用spawn启动，避免在已有线程的进程中fork
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=embedding_workers.init_worker,
+            initargs=(model_name,)
+        )
+        self._dim: Optional[int] = None
+
+    @property
+    def dim(self) -> int:
+        """模型向量维度（首次访问时向工作进程查询）"""
+        if self._dim is None:
+            self._dim = self.executor.submit(embedding_workers.embedding_dimension).result()
+        return self._dim
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """
+        将文本按chunk_size分块并行编码（阻塞调用，可在任意线程中执行）
+
+        Args:
+            texts: 文本列表
+
+        Returns:
+            向量矩阵
+        """
+        shape = (len(texts), self.dim)
+        input_shm = embedding_workers.pack_texts(texts)
+        output_shm = shared_memory.SharedMemory(
+            create=True, size=max(shape[0] * shape[1] * 4, 1)
+        )
+        try:
+            futures = [
+                self.executor.submit(
+                    embedding_workers.encode_chunk,
+                    input_shm.name, output_shm.name, shape,
+                    start, min(start + self.chunk_size, shape[0]), self.batch_size
+                )
+                for start in range(0, shape[0], self.chunk_size)
+            ]
+            for future in futures:
+                future.result()
+
+            output = np.ndarray(shape, dtype=np.float32, buffer=output_shm.buf)
+            embeddings = output.copy()
+            del output
+            return embeddings
+        finally:
+            input_shm.close()
+            input_shm.unlink()
+            output_shm.close()
+            output_shm.unlink()
+
+    def shutdown(self) -> None:
+        """关闭工作进程"""
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class EmbeddingService:
+    """进程级共享嵌入服务，支持跨请求微批次合并"""
+
+    def __init__(
+        self,
+        model_name: str = DEFAULT_EMBEDDING_MODEL,
+        max_batch_size: Optional[int] = None,
+        max_wait_ms: Optional[float] = None,
+        backend: Optional[str] = None
+    ):
+        """
+        初始化嵌入服务
+
+        Args:
+            model_name: 嵌入模型名称
+            max_batch_size: 单个微批次的最大文本数（默认读取EMBEDDING_MAX_BATCH_SIZE环境变量）
+            max_wait_ms: 凑批的最长等待时间（毫秒，默认读取EMBEDDING_MAX_WAIT_MS环境变量）
+            backend: 编码后端，local为进程内编码，process为多进程编码（默认读取EMBEDDING_BACKEND环境变量）
+        """
+        self.model_name = model_name
+        self.max_batch_size = max_batch_size or int(os.getenv("EMBEDDING_MAX_BATCH_SIZE", "64"))
+        self.backend = (backend or os.getenv("EMBEDDING_BACKEND", "local")).lower()
+        if self.backend not in ("local", "process"):
+            raise ValueError(f"不支持的嵌入后端: {self.backend}")
+        # 模型在首次编码（或预热）时才加载，避免拖慢服务启动；
+        # process后端的模型只在工作进程中加载，主进程不持有模型
+        self.model = None
+        self.process_pool: Optional[ProcessEmbeddingPool] = None
+        self._load_lock = threading.Lock()
+        if max_wait_ms is None:
+            max_wait_ms = float(os.getenv("EMBEDDING_MAX_WAIT_MS", "5"))
+        self.max_wait = max_wait_ms / 1000
+        self._langchain_embeddings = None
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def langchain_embeddings(self):
+        """LangChain Embeddings适配器（首次访问时导入LangChain）"""
+        if self._langchain_embeddings is None:
+            from src.rag.langchain_embeddings import SharedEmbeddings
+            self._langchain_embeddings = SharedEmbeddings(self)
+        return self._langchain_embeddings
+
+    @property
+    def loaded(self) -> bool:
+        """模型（或嵌入工作进程池）是否已加载"""
+        return self.model is not None or self.process_pool is not None
+
+    def _load(self) -> None:
+        """加载模型或创建嵌入工作进程池（只执行一次）"""
+        with self._load_lock:
+            if self.loaded:
+                return
+            if self.backend == "process":
+                self.process_pool = ProcessEmbeddingPool(
+                    self.model_name, batch_size=self.max_batch_size
+                )
+            else:
+                from sentence_transformers import SentenceTransformer
+                self.model = SentenceTransformer(self.model_name, device='cpu')
+
+    def warmup(self) -> None:
+        """预热：加载模型并完成一次编码"""
+        self.encode_sync(["warmup"])
+
+    def encode_sync(self, texts: List[str]) -> np.ndarray:
+        """
+        同步编码（阻塞调用，供LangChain适配器和批处理循环使用）
+
+        Args:
+            texts: 文本列表
+
+        Returns:
+            向量矩阵
+        """
+        if not self.loaded:
+            self._load()
+        if self.process_pool is not None:
+            return self.process_pool.encode(texts)
+        return np.asarray(
+            self.model.encode(texts, batch_size=self.max_batch_size),
+            dtype=np.float32
+        )
+
+    async def encode(self, texts: Union[str, List[str]]) -> np.ndarray:
+        """
+        异步编码，并发的请求会被合并到同一个微批次中
+
+        Args:
+            texts: 单个文本或文本列表
+
+        Returns:
+            单个文本时返回向量，列表时返回向量矩阵
+        """
+        single = isinstance(texts, str)
+        batch = [texts] if single else list(texts)
+        if not batch:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((batch, future))
+        embeddings = await future
+
+        return embeddings[0] if single else embeddings
+
+    def _ensure_worker(self) -> None:
+        """在当前事件循环中启动批处理循环（事件循环变化时重新创建）"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._batch_loop())
+
+    async def _batch_loop(self) -> None:
+        """收集请求直到达到max_batch_size或等待超过max_wait，然后一次性编码"""
+        loop = asyncio.get_running_loop()
+        while True:
+            pending: List[Tuple[List[str], asyncio.Future]] = [await self._queue.get()]
+            count = len(pending[0][0])
+            deadline = loop.time() + self.max_wait
+
+            while count < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                pending.append(item)
+                count += len(item[0])
+
+            texts = [text for batch, _ in pending for text in batch]
+            try:
+                embeddings = await get_executors().run_in_thread(self.encode_sync, texts)
+            except Exception as e:
+                for _, future in pending:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            offset = 0
+            for batch, future in pending:
+                if not future.done():
+                    future.set_result(embeddings[offset:offset + len(batch)])
+                offset += len(batch)
+
+    async def close(self) -> None:
+        """停止批处理循环和嵌入工作进程"""
+        if self._worker and not self._worker.done():
+            self._worker.cancel()
+        self._worker = None
+        if self.process_pool is not None:
+            self.process_pool.shutdown()
+
+
+_services: Dict[str, EmbeddingService] = {}
+_services_lock = threading.Lock()
+
+
+def get_embedding_service(model_name: str = DEFAULT_EMBEDDING_MODEL) -> EmbeddingService:
+    """
+    获取进程级共享的嵌入服务（同一模型只加载一次）
+
+    Args:
+        model_name: 嵌入模型名称
+
+    Returns:
+        嵌入服务实例
+    """
+    with _services_lock:
+        if model_name not in _services:
+            _services[model_name] = EmbeddingService(model_name)
+        return _services[model_name]
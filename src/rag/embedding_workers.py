@@ -0,0 +1,103 @@
+"""
+嵌入工作进程模块
+在进程池的每个工作进程中加载一次模型，文本和向量均通过共享内存传递，避免pickle拷贝
+（本模块只依赖第三方库，便于以spawn方式启动工作进程）
+"""
+import os
+from multiprocessing import shared_memory
+from typing import List, Tuple
+
+import numpy as np
+
+# 工作进程内的模型实例（由init_worker加载）
+_model = None
+
+
+def init_worker(model_name: str) -> None:
+    """
+    工作进程初始化：加载模型，并限制每个进程的计算线程数以避免CPU超额订阅
+
+    Args:
+        model_name: 嵌入模型名称
+    """
+    global _model
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    torch.set_num_threads(int(os.getenv("EMBEDDING_WORKER_THREADS", "1")))
+    _model = SentenceTransformer(model_name, device='cpu')
+
+
+def embedding_dimension() -> int:
+    """返回工作进程中模型的向量维度"""
+    return _model.get_sentence_embedding_dimension()
+
+
+def pack_texts(texts: List[str]) -> shared_memory.SharedMemory:
+    """
+    将文本列表写入共享内存
+
+    布局为 [(n+1)个int64偏移量][UTF-8编码的文本拼接]
+
+    Args:
+        texts: 文本列表
+
+    Returns:
+        共享内存块（调用方负责close和unlink）
+    """
+    encoded = [text.encode("utf-8") for text in texts]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(data) for data in encoded], out=offsets[1:])
+
+    header_size = offsets.nbytes
+    shm = shared_memory.SharedMemory(create=True, size=max(header_size + int(offsets[-1]), 1))
+    shm.buf[:header_size] = offsets.tobytes()
+    shm.buf[header_size:header_size + int(offsets[-1])] = b"".join(encoded)
+    return shm
+
+
+def _unpack_texts(buf: memoryview, count: int, start: int, end: int) -> List[str]:
+    """从共享内存中读取第start到end条文本"""
+    offsets = np.ndarray((count + 1,), dtype=np.int64, buffer=buf)
+    header_size = offsets.nbytes
+    texts = [
+        bytes(buf[header_size + offsets[i]:header_size + offsets[i + 1]]).decode("utf-8")
+        for i in range(start, end)
+    ]
+    del offsets
+    return texts
+
+
+def encode_chunk(
+    input_name: str,
+    output_name: str,
+    shape: Tuple[int, int],
+    start: int,
+    end: int,
+    batch_size: int
+) -> int:
+    """
+    编码共享内存中第start到end条文本，结果写入输出共享内存对应的行
+
+    Args:
+        input_name: 文本共享内存名称
+        output_name: 向量共享内存名称
+        shape: 输出矩阵形状(文本数, 向量维度)
+        start: 起始下标
+        end: 结束下标（不含）
+        batch_size: 模型编码批次大小
+
+    Returns:
+        编码的文本数
+    """
+    input_shm = shared_memory.SharedMemory(name=input_name)
+    output_shm = shared_memory.SharedMemory(name=output_name)
+    try:
+        texts = _unpack_texts(input_shm.buf, shape[0], start, end)
+        output = np.ndarray(shape, dtype=np.float32, buffer=output_shm.buf)
+        output[start:end] = _model.encode(texts, batch_size=batch_size)
+        del output
+    finally:
+        input_shm.close()
+        output_shm.close()
+    return end - start
@@ -0,0 +1,207 @@
+"""
+执行器模块
+为CPU密集型和阻塞型检索工作（向量编码、Chroma检索、XML解析、SQLite读写等）提供
+有界的线程池和进程池，避免阻塞事件循环，并统计队列深度等指标
+"""
+import asyncio
+import functools
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Callable, Dict, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class BoundedExecutor:
+    """有界执行器：同时提交到底层池的任务数不超过max_workers + max_queue，多余的调用在事件循环上等待"""
+
+    def __init__(self, name: str, executor: Executor, max_workers: int, max_queue: int):
+        """
+        初始化有界执行器
+
+        Args:
+            name: 执行器名称（用于指标）
+            executor: 底层线程池或进程池
+            max_workers: 底层池的工作线程/进程数
+            max_queue: 底层池中允许排队的最大任务数
+        """
+        self.name = name
+        self.executor = executor
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+
+        self.waiting = 0  # 等待提交的任务数
+        self.pending = 0  # 已提交、尚未完成的任务数
+        self.completed = 0
+        self.failed = 0
+        self.max_queue_depth = 0
+        self.total_time = 0.0
+
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        """获取当前事件循环的信号量（事件循环变化时重新创建）"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.max_workers + self.max_queue)
+        return self._semaphore
+
+    @property
+    def queue_depth(self) -> int:
+        """当前排队任务数（事件循环上等待的 + 底层池中排队的）"""
+        return self.waiting + max(self.pending - self.max_workers, 0)
+
+    async def run(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        """
+        在底层池中执行函数
+
+        Args:
+            fn: 要执行的函数（进程池要求可pickle）
+            *args, **kwargs: 函数参数
+
+        Returns:
+            函数返回值
+        """
+        semaphore = self._get_semaphore()
+        if semaphore.locked():
+            # 底层池已满，在事件循环上等待
+            self.waiting += 1
+            self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+            try:
+                await semaphore.acquire()
+            finally:
+                self.waiting -= 1
+        else:
+            await semaphore.acquire()
+
+        self.pending += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+        start = time.perf_counter()
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(
+                self.executor, functools.partial(fn, *args, **kwargs)
+            )
+            self.completed += 1
+            return result
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.total_time += time.perf_counter() - start
+            self.pending -= 1
+            semaphore.release()
+
+    def stats(self) -> Dict:
+        """执行器指标"""
+        finished = self.completed + self.failed
+        return {
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "active": min(self.pending, self.max_workers),
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "completed": self.completed,
+            "failed": self.failed,
+            "avg_time_ms": self.total_time / finished * 1000 if finished else 0.0
+        }
+
+    def shutdown(self) -> None:
+        """关闭底层池"""
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class ExecutorManager:
+    """检索执行器管理：线程池用于释放GIL的阻塞调用，进程池用于纯Python的CPU密集型工作"""
+
+    def __init__(
+        self,
+        thread_workers: Optional[int] = None,
+        process_workers: Optional[int] = None,
+        max_queue: Optional[int] = None
+    ):
+        """
+        初始化执行器管理器
+
+        Args:
+            thread_workers: 线程池大小（默认读取RETRIEVAL_THREAD_WORKERS环境变量）
+            process_workers: 进程池大小（默认读取RETRIEVAL_PROCESS_WORKERS环境变量）
+            max_queue: 每个池允许排队的最大任务数（默认读取EXECUTOR_MAX_QUEUE环境变量）
+        """
+        self.thread_workers = thread_workers or int(os.getenv("RETRIEVAL_THREAD_WORKERS", "4"))
+        self.process_workers = process_workers or int(os.getenv("RETRIEVAL_PROCESS_WORKERS", "2"))
+        self.max_queue = max_queue or int(os.getenv("EXECUTOR_MAX_QUEUE", "64"))
+
+        self.threads = BoundedExecutor(
+            "thread",
+            ThreadPoolExecutor(max_workers=self.thread_workers, thread_name_prefix="retrieval"),
+            self.thread_workers,
+            self.max_queue
+        )
+        # 进程池按需创建，避免不需要时启动子进程
+        self._processes: Optional[BoundedExecutor] = None
+        self._lock = threading.Lock()
+
+    @property
+    def processes(self) -> BoundedExecutor:
+        """进程池执行器（首次使用时创建）"""
+        with self._lock:
+            if self._processes is None:
+                self._processes = BoundedExecutor(
+                    "process",
+                    # 使用spawn启动，避免在已有线程（事件循环、线程池）的进程中fork
+                    ProcessPoolExecutor(
+                        max_workers=self.process_workers,
+                        mp_context=multiprocessing.get_context("spawn")
+                    ),
+                    self.process_workers,
+                    self.max_queue
+                )
+            return self._processes
+
+    async def run_in_thread(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        """在线程池中执行阻塞调用"""
+        return await self.threads.run(fn, *args, **kwargs)
+
+    async def run_in_process(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        """在进程池中执行CPU密集型调用（fn和参数必须可pickle）"""
+        return await self.processes.run(fn, *args, **kwargs)
+
+    def stats(self) -> Dict:
+        """所有执行器的指标"""
+        stats = {"thread": self.threads.stats()}
+        if self._processes is not None:
+            stats["process"] = self._processes.stats()
+        return stats
+
+    def shutdown(self) -> None:
+        """关闭所有执行器"""
+        self.threads.shutdown()
+        if self._processes is not None:
+            self._processes.shutdown()
+
+
+_executors: Optional[ExecutorManager] = None
+_executors_lock = threading.Lock()
+
+
+def get_executors() -> ExecutorManager:
+    """获取进程级共享的执行器管理器"""
+    global _executors
+    with _executors_lock:
+        if _executors is None:
+            _executors = ExecutorManager()
+        return _executors
+
+
+def shutdown_executors() -> None:
+    """关闭进程级共享的执行器管理器"""
+    global _executors
+    with _executors_lock:
+        if _executors is not None:
+            _executors.shutdown()
+            _executors = None
@@ -0,0 +1,37 @@
+"""
+跨进程文件锁模块
+多个uvicorn工作进程共享同一份磁盘缓存、索引或镜像时，用fcntl.flock串行化写入
+（不支持fcntl的平台上退化为不加锁，只应以单个工作进程运行）
+"""
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Union
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+@contextmanager
+def file_lock(path: Union[str, Path], exclusive: bool = True) -> Iterator[None]:
+    """
+    持有文件锁（上下文管理器）
+
+    每次调用打开独立的文件描述符，因此同一进程内的不同线程之间同样互斥
+
+    Args:
+        path: 锁文件路径（不存在时创建）
+        exclusive: True为排他锁（写），False为共享锁（读）
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a+b") as f:
+        if fcntl is None:
+            yield
+            return
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
@@ -0,0 +1,295 @@
+"""
+答案生成后端模块
+定义生成后端接口（LangChain聊天模型或本地模拟后端），并通过调度器控制并发生成数、
+每分钟token数（令牌桶）和排队优先级，避免突发请求超出模型服务的速率限制
+"""
+import asyncio
+import hashlib
+import heapq
+import itertools
+import os
+import re
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from src.rag.rate_limit import TokenBucket
+
+# 排队优先级（数值越小越优先）：交互式查询优先于批量查询
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+
+_CHUNK_PATTERN = re.compile(r"\s*\S{1,4}|\s+")
+
+
+class GeneratorBackend:
+    """生成后端接口"""
+
+    # 后端名称（用于指标）
+    name = "base"
+
+    def __init__(self, model_name: str):
+        """
+        Args:
+            model_name: 模型名称（参与LLM补全缓存键的计算）
+        """
+        self.model_name = model_name
+
+    async def generate(self, prompt: str) -> str:
+        """
+        生成完整答案
+
+        Args:
+            prompt: 提示词
+
+        Returns:
+            答案
+        """
+        raise NotImplementedError
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        """
+        流式生成答案（默认一次性产出完整答案）
+
+        Args:
+            prompt: 提示词
+
+        Yields:
+            答案片段
+        """
+        yield await self.generate(prompt)
+
+
+class LangChainBackend(GeneratorBackend):
+    """LangChain聊天模型后端（OpenAI或兼容OpenAI接口的本地模型服务）"""
+
+    name = "langchain"
+
+    def __init__(self, llm, model_name: str):
+        """
+        Args:
+            llm: LangChain聊天模型实例
+            model_name: 模型名称
+        """
+        super().__init__(model_name)
+        self.llm = llm
+
+    async def generate(self, prompt: str) -> str:
+        from langchain_core.messages import HumanMessage
+
+        response = await self.llm.ainvoke([HumanMessage(content=prompt)])
+        return response.content if hasattr(response, 'content') else str(response)
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        from langchain_core.messages import HumanMessage
+
+        async for chunk in self.llm.astream([HumanMessage(content=prompt)]):
+            content = chunk.content if hasattr(chunk, 'content') else str(chunk)
+            if content:
+                yield content
+
+
+class SimulatedBackend(GeneratorBackend):
+    """
+    本地模拟后端：根据提示词确定性地生成答案（摘录上下文），并模拟首token延迟和逐token输出速度，
+    用于离线压测完整流程。相同的提示词总是得到相同的答案和延迟
+    """
+
+    name = "simulated"
+
+    def __init__(
+        self,
+        model_name: str,
+        first_token_latency: Optional[float] = None,
+        tokens_per_second: Optional[float] = None,
+        max_output_tokens: Optional[int] = None
+    ):
+        """
+        Args:
+            model_name: 被模拟的模型名称
+            first_token_latency: 首token延迟（秒，默认读取SIMULATED_LLM_TTFT环境变量）
+            tokens_per_second: 输出速度（每秒token数，默认读取SIMULATED_LLM_TOKENS_PER_SECOND环境变量）
+            max_output_tokens: 最大输出token数（默认读取LLM_MAX_OUTPUT_TOKENS环境变量）
+        """
+        super().__init__(f"simulated:{model_name}")
+        self.first_token_latency = first_token_latency if first_token_latency is not None else float(
+            os.getenv("SIMULATED_LLM_TTFT", "0.3")
+        )
+        self.tokens_per_second = tokens_per_second or float(os.getenv("SIMULATED_LLM_TOKENS_PER_SECOND", "50"))
+        self.max_output_tokens = max_output_tokens or int(os.getenv("LLM_MAX_OUTPUT_TOKENS", "512"))
+
+    def _plan(self, prompt: str) -> Tuple[List[str], float, float]:
+        """
+        根据提示词确定答案片段和延迟
+
+        Returns:
+            (答案片段列表（每段约一个token）, 首token延迟, 每个片段的间隔)
+        """
+        seed = int(hashlib.sha256(prompt.encode("utf-8")).hexdigest(), 16)
+
+        context = prompt.split("上下文信息：", 1)[-1].split("用户问题：", 1)[0]
+        records = [line.strip() for line in context.split("\n\n") if line.strip()]
+        question = prompt.split("用户问题：", 1)[-1].split("\n", 1)[0].strip()
+
+        lines = [f"（本地模拟生成）关于“{question}”，检索到 {len(records)} 条上下文。"]
+        lines.extend(f"- {record[:120]}" for record in records[:3])
+        text = "\n".join(lines)
+
+        chunks = _CHUNK_PATTERN.findall(text)[:self.max_output_tokens]
+        # 按提示词哈希确定 ±20% 的延迟波动
+        jitter = 0.8 + (seed % 1000) / 1000 * 0.4
+        return chunks, self.first_token_latency * jitter, jitter / self.tokens_per_second
+
+    async def generate(self, prompt: str) -> str:
+        chunks, first_token_latency, interval = self._plan(prompt)
+        await asyncio.sleep(first_token_latency + interval * len(chunks))
+        return "".join(chunks)
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        chunks, first_token_latency, interval = self._plan(prompt)
+        await asyncio.sleep(first_token_latency)
+        for i, chunk in enumerate(chunks):
+            if i:
+                await asyncio.sleep(interval)
+            yield chunk
+
+
+class GenerationScheduler:
+    """生成调度器：限制并发生成数，按优先级排队，并按每分钟token数限流"""
+
+    def __init__(
+        self,
+        max_concurrency: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None,
+        max_output_tokens: Optional[int] = None
+    ):
+        """
+        初始化生成调度器
+
+        Args:
+            max_concurrency: 最大并发生成数（默认读取LLM_MAX_CONCURRENCY环境变量）
+            tokens_per_minute: 每分钟token数上限（提示词加预留输出，0表示不限制，默认读取LLM_TOKENS_PER_MINUTE环境变量）
+            max_output_tokens: 每次生成为输出预留的token数（默认读取LLM_MAX_OUTPUT_TOKENS环境变量）
+        """
+        self.max_concurrency = max(max_concurrency or int(os.getenv("LLM_MAX_CONCURRENCY", "8")), 1)
+        if tokens_per_minute is None:
+            tokens_per_minute = int(os.getenv("LLM_TOKENS_PER_MINUTE", "0"))
+        self.tokens_per_minute = tokens_per_minute
+        self.token_bucket = (
+            TokenBucket(tokens_per_minute / 60, tokens_per_minute) if tokens_per_minute > 0 else None
+        )
+        if max_output_tokens is None:
+            max_output_tokens = int(os.getenv("LLM_MAX_OUTPUT_TOKENS", "512"))
+        self.max_output_tokens = max_output_tokens
+
+        self.active = 0
+        # 等待队列：[优先级, 序号, future, 需要的token数, 开始等待token的时间]
+        self._waiters: List[list] = []
+        self._sequence = itertools.count()
+        # 队首请求等待token补充时的定时器
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.completed = 0
+        self.queued_total = 0
+        self.total_queue_wait = 0.0
+        self.max_queue_wait = 0.0
+
+    def _try_take_tokens(self, tokens: int) -> float:
+        """从每分钟token数令牌桶中取令牌，返回还需等待的时间（0表示已取得或不限流）"""
+        if self.token_bucket is None:
+            return 0.0
+        return self.token_bucket.try_acquire(tokens)
+
+    async def _acquire(self, priority: int, tokens: int) -> None:
+        """
+        获取一个并发名额及本次生成所需的token（不满足时按优先级排队）
+
+        名额和token一起按优先级放行：等待token的请求不占用名额，
+        低优先级请求也不会因为先到而抢在高优先级请求之前取得token
+        """
+        if not self._waiters and self.active < self.max_concurrency and not self._try_take_tokens(tokens):
+            self.active += 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, [priority, next(self._sequence), future, tokens, None])
+        self.queued_total += 1
+        start = time.perf_counter()
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # 名额已经分配给本请求时归还
+                self._release()
+            else:
+                # 本请求可能是队首，让后面的请求继续
+                self._dispatch()
+            raise
+        finally:
+            wait = time.perf_counter() - start
+            self.total_queue_wait += wait
+            self.max_queue_wait = max(self.max_queue_wait, wait)
+
+    def _dispatch(self) -> None:
+        """按优先级放行排队的请求：队首请求取得名额和token后出队，token不足时定时重试"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        while self._waiters and self.active < self.max_concurrency:
+            entry = self._waiters[0]
+            future = entry[2]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+
+            wait = self._try_take_tokens(entry[3])
+            if wait:
+                if entry[4] is None:
+                    entry[4] = time.perf_counter()
+                self._timer = asyncio.get_running_loop().call_later(wait, self._dispatch)
+                return
+
+            heapq.heappop(self._waiters)
+            if entry[4] is not None:
+                self.token_bucket.throttled += 1
+                self.token_bucket.total_wait += time.perf_counter() - entry[4]
+            self.active += 1
+            future.set_result(None)
+
+    def _release(self) -> None:
+        """归还名额并放行排队的请求"""
+        self.active -= 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, prompt_tokens: int, priority: int = PRIORITY_INTERACTIVE):
+        """
+        获取生成名额（上下文管理器，退出时归还）
+
+        Args:
+            prompt_tokens: 提示词token数（加上预留输出后计入每分钟token数）
+            priority: 排队优先级（数值越小越优先）
+        """
+        await self._acquire(priority, prompt_tokens + self.max_output_tokens)
+        try:
+            yield
+        finally:
+            self.completed += 1
+            self._release()
+
+    def stats(self) -> Dict:
+        """调度指标"""
+        return {
+            "max_concurrency": self.max_concurrency,
+            "active": self.active,
+            "queued": sum(1 for entry in self._waiters if not entry[2].done()),
+            "completed": self.completed,
+            "queued_total": self.queued_total,
+            "avg_queue_wait": (
+                round(self.total_queue_wait / self.queued_total, 4) if self.queued_total else 0.0
+            ),
+            "max_queue_wait": round(self.max_queue_wait, 4),
+            "tokens_per_minute": self.tokens_per_minute,
+            "token_limit": self.token_bucket.stats() if self.token_bucket else None
+        }
@@ -0,0 +1,147 @@
+"""
+HTTP响应缓存模块
+基于SQLite持久化公共数据库的HTTP响应，支持TTL、ETag/Last-Modified重新验证和空结果负缓存，
+WAL模式下可被多个uvicorn工作进程共享
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+from src.rag.executors import get_executors
+
+
+class CachedResponse:
+    """缓存的HTTP响应"""
+
+    def __init__(
+        self,
+        body: bytes,
+        etag: Optional[str],
+        last_modified: Optional[str],
+        expires_at: float,
+        negative: bool
+    ):
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.expires_at = expires_at
+        self.negative = negative
+
+    def is_fresh(self) -> bool:
+        """是否仍在有效期内"""
+        return self.expires_at > time.time()
+
+
+class HttpResponseCache:
+    """SQLite持久化的HTTP响应缓存"""
+
+    def __init__(self, db_path: Optional[str] = None, retention: Optional[float] = None):
+        """
+        初始化HTTP响应缓存
+
+        Args:
+            db_path: SQLite文件路径（默认读取HTTP_CACHE_PATH环境变量）
+            retention: 过期条目保留时长（秒，保留期内仍可用于重新验证，默认读取HTTP_CACHE_RETENTION环境变量）
+        """
+        self.db_path = Path(db_path or os.getenv("HTTP_CACHE_PATH", "./data/http_cache.sqlite3"))
+        self.retention = retention or float(os.getenv("HTTP_CACHE_RETENTION", "604800"))
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    url TEXT NOT NULL,
+                    body BLOB NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT,
+                    expires_at REAL NOT NULL,
+                    negative INTEGER NOT NULL DEFAULT 0
+                )
+                """
+            )
+            conn.execute(
+                "DELETE FROM responses WHERE expires_at < ?",
+                (time.time() - self.retention,)
+            )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """每次操作使用独立连接（事务结束后提交并关闭），避免跨线程/跨进程共享连接"""
+        conn = sqlite3.connect(self.db_path, timeout=30.0)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def make_key(method: str, url: str, params: Optional[Dict] = None) -> str:
+        """根据请求方法、URL和参数计算缓存键"""
+        payload = json.dumps([method.upper(), url, params or {}], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _get(self, key: str) -> Optional[CachedResponse]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT body, etag, last_modified, expires_at, negative FROM responses WHERE key = ?",
+                (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return CachedResponse(row[0], row[1], row[2], row[3], bool(row[4]))
+
+    def _put(
+        self,
+        key: str,
+        url: str,
+        body: bytes,
+        etag: Optional[str],
+        last_modified: Optional[str],
+        ttl: float,
+        negative: bool
+    ) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses "
+                "(key, url, body, etag, last_modified, expires_at, negative) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, url, body, etag, last_modified, time.time() + ttl, int(negative))
+            )
+
+    def _touch(self, key: str, ttl: float) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE responses SET expires_at = ? WHERE key = ?",
+                (time.time() + ttl, key)
+            )
+
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        """读取缓存条目（包括已过期但可重新验证的条目）"""
+        return await get_executors().run_in_thread(self._get, key)
+
+    async def put(
+        self,
+        key: str,
+        url: str,
+        body: bytes,
+        etag: Optional[str],
+        last_modified: Optional[str],
+        ttl: float,
+        negative: bool = False
+    ) -> None:
+        """写入缓存条目"""
+        await get_executors().run_in_thread(
+            self._put, key, url, body, etag, last_modified, ttl, negative
+        )
+
+    async def touch(self, key: str, ttl: float) -> None:
+        """重新验证成功（304）后延长缓存有效期"""
+        await get_executors().run_in_thread(self._touch, key, ttl)
@@ -0,0 +1,275 @@
+"""
+共享HTTP传输模块
+所有对外HTTP请求（公共数据库、biobank API）共用一个httpx客户端：按主机划分连接池并限制每个主机的连接数，
+服务器支持时使用HTTP/2，可调整keepalive，启动时预建连接，按主机限流，合并相同的并发请求，并统计连接池指标
+"""
+import asyncio
+import importlib.util
+import os
+import threading
+import weakref
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from src.rag.rate_limit import SingleFlight, TokenBucket
+
+# 预建连接的超时（秒），避免不可达的主机拖慢预热
+PREWARM_TIMEOUT = 5.0
+
+
+class HostPoolStats:
+    """单个主机连接池的统计"""
+
+    def __init__(self):
+        self.requests = 0
+        self.failed = 0
+        self.in_flight = 0
+        self.connections_opened = 0
+        # 已统计过的连接（连接关闭回收后自动移除）
+        self.seen_connections: "weakref.WeakSet" = weakref.WeakSet()
+
+
+class PooledTransport(httpx.AsyncBaseTransport):
+    """按主机路由的传输层：每个主机一个独立的连接池（连接数上限按主机计算）"""
+
+    def __init__(
+        self,
+        max_connections_per_host: int,
+        max_keepalive_per_host: int,
+        keepalive_expiry: float,
+        http2: bool
+    ):
+        """
+        初始化传输层
+
+        Args:
+            max_connections_per_host: 每个主机的最大连接数
+            max_keepalive_per_host: 每个主机保留的最大空闲连接数
+            keepalive_expiry: 空闲连接保留时间（秒）
+            http2: 是否启用HTTP/2（服务器不支持时自动协商为HTTP/1.1）
+        """
+        self.limits = httpx.Limits(
+            max_connections=max_connections_per_host,
+            max_keepalive_connections=max_keepalive_per_host,
+            keepalive_expiry=keepalive_expiry
+        )
+        self.http2 = http2
+        self.transports: Dict[str, httpx.AsyncHTTPTransport] = {}
+        self.host_stats: Dict[str, HostPoolStats] = {}
+        self.rate_limits: Dict[str, TokenBucket] = {}
+
+    def set_rate_limit(self, host: str, rate: float, burst: int) -> None:
+        """
+        设置主机的请求速率上限（同一主机被多次配置时取更严格的限制）；
+        令牌由调用方在计时之前通过SharedHttpClient.acquire_rate_limit获取
+
+        Args:
+            host: 主机（scheme://netloc）
+            rate: 每秒请求数上限
+            burst: 允许的突发请求数
+        """
+        bucket = self.rate_limits.get(host)
+        if bucket is None or rate < bucket.rate or (rate == bucket.rate and burst < bucket.burst):
+            self.rate_limits[host] = TokenBucket(rate, burst)
+
+    def _get_transport(self, host: str) -> httpx.AsyncHTTPTransport:
+        """获取（必要时创建）主机对应的连接池"""
+        if host not in self.transports:
+            self.transports[host] = httpx.AsyncHTTPTransport(limits=self.limits, http2=self.http2)
+            self.host_stats[host] = HostPoolStats()
+        return self.transports[host]
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        """将请求交给对应主机的连接池，并更新统计"""
+        host = f"{request.url.scheme}://{request.url.netloc.decode('ascii')}"
+        transport = self._get_transport(host)
+        stats = self.host_stats[host]
+
+        stats.requests += 1
+        stats.in_flight += 1
+        try:
+            return await transport.handle_async_request(request)
+        except Exception:
+            stats.failed += 1
+            raise
+        finally:
+            stats.in_flight -= 1
+            self._count_new_connections(transport, stats)
+
+    @staticmethod
+    def _connections(transport: httpx.AsyncHTTPTransport) -> List:
+        """连接池中的连接（依赖httpcore连接池的connections属性，不可用时返回空列表）"""
+        pool = getattr(transport, "_pool", None)
+        return list(getattr(pool, "connections", []))
+
+    def _count_new_connections(self, transport: httpx.AsyncHTTPTransport, stats: HostPoolStats) -> None:
+        """统计新建立的连接数"""
+        for connection in self._connections(transport):
+            if connection not in stats.seen_connections:
+                stats.seen_connections.add(connection)
+                stats.connections_opened += 1
+
+    def stats(self) -> Dict:
+        """各主机连接池的指标"""
+        hosts = {}
+        for host, transport in self.transports.items():
+            stats = self.host_stats[host]
+            connections = self._connections(transport)
+            hosts[host] = {
+                "requests": stats.requests,
+                "failed": stats.failed,
+                "in_flight": stats.in_flight,
+                "connections": len(connections),
+                "idle_connections": sum(1 for c in connections if c.is_idle()),
+                "http2_connections": sum(1 for c in connections if "HTTP/2" in c.info()),
+                "connections_opened": stats.connections_opened,
+                # 每次新建连接平均服务的请求数，越高说明连接复用越充分
+                "requests_per_connection": (
+                    round(stats.requests / stats.connections_opened, 2)
+                    if stats.connections_opened else None
+                ),
+                "rate_limit": self.rate_limits[host].stats() if host in self.rate_limits else None
+            }
+        return hosts
+
+    async def aclose(self) -> None:
+        """关闭所有主机的连接池"""
+        await asyncio.gather(
+            *(transport.aclose() for transport in self.transports.values()),
+            return_exceptions=True
+        )
+        self.transports = {}
+
+
+class SharedHttpClient:
+    """进程级共享的HTTP客户端"""
+
+    def __init__(
+        self,
+        timeout: Optional[float] = None,
+        max_connections_per_host: Optional[int] = None,
+        max_keepalive_per_host: Optional[int] = None,
+        keepalive_expiry: Optional[float] = None,
+        http2: Optional[bool] = None
+    ):
+        """
+        初始化共享HTTP客户端
+
+        Args:
+            timeout: 请求超时（秒，默认读取HTTP_TIMEOUT环境变量）
+            max_connections_per_host: 每个主机的最大连接数（默认读取HTTP_MAX_CONNECTIONS_PER_HOST环境变量）
+            max_keepalive_per_host: 每个主机保留的最大空闲连接数（默认读取HTTP_MAX_KEEPALIVE_PER_HOST环境变量）
+            keepalive_expiry: 空闲连接保留时间（秒，默认读取HTTP_KEEPALIVE_EXPIRY环境变量）
+            http2: 是否启用HTTP/2（默认读取HTTP2_ENABLED环境变量；未安装h2时自动关闭）
+        """
+        self.timeout = timeout or float(os.getenv("HTTP_TIMEOUT", "30"))
+        if http2 is None:
+            http2 = os.getenv("HTTP2_ENABLED", "true").lower() == "true"
+        if http2 and importlib.util.find_spec("h2") is None:
+            print("未安装h2（pip install httpx[http2]），HTTP客户端使用HTTP/1.1")
+            http2 = False
+        self.http2 = http2
+
+        self.transport = PooledTransport(
+            max_connections_per_host or int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", "20")),
+            max_keepalive_per_host or int(os.getenv("HTTP_MAX_KEEPALIVE_PER_HOST", "10")),
+            keepalive_expiry or float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60")),
+            http2
+        )
+        self.client = httpx.AsyncClient(transport=self.transport, timeout=self.timeout)
+        self.prewarmed: Dict[str, Optional[str]] = {}
+        # 相同的并发请求（同一检索词、同一biobank分页）只发出一次
+        self.single_flight = SingleFlight()
+
+    def set_rate_limit(self, url: str, rate: float, burst: int) -> None:
+        """
+        按URL所在主机设置请求速率上限
+
+        Args:
+            url: 数据库的URL（只使用scheme和netloc）
+            rate: 每秒请求数上限（不大于0时不限制）
+            burst: 允许的突发请求数
+        """
+        parts = urlsplit(url)
+        if rate > 0 and parts.scheme in ("http", "https") and parts.netloc:
+            self.transport.set_rate_limit(f"{parts.scheme}://{parts.netloc}", rate, burst)
+
+    async def acquire_rate_limit(self, url: str) -> float:
+        """
+        获取URL所在主机的速率限制令牌（该主机没有限制时立即返回）
+
+        在请求计时之外调用：排队等待令牌的时间不计入请求超时、对冲延迟和延迟统计
+
+        Args:
+            url: 请求URL
+
+        Returns:
+            等待令牌的时间（秒）
+        """
+        parts = urlsplit(url)
+        bucket = self.transport.rate_limits.get(f"{parts.scheme}://{parts.netloc}")
+        return await bucket.acquire() if bucket is not None else 0.0
+
+    async def prewarm(self, urls: List[str]) -> None:
+        """
+        预建连接：向每个主机发送一次HEAD请求，提前完成DNS解析、TCP和TLS握手，连接保留在池中供后续请求复用
+
+        Args:
+            urls: 需要预建连接的URL（按主机去重，失败只记录不抛出）
+        """
+        origins = list(dict.fromkeys(
+            f"{parts.scheme}://{parts.netloc}"
+            for parts in map(urlsplit, urls)
+            if parts.scheme in ("http", "https") and parts.netloc
+        ))
+
+        async def warm(origin: str) -> None:
+            try:
+                await self.client.head(origin, timeout=min(self.timeout, PREWARM_TIMEOUT))
+                self.prewarmed[origin] = None
+            except Exception as e:
+                self.prewarmed[origin] = str(e)
+
+        await asyncio.gather(*(warm(origin) for origin in origins))
+
+    def stats(self) -> Dict:
+        """连接池指标"""
+        return {
+            "http2": self.http2,
+            "limits": {
+                "max_connections_per_host": self.transport.limits.max_connections,
+                "max_keepalive_per_host": self.transport.limits.max_keepalive_connections,
+                "keepalive_expiry": self.transport.limits.keepalive_expiry
+            },
+            "prewarmed": self.prewarmed,
+            "single_flight": self.single_flight.stats(),
+            "hosts": self.transport.stats()
+        }
+
+    async def aclose(self) -> None:
+        """关闭客户端及所有连接池"""
+        await self.client.aclose()
+
+
+_http_client: Optional[SharedHttpClient] = None
+_http_client_lock = threading.Lock()
+
+
+def get_http_client() -> SharedHttpClient:
+    """获取进程级共享的HTTP客户端"""
+    global _http_client
+    with _http_client_lock:
+        if _http_client is None:
+            _http_client = SharedHttpClient()
+        return _http_client
+
+
+async def close_http_client() -> None:
+    """关闭进程级共享的HTTP客户端"""
+    global _http_client
+    with _http_client_lock:
+        client, _http_client = _http_client, None
+    if client is not None:
+        await client.aclose()
@@ -0,0 +1,27 @@
+"""
+LangChain嵌入适配器模块
+将共享嵌入服务包装为LangChain Embeddings接口（供Chroma等向量库使用），
+单独成模块以便只在需要时导入LangChain
+"""
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+
+class SharedEmbeddings(Embeddings):
+    """LangChain Embeddings适配器"""
+
+    def __init__(self, service):
+        """
+        Args:
+            service: 共享嵌入服务（EmbeddingService）
+        """
+        self.service = service
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """编码文档列表"""
+        return self.service.encode_sync(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        """编码查询"""
+        return self.service.encode_sync([text])[0].tolist()
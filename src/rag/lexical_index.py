@@ -0,0 +1,197 @@
+"""
+词法索引模块
+提供保留变异记号（基因符号、rsID、HGVS、染色体坐标等）的分词器、BM25倒排索引，
+以及向量检索与词法检索结果的倒数排名融合（RRF）
+"""
+import json
+import math
+import re
+import threading
+from array import array
+from typing import Dict, List, Set, Tuple
+
+import numpy as np
+
+# 以字母数字开头和结尾、中间允许变异记号常用连接符的记号，例如
+# BRCA1、rs121913529、p.V600E、c.68_69delAG、NM_000546.5:c.215C>G、chr7:140453136A>T
+_TOKEN_PATTERN = re.compile(
+    r"[A-Za-z0-9](?:[A-Za-z0-9.:_>+\-*/=]*[A-Za-z0-9*=])?|[一-鿿]+"
+)
+# p.(Arg175His) 写法去掉括号，与 p.Arg175His 视为同一记号
+_PROTEIN_PARENTHESES = re.compile(r"p\.\(([^()\s]+)\)")
+# 复合记号按这些分隔符拆出子记号（例如转录本与c.写法分别可检索）
+_SUBTOKEN_SEPARATORS = re.compile(r"[:/\-]")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    分词：变异记号保持完整（同时拆出子记号），中文按二元组切分，统一转为小写
+
+    Args:
+        text: 文本
+
+    Returns:
+        记号列表
+    """
+    text = _PROTEIN_PARENTHESES.sub(r"p.\1", text)
+    tokens = []
+    for match in _TOKEN_PATTERN.finditer(text):
+        token = match.group().lower()
+        if "一" <= token[0] <= "鿿":
+            tokens.extend(token[i:i + 2] for i in range(max(len(token) - 1, 1)))
+            continue
+        tokens.append(token)
+        if _SUBTOKEN_SEPARATORS.search(token):
+            tokens.extend(
+                part for part in _SUBTOKEN_SEPARATORS.split(token)
+                if len(part) > 1 and part != token
+            )
+    return tokens
+
+
+class BM25Index:
+    """内存中的BM25倒排索引，文档id按插入顺序递增，支持增量插入"""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        """
+        初始化BM25索引
+
+        Args:
+            k1: 词频饱和参数
+            b: 文档长度归一化参数
+        """
+        self.k1 = k1
+        self.b = b
+        # 记号 -> (文档id数组, 词频数组)，使用array以便零拷贝转换为NumPy数组
+        self.postings: Dict[str, Tuple[array, array]] = {}
+        self.doc_lengths = array("i")
+        self.total_length = 0
+        self._lock = threading.Lock()
+
+    @property
+    def size(self) -> int:
+        """已索引的文档数"""
+        return len(self.doc_lengths)
+
+    def add(self, texts: List[str]) -> None:
+        """
+        追加文档
+
+        Args:
+            texts: 文档文本列表
+        """
+        tokenized = [tokenize(text) for text in texts]
+        with self._lock:
+            for tokens in tokenized:
+                doc_id = len(self.doc_lengths)
+                counts: Dict[str, int] = {}
+                for token in tokens:
+                    counts[token] = counts.get(token, 0) + 1
+                for token, count in counts.items():
+                    if token not in self.postings:
+                        self.postings[token] = (array("i"), array("i"))
+                    ids, freqs = self.postings[token]
+                    ids.append(doc_id)
+                    freqs.append(count)
+                self.doc_lengths.append(len(tokens))
+                self.total_length += len(tokens)
+
+    def clear(self) -> None:
+        """清空索引"""
+        with self._lock:
+            self.postings = {}
+            self.doc_lengths = array("i")
+            self.total_length = 0
+
+    def search(self, query: str, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        BM25检索
+
+        Args:
+            query: 查询文本
+            k: 返回结果数
+
+        Returns:
+            (文档id数组, BM25得分数组)，按得分降序，只包含至少命中一个查询记号的文档
+        """
+        terms = set(tokenize(query))
+        empty = (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32))
+        with self._lock:
+            if not self.size or not terms:
+                return empty
+            scores = self._score(terms)
+
+        matched = np.flatnonzero(scores)
+        if not len(matched):
+            return empty
+
+        values = scores[matched]
+        k = min(k, len(matched))
+        top = np.argpartition(-values, k - 1)[:k]
+        top = top[np.argsort(-values[top])]
+        return matched[top].astype(np.int64), values[top]
+
+    def _score(self, terms: Set[str]) -> np.ndarray:
+        """
+        计算所有文档的BM25得分（调用方持有锁；array上的NumPy视图在返回前释放，不影响后续追加）
+
+        Args:
+            terms: 查询记号集合
+
+        Returns:
+            每个文档的得分（未命中任何记号的文档为0）
+        """
+        size = self.size
+        avg_length = self.total_length / size
+        doc_lengths = np.frombuffer(self.doc_lengths, dtype=np.int32)
+        scores = np.zeros(size, dtype=np.float32)
+        for term in terms:
+            if term not in self.postings:
+                continue
+            ids = np.frombuffer(self.postings[term][0], dtype=np.int32)
+            freqs = np.frombuffer(self.postings[term][1], dtype=np.int32).astype(np.float32)
+            idf = math.log(1 + (size - len(ids) + 0.5) / (len(ids) + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * doc_lengths[ids] / avg_length)
+            # 同一记号的倒排列表中文档id不重复，可以直接按下标累加
+            scores[ids] += idf * freqs * (self.k1 + 1) / (freqs + norm)
+        return scores
+
+
+def matches_terms(text: str, terms: Set[str]) -> bool:
+    """文本是否至少包含一个查询记号"""
+    return not terms.isdisjoint(tokenize(text))
+
+
+def result_key(result: Dict) -> str:
+    """检索结果的记录键（内容和元数据相同即为同一记录）"""
+    return json.dumps(
+        [result.get("content"), result.get("metadata")],
+        sort_keys=True, ensure_ascii=False, default=str
+    )
+
+
+def reciprocal_rank_fusion(
+    result_lists: List[List[Dict]],
+    k: int,
+    rrf_k: int = 60
+) -> List[Dict]:
+    """
+    倒数排名融合：同一记录（内容和元数据相同）在各结果列表中的得分为 1 / (rrf_k + 排名) 之和
+
+    Args:
+        result_lists: 各检索方式的结果列表（按相关度降序）
+        k: 返回结果数
+        rrf_k: 排名平滑常数
+
+    Returns:
+        融合后的结果列表，score为融合得分
+    """
+    fused: Dict[str, Tuple[float, Dict]] = {}
+    for results in result_lists:
+        for rank, result in enumerate(results, start=1):
+            key = result_key(result)
+            score, record = fused.get(key, (0.0, result))
+            fused[key] = (score + 1.0 / (rrf_k + rank), record)
+
+    ranked = sorted(fused.values(), key=lambda entry: -entry[0])[:k]
+    return [dict(record, score=score) for score, record in ranked]
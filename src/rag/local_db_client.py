@@ -2,24 +2,50 @@
 本地数据库HTTP API客户端模块
 负责通过HTTP API访问本地数据库
 """
-from typing import List, Dict, Optional
+import asyncio
+import heapq
+import itertools
+from typing import List, Dict, Optional, Set, Tuple
 import httpx
-from sentence_transformers import SentenceTransformer
 import numpy as np
 
 from src.config.database_manager import LocalDatabase
+from src.rag.local_mirror import LocalMirror
+from src.rag.ann_index import FlatIndex, load_index
+from src.rag.lexical_index import BM25Index, matches_terms, tokenize
+from src.rag.variant_index import Variant, VariantIndex, record_variants
+from src.rag.query_filters import QueryFilters
+from src.rag.embedding_cache import get_embedding_cache
+from src.rag.embedding_service import EmbeddingService, get_embedding_service
+from src.rag.executors import get_executors
+from src.rag.http_transport import get_http_client
+from src.rag.http_cache import HttpResponseCache
 
 
 class LocalDatabaseClient:
     """本地数据库HTTP API客户端"""
     
-    def __init__(self):
-        """初始化本地数据库客户端"""
-        self.http_client = httpx.AsyncClient(timeout=30.0)
-        # 用于计算相似度的嵌入模型
-        self.embedding_model = SentenceTransformer(
-            'paraphrase-multilingual-MiniLM-L12-v2'
-        )
+    def __init__(self, embedding_service: Optional[EmbeddingService] = None):
+        """
+        初始化本地数据库客户端
+        
+        Args:
+            embedding_service: 共享嵌入服务（None表示使用进程级默认实例）
+        """
+        # 进程级共享的HTTP客户端（按主机连接池、HTTP/2、keepalive）
+        self.http_client = get_http_client().client
+        # 按数据库名称缓存的本地镜像
+        self.mirrors: Dict[str, LocalMirror] = {}
+        # 按数据库名称缓存的镜像向量索引（与镜像记录按下标对齐）
+        self.indexes: Dict[str, FlatIndex] = {}
+        # 按数据库名称缓存的镜像BM25索引（与镜像记录按下标对齐）
+        self.lexical_indexes: Dict[str, BM25Index] = {}
+        # 按数据库名称缓存的镜像变异结构化索引（与镜像记录按下标对齐）
+        self.variant_indexes: Dict[str, VariantIndex] = {}
+        # 用于计算相似度的嵌入服务（进程内共享同一份模型）
+        self.embedding_service = embedding_service or get_embedding_service()
+        # 持久化的嵌入向量缓存，只有未见过的内容才需要重新编码
+        self.embedding_cache = get_embedding_cache(self.embedding_service.model_name)
     
     def _build_url(self, base_url: str, database_id: str, token: str) -> str:
         """
@@ -41,104 +67,497 @@ class LocalDatabaseClient:
         self,
         db_config: LocalDatabase,
         query: str,
-        k: int = 5
+        k: int = 5,
+        filters: Optional[QueryFilters] = None
     ) -> List[Dict]:
         """
-        通过HTTP API搜索本地数据库（获取所有数据，不限制数量）
+        搜索本地数据库（在增量同步后的本地镜像上检索，未启用镜像时流式检索）
+        
+        有按filter_fields映射的过滤条件时，启用镜像则在镜像记录上筛出匹配的子集后排序；
+        未启用镜像则通过filtersIn发送给API，只流式拉取并排序匹配的子集
         
         Args:
             db_config: 本地数据库配置
             query: 查询问题（用于后续相似度搜索，如果API不支持直接查询）
             k: 返回结果数量（用于相似度排序后的top k）
+            filters: 查询过滤条件（按filter_fields映射）
             
         Returns:
             搜索结果列表
         """
+        self._validate_config(db_config)
+        
+        filters_in = filters.to_filters_in(db_config.filter_fields) if filters else []
+        if not db_config.mirror:
+            query_embeddings = None
+            if query and query.strip():
+                query_embedding = await self.embedding_service.encode(query)
+                query_embeddings = query_embedding[np.newaxis, :]
+            prefilter_terms = set(tokenize(query)) if db_config.lexical_prefilter else None
+            results = await self._search_streaming(
+                db_config, query_embeddings, 1, k, prefilter_terms, filters_in
+            )
+            return results[0]
+        
+        try:
+            mirror = await self.sync_mirror(db_config)
+        except httpx.HTTPStatusError as e:
+            return [{"error": f"HTTP错误 {e.response.status_code}: {str(e)}"}]
+        except Exception as e:
+            return [{"error": f"搜索失败: {str(e)}"}]
+        
+        all_items = mirror.items
+        
+        # 如果没有获取到数据，返回空结果
+        if not all_items:
+            return []
+        
+        if filters_in:
+            return await self._search_filtered(db_config, mirror, query, k, filters)
+        
+        # 如果提供了查询字符串，进行相似度搜索排序
+        if query and query.strip():
+            # 使用向量索引检索相似度最高的记录
+            results = await self._rank_by_similarity(db_config, mirror, query, k)
+        else:
+            # 如果没有查询字符串，返回所有数据（限制为k条）
+            results = []
+            for item in all_items[:k]:
+                results.append(self._format_item(item))
+        
+        return results
+    
+    async def search_database_many(
+        self,
+        db_config: LocalDatabase,
+        queries: List[str],
+        query_embeddings: np.ndarray,
+        k: int = 5
+    ) -> List[List[Dict]]:
+        """
+        批量搜索本地数据库：镜像只同步一次，所有查询共用同一份记录向量
+        
+        Args:
+            db_config: 本地数据库配置
+            queries: 查询问题列表
+            query_embeddings: 与queries一一对应的查询向量矩阵
+            k: 每个查询返回结果数量
+            
+        Returns:
+            与queries一一对应的搜索结果列表
+        """
+        self._validate_config(db_config)
+        
+        if not db_config.mirror:
+            prefilter_terms = None
+            if db_config.lexical_prefilter:
+                prefilter_terms = set(token for query in queries for token in tokenize(query))
+            return await self._search_streaming(
+                db_config, query_embeddings, len(queries), k, prefilter_terms
+            )
+        
+        try:
+            mirror = await self.sync_mirror(db_config)
+        except httpx.HTTPStatusError as e:
+            return [[{"error": f"HTTP错误 {e.response.status_code}: {str(e)}"}] for _ in queries]
+        except Exception as e:
+            return [[{"error": f"搜索失败: {str(e)}"}] for _ in queries]
+        
+        all_items = mirror.items
+        if not all_items:
+            return [[] for _ in queries]
+        
+        try:
+            return await self._search_index(db_config, mirror, query_embeddings, k)
+        except Exception as e:
+            # 如果相似度计算失败，返回前k条数据
+            return [[self._format_item(item) for item in all_items[:k]] for _ in queries]
+    
+    def _validate_config(self, db_config: LocalDatabase) -> None:
+        """检查http_api数据库的必填配置"""
         if not db_config.base_url or not db_config.database_id:
             raise ValueError(f"数据库 {db_config.name} 缺少base_url或database_id配置")
         
         if not db_config.token:
             raise ValueError(f"数据库 {db_config.name} 缺少token配置")
+    
+    async def _get_mirror(self, db_config: LocalDatabase) -> LocalMirror:
+        """获取（必要时在线程池中加载）数据库对应的本地镜像"""
+        if db_config.name not in self.mirrors:
+            mirror = await get_executors().run_in_thread(LocalMirror, db_config)
+            self.mirrors.setdefault(db_config.name, mirror)
+        return self.mirrors[db_config.name]
+    
+    async def sync_mirror(self, db_config: LocalDatabase) -> LocalMirror:
+        """
+        增量同步本地镜像：只拉取上次同步之后新增的记录
         
-        # 构建URL（根据示例代码格式）
-        url = self._build_url(db_config.base_url, db_config.database_id, db_config.token)
+        镜像未过期时直接返回；其他工作进程刚同步过时直接使用其写入的记录；
+        同步失败但镜像已有数据时，继续使用旧数据。镜像文件的读写在线程池中执行
         
-        # 构建请求头
-        headers = {
-            "Content-Type": "application/json"
-        }
+        增量同步假设远端记录只追加：已镜像记录在远端被修改不会被发现。API返回的总记录数
+        少于已镜像的记录数时（记录被删除，已镜像的下标不再对应远端记录），清空镜像和索引后全量重新同步
         
-        try:
-            # 获取所有数据（分页循环）
-            all_items = []
-            page = 1
-            limit = 100  # 每页获取100条，可以根据实际情况调整
-            skip = 0
+        Args:
+            db_config: 本地数据库配置
             
-            while True:
-                # 构建请求体（根据示例代码格式）
-                params = {
-                    "filterOption": {
-                        "filters": {
-                            "workflow": db_config.database_id,
-                            "filtersIn": []
-                        },
-                        "skip": skip,
-                        "page": page,
-                        "type": "detail",
-                        "limit": limit
-                    }
-                }
-                
-                # 使用POST请求（根据示例代码）
-                response = await self.http_client.post(url, json=params, headers=headers)
-                response.raise_for_status()
-                
-                # 解析响应
-                data = response.json()
+        Returns:
+            同步后的本地镜像
+        """
+        mirror = await self._get_mirror(db_config)
+        executors = get_executors()
+        
+        async with mirror.lock:
+            if not mirror.is_stale():
+                return mirror
+            
+            await executors.run_in_thread(mirror.refresh)
+            if not mirror.is_stale():
+                return mirror
+            
+            # 构建URL（根据示例代码格式）
+            url = self._build_url(db_config.base_url, db_config.database_id, db_config.token)
+            limit = db_config.page_size
+            
+            # 从已镜像记录所在页的页首开始拉取，该页中已镜像的部分在追加时跳过
+            page = mirror.count // limit + 1
+            
+            try:
+                # 首页顺序拉取，同时获取总记录数（如果API返回）
+                items, total = await self._fetch_page(url, db_config, page, limit)
+                if total is not None and total < mirror.count:
+                    print(f"数据库 {db_config.name} 的记录数减少（{mirror.count} -> {total}），全量重新同步镜像")
+                    await self._reset_mirror(db_config, mirror)
+                    page = 1
+                    items, total = await self._fetch_page(url, db_config, page, limit)
+                await executors.run_in_thread(mirror.append, items, (page - 1) * limit)
                 
-                # 提取结果
-                if isinstance(data, dict) and "results" in data:
-                    items = data["results"]
-                elif isinstance(data, list):
-                    items = data
-                else:
-                    items = []
+                # 如果返回的数据少于limit，说明已经是最后一页
+                finished = len(items) < limit
+                page += 1
                 
-                # 如果没有更多数据，退出循环
-                if not items:
+                while not finished:
+                    if total is not None:
+                        # 已知总数：剩余页全部并发拉取
+                        page_count = -(-total // limit) - page + 1
+                    else:
+                        # 未知总数：每轮并发预取fetch_concurrency页
+                        page_count = db_config.fetch_concurrency
+                    
+                    if page_count <= 0:
+                        break
+                    
+                    pages = await self._fetch_pages(url, db_config, page, page_count, limit)
+                    
+                    # 按页序追加，遇到不满一页的数据即结束
+                    for offset, items in enumerate(pages):
+                        await executors.run_in_thread(mirror.append, items, (page + offset - 1) * limit)
+                        if len(items) < limit:
+                            finished = True
+                            break
+                    
+                    if total is not None:
+                        break
+                    page += page_count
+            except Exception as e:
+                if not mirror.count:
+                    raise
+                print(f"同步镜像 {db_config.name} 失败，使用已有镜像数据: {str(e)}")
+                return mirror
+            
+            await executors.run_in_thread(mirror.mark_synced)
+        
+        return mirror
+    
+    async def _reset_mirror(self, db_config: LocalDatabase, mirror: LocalMirror) -> None:
+        """
+        清空镜像及其向量、词法和变异索引（调用方持有mirror.lock）
+        
+        Args:
+            db_config: 本地数据库配置
+            mirror: 本地镜像
+        """
+        executors = get_executors()
+        await executors.run_in_thread(mirror.reset)
+        
+        index = self.indexes.get(db_config.name)
+        if index is None:
+            index = await executors.run_in_thread(
+                load_index, db_config, mirror.directory / "index",
+                self.embedding_service.model_name
+            )
+            self.indexes[db_config.name] = index
+        await executors.run_in_thread(index.clear)
+        
+        for indexes in (self.lexical_indexes, self.variant_indexes):
+            if db_config.name in indexes:
+                indexes[db_config.name].clear()
+    
+    async def _search_streaming(
+        self,
+        db_config: LocalDatabase,
+        query_embeddings: Optional[np.ndarray],
+        query_count: int,
+        k: int,
+        prefilter_terms: Optional[Set[str]] = None,
+        filters_in: Optional[List[Dict]] = None
+    ) -> List[List[Dict]]:
+        """
+        不使用本地镜像，直接在API分页数据上检索
+        
+        Args:
+            db_config: 本地数据库配置
+            query_embeddings: 查询向量矩阵（None表示没有查询字符串，直接返回前k条）
+            query_count: 查询数量
+            k: 每个查询返回结果数量
+            prefilter_terms: 词法预过滤的查询记号（None表示不过滤）
+            filters_in: 下推给API的filtersIn条件
+            
+        Returns:
+            与查询一一对应的搜索结果列表
+        """
+        try:
+            if query_embeddings is None:
+                url = self._build_url(db_config.base_url, db_config.database_id, db_config.token)
+                items, _ = await self._fetch_page(url, db_config, 1, k, filters_in)
+                return [[self._format_item(item) for item in items[:k]] for _ in range(query_count)]
+            return await self.stream_top_k(
+                db_config, query_embeddings, k, prefilter_terms, filters_in
+            )
+        except httpx.HTTPStatusError as e:
+            return [[{"error": f"HTTP错误 {e.response.status_code}: {str(e)}"}] for _ in range(query_count)]
+        except Exception as e:
+            return [[{"error": f"搜索失败: {str(e)}"}] for _ in range(query_count)]
+    
+    async def stream_top_k(
+        self,
+        db_config: LocalDatabase,
+        query_embeddings: np.ndarray,
+        k: int,
+        prefilter_terms: Optional[Set[str]] = None,
+        filters_in: Optional[List[Dict]] = None
+    ) -> List[List[Dict]]:
+        """
+        流式top k检索：后台任务持续拉取分页数据，每页到达后立即编码、打分并并入各查询的top k堆，
+        随后丢弃该页，峰值内存为O(页大小 × 预取页数 + k)
+        
+        Args:
+            db_config: 本地数据库配置
+            query_embeddings: 查询向量矩阵（每行一个查询）
+            k: 每个查询返回top k结果
+            prefilter_terms: 词法预过滤的查询记号，只编码至少包含一个记号的记录（None或空集合表示不过滤）
+            filters_in: 下推给API的filtersIn条件，只拉取匹配的记录
+            
+        Returns:
+            与查询一一对应的排序结果列表
+        """
+        executors = get_executors()
+        url = self._build_url(db_config.base_url, db_config.database_id, db_config.token)
+        limit = db_config.page_size
+        concurrency = max(db_config.fetch_concurrency, 1)
+        
+        # 拉取的页通过有界队列交给打分循环，拉取和打分互相重叠
+        pages: asyncio.Queue = asyncio.Queue(maxsize=concurrency)
+        
+        async def produce() -> None:
+            page = 1
+            try:
+                while True:
+                    for items in await self._fetch_pages(
+                        url, db_config, page, concurrency, limit, filters_in
+                    ):
+                        await pages.put(items)
+                        if len(items) < limit:
+                            await pages.put(None)
+                            return
+                    page += concurrency
+            except Exception as e:
+                # 拉取失败时把异常交给打分循环抛出
+                await pages.put(e)
+        
+        query_embeddings = query_embeddings / (
+            np.linalg.norm(query_embeddings, axis=1, keepdims=True) + 1e-8
+        )
+        # 每个查询一个最小堆，元素为(相似度, 序号, 格式化后的记录)
+        heaps: List[List[Tuple[float, int, Dict]]] = [[] for _ in query_embeddings]
+        counter = itertools.count()
+        
+        producer = asyncio.create_task(produce())
+        try:
+            while True:
+                items = await pages.get()
+                if items is None:
                     break
+                if isinstance(items, Exception):
+                    raise items
+                if not items:
+                    continue
                 
-                all_items.extend(items)
-                
-                # 如果返回的数据少于limit，说明已经是最后一页
-                if len(items) < limit:
-                    break
+                # 每条记录只格式化一次，未进入top k的记录随该页一起释放
+                formatted = await executors.run_in_thread(self._format_page, items, prefilter_terms)
+                if not formatted:
+                    continue
+                embeddings = await self._encode_with_cache([item["content"] for item in formatted])
+                page_top_k = await executors.run_in_thread(
+                    self._page_top_k, embeddings, query_embeddings, k
+                )
                 
-                # 准备下一页
-                page += 1
-                skip += limit
-            
-            # 如果没有获取到数据，返回空结果
-            if not all_items:
-                return []
+                for heap, (indices, scores) in zip(heaps, page_top_k):
+                    for idx, score in zip(indices, scores):
+                        entry = (float(score), next(counter), formatted[idx])
+                        if len(heap) < k:
+                            heapq.heappush(heap, entry)
+                        elif entry[0] > heap[0][0]:
+                            heapq.heapreplace(heap, entry)
+        finally:
+            producer.cancel()
+        
+        all_results = []
+        for heap in heaps:
+            results = []
+            for score, _, formatted in sorted(heap, key=lambda entry: (-entry[0], entry[1])):
+                results.append(dict(formatted, score=score))
+            all_results.append(results)
+        
+        return all_results
+    
+    def _format_page(self, items: List[Dict], prefilter_terms: Optional[Set[str]]) -> List[Dict]:
+        """格式化一页记录；启用词法预过滤时丢弃不含任何查询记号的记录"""
+        formatted = [self._format_item(item) for item in items]
+        if prefilter_terms:
+            formatted = [
+                item for item in formatted
+                if matches_terms(item["content"], prefilter_terms)
+            ]
+        return formatted
+    
+    @staticmethod
+    def _page_top_k(
+        embeddings: np.ndarray,
+        query_embeddings: np.ndarray,
+        k: int
+    ) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        计算一页记录与各查询的余弦相似度，并取每个查询在该页内的top k
+        
+        Args:
+            embeddings: 该页记录的向量矩阵
+            query_embeddings: 归一化后的查询向量矩阵
+            k: 每个查询返回top k结果
             
-            # 如果提供了查询字符串，进行相似度搜索排序
-            if query and query.strip():
-                # 使用向量相似度搜索对结果进行排序
-                results = await self._rank_by_similarity(all_items, query, k)
-            else:
-                # 如果没有查询字符串，返回所有数据（限制为k条）
-                results = []
-                for item in all_items[:k]:
-                    results.append(self._format_item(item))
+        Returns:
+            与查询一一对应的(页内下标, 相似度)
+        """
+        embeddings = embeddings / (np.linalg.norm(embeddings, axis=1, keepdims=True) + 1e-8)
+        similarities = query_embeddings @ embeddings.T
+        
+        k = min(k, similarities.shape[1])
+        page_top_k = []
+        for row in similarities:
+            top_indices = np.argpartition(-row, k - 1)[:k]
+            page_top_k.append((top_indices, row[top_indices]))
+        
+        return page_top_k
+    
+    async def _fetch_pages(
+        self,
+        url: str,
+        db_config: LocalDatabase,
+        start_page: int,
+        page_count: int,
+        limit: int,
+        filters_in: Optional[List[Dict]] = None
+    ) -> List[List[Dict]]:
+        """
+        并发拉取连续的多页数据（并发数受fetch_concurrency限制）
+        
+        Args:
+            url: 完整请求URL
+            db_config: 本地数据库配置
+            start_page: 起始页码（从1开始）
+            page_count: 页数
+            limit: 每页记录数
+            filters_in: 下推给API的filtersIn条件
             
-            return results
+        Returns:
+            按页序排列的各页原始数据项列表
+        """
+        semaphore = asyncio.Semaphore(max(db_config.fetch_concurrency, 1))
+        
+        async def fetch(page: int) -> List[Dict]:
+            async with semaphore:
+                items, _ = await self._fetch_page(url, db_config, page, limit, filters_in)
+                return items
+        
+        return await asyncio.gather(
+            *(fetch(start_page + i) for i in range(page_count))
+        )
+    
+    async def _fetch_page(
+        self,
+        url: str,
+        db_config: LocalDatabase,
+        page: int,
+        limit: int,
+        filters_in: Optional[List[Dict]] = None
+    ) -> Tuple[List[Dict], Optional[int]]:
+        """
+        拉取一页数据
+        
+        Args:
+            url: 完整请求URL
+            db_config: 本地数据库配置
+            page: 页码（从1开始）
+            limit: 每页记录数
+            filters_in: 下推给API的filtersIn条件（None表示不过滤）
             
-        except httpx.HTTPStatusError as e:
-            return [{"error": f"HTTP错误 {e.response.status_code}: {str(e)}"}]
-        except Exception as e:
-            return [{"error": f"搜索失败: {str(e)}"}]
+        Returns:
+            (该页的原始数据项列表, 总记录数（API未返回时为None）)
+        """
+        # 构建请求头
+        headers = {
+            "Content-Type": "application/json"
+        }
+        
+        # 构建请求体（根据示例代码格式）
+        params = {
+            "filterOption": {
+                "filters": {
+                    "workflow": db_config.database_id,
+                    "filtersIn": filters_in or []
+                },
+                "skip": (page - 1) * limit,
+                "page": page,
+                "type": "detail",
+                "limit": limit
+            }
+        }
+        
+        # 使用POST请求（根据示例代码）；先获取限流令牌（排队时间不计入请求超时），
+        # 同一页的并发请求合并为一次网络调用
+        async def send() -> httpx.Response:
+            await get_http_client().acquire_rate_limit(url)
+            return await self.http_client.post(url, json=params, headers=headers)
+        
+        response = await get_http_client().single_flight.do(
+            HttpResponseCache.make_key("POST", url, params), send
+        )
+        response.raise_for_status()
+        
+        # 解析响应
+        data = response.json()
+        
+        # 提取结果
+        if isinstance(data, dict) and "results" in data:
+            total = next(
+                (data[key] for key in ("total", "count", "totalCount")
+                 if isinstance(data.get(key), int)),
+                None
+            )
+            return data["results"], total
+        elif isinstance(data, list):
+            return data, None
+        return [], None
     
     def _format_item(self, item: Dict) -> Dict:
         """
@@ -178,62 +597,317 @@ class LocalDatabaseClient:
             "score": item.get("score", item.get("similarity", 1.0))
         }
     
-    async def _rank_by_similarity(
+    async def sync_index(self, db_config: LocalDatabase, mirror: LocalMirror) -> FlatIndex:
+        """
+        增量更新镜像的向量索引：只编码并插入索引中尚未包含的镜像记录
+        
+        Args:
+            db_config: 本地数据库配置
+            mirror: 已同步的本地镜像
+            
+        Returns:
+            与镜像记录对齐的向量索引
+        """
+        executors = get_executors()
+        
+        async with mirror.lock:
+            index = self.indexes.get(db_config.name)
+            if index is None:
+                index = await executors.run_in_thread(
+                    load_index, db_config, mirror.directory / "index",
+                    self.embedding_service.model_name
+                )
+                self.indexes[db_config.name] = index
+            
+            if index.size > mirror.count:
+                # 镜像被重建过，索引需要重新写入
+                await executors.run_in_thread(index.clear)
+            
+            if index.size < mirror.count:
+                new_items = mirror.items[index.size:]
+                texts = await executors.run_in_thread(
+                    lambda: [self._format_item(item)["content"] for item in new_items]
+                )
+                embeddings = await self._encode_with_cache(texts)
+                await executors.run_in_thread(index.add, embeddings)
+        
+        return index
+    
+    async def sync_lexical_index(self, db_config: LocalDatabase, mirror: LocalMirror) -> BM25Index:
+        """
+        增量更新镜像的BM25索引：只插入索引中尚未包含的镜像记录
+        
+        Args:
+            db_config: 本地数据库配置
+            mirror: 已同步的本地镜像
+            
+        Returns:
+            与镜像记录对齐的BM25索引
+        """
+        async with mirror.lock:
+            index = self.lexical_indexes.setdefault(db_config.name, BM25Index())
+            
+            if index.size > mirror.count:
+                # 镜像被重建过，索引需要重新写入
+                index.clear()
+            
+            if index.size < mirror.count:
+                new_items = mirror.items[index.size:]
+                await get_executors().run_in_thread(
+                    lambda: index.add([self._format_item(item)["content"] for item in new_items])
+                )
+        
+        return index
+    
+    async def lexical_search(
         self,
-        items: List[Dict],
+        db_config: LocalDatabase,
         query: str,
-        k: int
+        k: int = 5
     ) -> List[Dict]:
         """
-        使用向量相似度对结果进行排序
+        在镜像记录上进行BM25词法检索（未启用镜像或同步失败时返回空列表，错误由向量检索报告）
         
         Args:
-            items: 所有数据项
-            query: 查询字符串
-            k: 返回top k结果
+            db_config: 本地数据库配置
+            query: 查询问题
+            k: 返回结果数量
             
         Returns:
-            排序后的结果列表
+            按BM25得分降序的结果列表
         """
-        if not items:
+        if not db_config.mirror or not query.strip():
             return []
         
         try:
-            # 提取所有文本内容
-            texts = []
-            for item in items:
-                formatted = self._format_item(item)
-                texts.append(formatted["content"])
-            
-            if not texts:
-                return []
+            self._validate_config(db_config)
+            mirror = await self.sync_mirror(db_config)
+        except Exception:
+            return []
+        
+        index = await self.sync_lexical_index(db_config, mirror)
+        top_ids, scores = await get_executors().run_in_thread(index.search, query, k)
+        
+        results = []
+        for idx, score in zip(top_ids, scores):
+            formatted = self._format_item(mirror.items[idx])
+            formatted["score"] = float(score)
+            results.append(formatted)
+        
+        return results
+    
+    async def sync_variant_index(self, db_config: LocalDatabase, mirror: LocalMirror) -> VariantIndex:
+        """
+        增量更新镜像的变异结构化索引：只解析并插入索引中尚未包含的镜像记录
+        
+        Args:
+            db_config: 本地数据库配置
+            mirror: 已同步的本地镜像
             
-            # 计算查询向量
-            query_embedding = self.embedding_model.encode(query)
+        Returns:
+            与镜像记录对齐的变异索引
+        """
+        async with mirror.lock:
+            index = self.variant_indexes.setdefault(db_config.name, VariantIndex())
             
-            # 计算所有文本的向量
-            text_embeddings = self.embedding_model.encode(texts)
+            if index.size > mirror.count:
+                # 镜像被重建过，索引需要重新写入
+                index.clear()
             
-            # 计算相似度
-            similarities = np.dot(text_embeddings, query_embedding) / (
-                np.linalg.norm(text_embeddings, axis=1) * np.linalg.norm(query_embedding) + 1e-8
-            )
+            if index.size < mirror.count:
+                new_items = mirror.items[index.size:]
+                await get_executors().run_in_thread(
+                    lambda: index.add([
+                        record_variants(formatted["content"], formatted["metadata"])
+                        for formatted in map(self._format_item, new_items)
+                    ])
+                )
+        
+        return index
+    
+    async def variant_search(
+        self,
+        db_config: LocalDatabase,
+        variants: List[Variant],
+        k: int = 5
+    ) -> List[Dict]:
+        """
+        在镜像记录上按变异标识符和坐标区间查找（未启用镜像或同步失败时返回空列表，由向量检索兜底）
+        
+        Args:
+            db_config: 本地数据库配置
+            variants: 查询中解析出的变异
+            k: 返回结果数量
             
-            # 获取top k
-            top_indices = np.argsort(similarities)[::-1][:k]
+        Returns:
+            匹配的记录列表（score为1.0，即镜像向量索引余弦相似度的最优值）
+        """
+        if not db_config.mirror or not variants:
+            return []
+        
+        try:
+            self._validate_config(db_config)
+            mirror = await self.sync_mirror(db_config)
+        except Exception:
+            return []
+        
+        index = await self.sync_variant_index(db_config, mirror)
+        record_ids = await get_executors().run_in_thread(index.lookup, variants, k)
+        
+        results = []
+        for idx in record_ids:
+            formatted = self._format_item(mirror.items[idx])
+            formatted["score"] = 1.0
+            results.append(formatted)
+        
+        return results
+    
+    async def _search_index(
+        self,
+        db_config: LocalDatabase,
+        mirror: LocalMirror,
+        query_embeddings: np.ndarray,
+        k: int
+    ) -> List[List[Dict]]:
+        """
+        在镜像的向量索引上检索多个查询
+        
+        Args:
+            db_config: 本地数据库配置
+            mirror: 已同步的本地镜像
+            query_embeddings: 查询向量矩阵（每行一个查询）
+            k: 每个查询返回top k结果
             
+        Returns:
+            与查询一一对应的排序结果列表
+        """
+        index = await self.sync_index(db_config, mirror)
+        top_k = await get_executors().run_in_thread(index.search, query_embeddings, k)
+        
+        all_results = []
+        for top_indices, scores in top_k:
             results = []
-            for idx in top_indices:
-                formatted = self._format_item(items[idx])
-                formatted["score"] = float(similarities[idx])
+            for idx, score in zip(top_indices, scores):
+                formatted = self._format_item(mirror.items[idx])
+                formatted["score"] = float(score)
                 results.append(formatted)
+            all_results.append(results)
+        
+        return all_results
+    
+    async def _rank_by_similarity(
+        self,
+        db_config: LocalDatabase,
+        mirror: LocalMirror,
+        query: str,
+        k: int
+    ) -> List[Dict]:
+        """
+        使用向量相似度对镜像记录进行排序
+        
+        Args:
+            db_config: 本地数据库配置
+            mirror: 已同步的本地镜像
+            query: 查询字符串
+            k: 返回top k结果
             
-            return results
+        Returns:
+            排序后的结果列表
+        """
+        if not mirror.items:
+            return []
+        
+        try:
+            # 计算查询向量
+            query_embedding = await self.embedding_service.encode(query)
+            results = await self._search_index(db_config, mirror, query_embedding[np.newaxis, :], k)
+            return results[0]
             
         except Exception as e:
             # 如果相似度计算失败，返回前k条数据
-            return [self._format_item(item) for item in items[:k]]
+            return [self._format_item(item) for item in mirror.items[:k]]
+    
+    async def _search_filtered(
+        self,
+        db_config: LocalDatabase,
+        mirror: LocalMirror,
+        query: str,
+        k: int,
+        filters: QueryFilters
+    ) -> List[Dict]:
+        """
+        在镜像记录中按过滤条件筛出匹配的子集，只在子集上按向量相似度排序
+
+        Args:
+            db_config: 本地数据库配置
+            mirror: 已同步的本地镜像
+            query: 查询字符串
+            k: 返回top k结果
+            filters: 查询过滤条件（按filter_fields映射）
+
+        Returns:
+            排序后的结果列表
+        """
+        executors = get_executors()
+        items = mirror.items[:]
+        ids = await executors.run_in_thread(
+            lambda: np.array(
+                [i for i, item in enumerate(items) if filters.matches(item, db_config.filter_fields)],
+                dtype=np.int64
+            )
+        )
+        if not len(ids):
+            return []
+
+        if not (query and query.strip()):
+            return [self._format_item(items[idx]) for idx in ids[:k]]
+
+        try:
+            query_embedding = await self.embedding_service.encode(query)
+            index = await self.sync_index(db_config, mirror)
+            top_indices, scores = (await executors.run_in_thread(
+                index.search_ids, query_embedding[np.newaxis, :], ids, k
+            ))[0]
+        except Exception as e:
+            # 如果相似度计算失败，返回匹配子集的前k条数据
+            return [self._format_item(items[idx]) for idx in ids[:k]]
+
+        results = []
+        for idx, score in zip(top_indices, scores):
+            formatted = self._format_item(items[idx])
+            formatted["score"] = float(score)
+            results.append(formatted)
+        return results
+
+    async def _encode_with_cache(self, texts: List[str]) -> np.ndarray:
+        """
+        编码文本列表，已缓存的内容直接读取缓存，只编码未见过的内容
+        
+        Args:
+            texts: 文本列表
+            
+        Returns:
+            与texts一一对应的向量矩阵
+        """
+        executors = get_executors()
+        
+        # 缓存读写涉及哈希计算和磁盘IO，放到线程池中执行
+        vectors, missing = await executors.run_in_thread(self.embedding_cache.get_many, texts)
+        
+        if missing:
+            # 同一内容只编码一次
+            missing_texts = list(dict.fromkeys(texts[i] for i in missing))
+            new_embeddings = await self.embedding_service.encode(missing_texts)
+            await executors.run_in_thread(
+                self.embedding_cache.put_many, missing_texts, new_embeddings
+            )
+            
+            encoded = dict(zip(missing_texts, new_embeddings))
+            for i in missing:
+                vectors[i] = encoded[texts[i]]
+        
+        return await executors.run_in_thread(np.vstack, vectors)
     
     async def close(self):
-        """关闭HTTP客户端"""
-        await self.http_client.aclose()
+        """释放资源（共享HTTP客户端由close_http_client统一关闭）"""
+        pass
@@ -0,0 +1,173 @@
+"""
+本地镜像模块
+将http_api类型的biobank数据库持久化镜像到本地磁盘，并支持增量同步。
+多个工作进程共享同一镜像目录时，写入由跨进程文件锁串行化，
+每次写入前先读入其他工作进程已追加的记录，只写入尚未镜像的部分
+"""
+import asyncio
+import json
+import os
+import time
+from pathlib import Path
+from typing import List, Dict, Optional, Tuple
+
+from src.config.database_manager import LocalDatabase
+from src.rag.file_lock import file_lock
+
+
+class LocalMirror:
+    """单个http_api数据库的磁盘镜像（records.jsonl + meta.json）"""
+
+    def __init__(self, db_config: LocalDatabase):
+        """
+        初始化本地镜像，已有镜像文件时直接从磁盘加载（阻塞IO，应在线程池中创建）
+
+        Args:
+            db_config: 本地数据库配置
+        """
+        self.db_config = db_config
+        self.directory = Path(db_config.mirror_dir) / db_config.database_id
+        self.records_path = self.directory / "records.jsonl"
+        self.meta_path = self.directory / "meta.json"
+        self.lock_path = self.directory / "mirror.lock"
+        self.items: List[Dict] = []
+        # 已确认记录在记录文件中占用的字节数（之后的数据未确认，下次写入时覆盖）
+        self.size = 0
+        self.last_sync: float = 0.0
+        self.lock = asyncio.Lock()
+        with file_lock(self.lock_path):
+            self._load()
+
+    @property
+    def count(self) -> int:
+        """已镜像的记录数"""
+        return len(self.items)
+
+    def is_stale(self) -> bool:
+        """距上次同步是否已超过sync_interval"""
+        return time.time() - self.last_sync >= self.db_config.sync_interval
+
+    def _read_meta(self) -> Optional[Dict]:
+        """读取meta文件（不存在时返回None）"""
+        if not self.meta_path.exists():
+            return None
+        with open(self.meta_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _read_records(self, offset: int, limit: int) -> Tuple[List[Dict], int]:
+        """
+        从记录文件的offset处读取至多limit条记录，遇到不完整或损坏的行即停止
+
+        Returns:
+            (记录列表, 读取的字节数)
+        """
+        items = []
+        size = 0
+        if limit <= 0 or not self.records_path.exists():
+            return items, size
+        with open(self.records_path, 'rb') as f:
+            f.seek(offset)
+            for line in f:
+                if len(items) >= limit or not line.endswith(b"\n"):
+                    break
+                try:
+                    items.append(json.loads(line))
+                except json.JSONDecodeError:
+                    break
+                size += len(line)
+        return items, size
+
+    def _load(self) -> None:
+        """从磁盘加载镜像（调用方持有文件锁），丢弃meta中未确认的尾部记录（例如写入中途进程退出）"""
+        meta = self._read_meta()
+        if meta is None:
+            self.items, self.size, self.last_sync = [], 0, 0.0
+            return
+
+        count = meta.get("count", 0)
+        self.items, self.size = self._read_records(0, count)
+        self.last_sync = meta.get("last_sync", 0.0)
+
+        # 记录文件比meta记录的少（文件损坏）时以实际可读的记录为准
+        if self.count != count:
+            self._save_meta()
+
+    def _refresh(self) -> None:
+        """读入其他工作进程追加的记录和同步时间（调用方持有文件锁）"""
+        meta = self._read_meta()
+        count = meta.get("count", 0) if meta else 0
+        if count < self.count:
+            # 镜像文件被删除或重建，重新加载
+            self._load()
+            return
+        if count > self.count:
+            items, size = self._read_records(self.size, count - self.count)
+            self.items.extend(items)
+            self.size += size
+        if meta:
+            self.last_sync = max(self.last_sync, meta.get("last_sync", 0.0))
+
+    def refresh(self) -> None:
+        """读入其他工作进程同步的记录和同步时间（阻塞IO，应在线程池中调用）"""
+        with file_lock(self.lock_path, exclusive=False):
+            self._refresh()
+
+    def _save_meta(self) -> None:
+        """原子写入meta文件"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        meta = {
+            "name": self.db_config.name,
+            "database_id": self.db_config.database_id,
+            "count": self.count,
+            "last_sync": self.last_sync
+        }
+        tmp_path = self.meta_path.with_suffix(f".json.tmp{os.getpid()}")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp_path, self.meta_path)
+
+    def append(self, items: List[Dict], start: int) -> None:
+        """
+        追加新同步的记录并持久化（阻塞IO，应在线程池中调用）
+
+        其他工作进程已经镜像了其中部分记录时只写入剩余部分；记录写在已确认数据之后，
+        覆盖未确认的尾部数据
+
+        Args:
+            items: 新增的原始数据项
+            start: items[0]在镜像中的下标
+        """
+        with file_lock(self.lock_path):
+            self._refresh()
+            if start > self.count:
+                return
+            items = items[self.count - start:]
+            if not items:
+                return
+
+            data = "".join(json.dumps(item, ensure_ascii=False) + "\n" for item in items).encode("utf-8")
+            self.directory.mkdir(parents=True, exist_ok=True)
+            with open(self.records_path, 'r+b' if self.records_path.exists() else 'wb') as f:
+                f.seek(self.size)
+                f.write(data)
+                f.truncate()
+
+            self.items.extend(items)
+            self.size += len(data)
+            self._save_meta()
+
+    def reset(self) -> None:
+        """清空镜像记录，用于远端记录被删除后的全量重新同步（阻塞IO，应在线程池中调用）"""
+        with file_lock(self.lock_path):
+            self.items, self.size = [], 0
+            if self.records_path.exists():
+                with open(self.records_path, 'r+b') as f:
+                    f.truncate()
+            self._save_meta()
+
+    def mark_synced(self) -> None:
+        """记录一次成功同步（阻塞IO，应在线程池中调用）"""
+        with file_lock(self.lock_path):
+            self._refresh()
+            self.last_sync = time.time()
+            self._save_meta()
@@ -2,32 +2,169 @@
 公共数据库客户端模块
 负责与公共数据库进行交互（API调用、网页抓取等）
 """
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Awaitable, Callable, Tuple
+from urllib.parse import urlsplit
+import json
 import httpx
-from langchain_community.document_loaders import WebBaseLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+import numpy as np
 
-from src.config.database_manager import PublicDatabase
+from src.config.database_manager import (
+    PublicDatabase, DEFAULT_CACHE_TTL, DEFAULT_NEGATIVE_CACHE_TTL
+)
+from src.rag.http_cache import HttpResponseCache
+from src.rag.embedding_service import EmbeddingService, get_embedding_service
+from src.rag.executors import get_executors
+from src.rag.http_transport import get_http_client
+from src.rag.resilience import ResilienceManager
+from src.rag.pubmed_parser import PubmedArticleParser
 
 
 class PublicDatabaseClient:
     """公共数据库客户端"""
     
-    def __init__(self):
-        """初始化公共数据库客户端"""
-        self.http_client = httpx.AsyncClient(timeout=30.0)
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200
+    def __init__(self, embedding_service: Optional[EmbeddingService] = None):
+        """
+        初始化公共数据库客户端
+        
+        Args:
+            embedding_service: 共享嵌入服务（用于文本块排序，None表示使用进程级默认实例）
+        """
+        # 进程级共享的HTTP客户端（按主机连接池、HTTP/2、keepalive）
+        self.http_client = get_http_client().client
+        self.embedding_service = embedding_service or get_embedding_service()
+        self._text_splitter = None
+        # 持久化的HTTP响应缓存（多进程共享）
+        self.response_cache = HttpResponseCache()
+        # 按数据源的对冲请求、重试和熔断
+        self.resilience = ResilienceManager()
+    
+    @property
+    def text_splitter(self):
+        """文本分块器（首次使用时导入LangChain）"""
+        if self._text_splitter is None:
+            from langchain_text_splitters import RecursiveCharacterTextSplitter
+            self._text_splitter = RecursiveCharacterTextSplitter(
+                chunk_size=1000,
+                chunk_overlap=200
+            )
+        return self._text_splitter
+    
+    async def _cached_get(
+        self,
+        url: str,
+        params: Dict,
+        db_config: Optional[PublicDatabase] = None,
+        is_negative: Optional[Callable[[bytes], bool]] = None,
+        read_body: Optional[Callable[[httpx.Response], Awaitable[bytes]]] = None
+    ) -> bytes:
+        """
+        带缓存的GET请求
+        
+        缓存未过期时直接返回；过期后携带ETag/Last-Modified重新验证，
+        服务器返回304时延长有效期并复用缓存内容。请求经过对冲、重试和熔断；
+        数据源熔断或重试后仍失败时，有过期缓存则返回过期缓存。
+        相同的并发请求（例如同一检索词）合并为一次缓存查询和网络调用
+        
+        Args:
+            url: 请求URL
+            params: 请求参数
+            db_config: 公共数据库配置（提供缓存有效期）
+            is_negative: 判断响应是否为空结果的函数，空结果按negative_cache_ttl缓存
+            read_body: 流式读取响应体并转换为缓存内容的函数（None表示完整读取并缓存原始响应），
+                转换后的内容与原始响应分开缓存
+            
+        Returns:
+            响应内容（指定read_body时为其转换后的内容）
+        """
+        key = HttpResponseCache.make_key("GET", url, params)
+        if read_body is not None:
+            key = f"{key}:{read_body.__name__}"
+        return await get_http_client().single_flight.do(
+            key,
+            lambda: self._fetch_cached(key, url, params, db_config, is_negative, read_body)
+        )
+    
+    async def _fetch_cached(
+        self,
+        key: str,
+        url: str,
+        params: Dict,
+        db_config: Optional[PublicDatabase],
+        is_negative: Optional[Callable[[bytes], bool]],
+        read_body: Optional[Callable[[httpx.Response], Awaitable[bytes]]] = None
+    ) -> bytes:
+        """查询响应缓存，未命中或过期时发出（条件）请求并写回缓存"""
+        cache_ttl, negative_ttl = self._cache_ttls(db_config)
+        cached = await self.response_cache.get(key)
+        
+        if cached and cached.is_fresh():
+            return cached.body
+        
+        # 条件请求头，用于重新验证过期的缓存
+        headers = {}
+        if cached and cached.etag:
+            headers["If-None-Match"] = cached.etag
+        if cached and cached.last_modified:
+            headers["If-Modified-Since"] = cached.last_modified
+        
+        source = db_config.name if db_config else urlsplit(url).netloc
+        try:
+            # 指定read_body时只等待响应头，响应体由read_body边接收边处理
+            response = await self.resilience.call(
+                source,
+                lambda: self.http_client.send(
+                    self.http_client.build_request("GET", url, params=params, headers=headers),
+                    stream=read_body is not None
+                ),
+                db_config,
+                throttle=lambda: get_http_client().acquire_rate_limit(url)
+            )
+        except Exception:
+            if cached:
+                return cached.body
+            raise
+        
+        try:
+            if response.status_code == 304 and cached:
+                await self.response_cache.touch(
+                    key, negative_ttl if cached.negative else cache_ttl
+                )
+                return cached.body
+            
+            response.raise_for_status()
+            body = await read_body(response) if read_body else response.content
+        finally:
+            await response.aclose()
+        
+        negative = bool(is_negative and is_negative(body))
+        await self.response_cache.put(
+            key, url, body,
+            response.headers.get("ETag"),
+            response.headers.get("Last-Modified"),
+            negative_ttl if negative else cache_ttl,
+            negative
         )
+        return body
+    
+    def _cache_ttls(self, db_config: Optional[PublicDatabase]) -> Tuple[int, int]:
+        """获取(正常缓存有效期, 负缓存有效期)"""
+        if db_config is None:
+            return DEFAULT_CACHE_TTL, DEFAULT_NEGATIVE_CACHE_TTL
+        return db_config.cache_ttl, db_config.negative_cache_ttl
     
-    async def search_pubmed(self, query: str, max_results: int = 10) -> List[Dict]:
+    async def search_pubmed(
+        self,
+        query: str,
+        max_results: int = 10,
+        db_config: Optional[PublicDatabase] = None
+    ) -> List[Dict]:
         """
         搜索PubMed数据库
         
         Args:
             query: 查询问题
             max_results: 最大结果数
+            db_config: 公共数据库配置（提供缓存有效期）
             
         Returns:
             搜索结果列表
@@ -42,21 +179,40 @@ class PublicDatabaseClient:
                 "retmode": "json"
             }
             
-            response = await self.http_client.get(search_url, params=params)
-            response.raise_for_status()
-            data = response.json()
+            body = await self._cached_get(
+                search_url, params, db_config,
+                is_negative=lambda body: not json.loads(body).get("esearchresult", {}).get("idlist")
+            )
+            data = json.loads(body)
             
             # 获取摘要信息
-            if "esearchresult" in data and "idlist" in data["esearchresult"]:
+            if "esearchresult" in data and data["esearchresult"].get("idlist"):
                 pmids = data["esearchresult"]["idlist"]
-                return await self._fetch_pubmed_summaries(pmids)
+                return await self._fetch_pubmed_summaries(pmids, query, max_results, db_config)
             
             return []
         except Exception as e:
             return [{"error": f"PubMed搜索失败: {str(e)}"}]
     
-    async def _fetch_pubmed_summaries(self, pmids: List[str]) -> List[Dict]:
-        """获取PubMed摘要信息"""
+    async def _fetch_pubmed_summaries(
+        self,
+        pmids: List[str],
+        query: str,
+        max_results: int,
+        db_config: Optional[PublicDatabase] = None
+    ) -> List[Dict]:
+        """
+        获取PubMed摘要，切分为文本块并按与问题的相似度排序
+        
+        Args:
+            pmids: PubMed文献ID列表
+            query: 查询问题（用于文本块排序）
+            max_results: 返回的文本块数量
+            db_config: 公共数据库配置（提供缓存有效期）
+            
+        Returns:
+            相似度最高的文本块列表
+        """
         try:
             fetch_url = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/efetch.fcgi"
             params = {
@@ -65,28 +221,91 @@ class PublicDatabaseClient:
                 "retmode": "xml"
             }
             
-            response = await self.http_client.get(fetch_url, params=params)
-            response.raise_for_status()
+            # 响应体边接收边解析，缓存的是提取出的文献字段而不是完整XML
+            body = await self._cached_get(
+                fetch_url, params, db_config,
+                is_negative=lambda body: body == b"[]",
+                read_body=self._read_pubmed_articles
+            )
+            
+            # 逐篇切分为文本块
+            chunks = []
+            for article in json.loads(body):
+                text = "\n".join(part for part in (article["title"], article["abstract"]) if part)
+                for chunk in self.text_splitter.split_text(text):
+                    chunks.append({
+                        "pmid": article["pmid"],
+                        "title": article["title"],
+                        "mesh_terms": article["mesh_terms"],
+                        "content": chunk,
+                        "source": "PubMed"
+                    })
             
-            # 这里应该解析XML，简化处理
-            return [
-                {
-                    "pmid": pmid,
-                    "content": "PubMed摘要内容（需要XML解析）",
-                    "source": "PubMed"
-                }
-                for pmid in pmids
-            ]
+            return await self._rank_chunks(chunks, query, max_results)
         except Exception as e:
             return [{"error": f"获取摘要失败: {str(e)}"}]
     
-    async def search_uniprot(self, query: str, max_results: int = 10) -> List[Dict]:
+    async def _read_pubmed_articles(self, response: httpx.Response) -> bytes:
+        """
+        流式读取efetch响应并增量解析（解析在线程池中进行），不缓冲完整的XML
+        
+        Args:
+            response: 以流式方式发出的efetch响应
+            
+        Returns:
+            提取出的文献字段（pmid、title、abstract、mesh_terms）列表的JSON
+        """
+        executors = get_executors()
+        parser = PubmedArticleParser()
+        articles = []
+        async for data in response.aiter_bytes():
+            articles.extend(await executors.run_in_thread(parser.feed, data))
+        articles.extend(await executors.run_in_thread(parser.close))
+        return json.dumps(articles, ensure_ascii=False).encode("utf-8")
+    
+    async def _rank_chunks(self, chunks: List[Dict], query: str, k: int) -> List[Dict]:
+        """
+        使用共享嵌入服务按与问题的相似度对文本块排序
+        
+        Args:
+            chunks: 文本块列表
+            query: 查询问题
+            k: 返回top k文本块
+            
+        Returns:
+            排序后的文本块列表（附带score）
+        """
+        if not chunks:
+            return []
+        
+        embeddings = await self.embedding_service.encode(
+            [query] + [chunk["content"] for chunk in chunks]
+        )
+        query_embedding, chunk_embeddings = embeddings[0], embeddings[1:]
+        similarities = np.dot(chunk_embeddings, query_embedding) / (
+            np.linalg.norm(chunk_embeddings, axis=1) * np.linalg.norm(query_embedding) + 1e-8
+        )
+        
+        results = []
+        for idx in np.argsort(similarities)[::-1][:k]:
+            chunk = dict(chunks[idx])
+            chunk["score"] = float(similarities[idx])
+            results.append(chunk)
+        return results
+    
+    async def search_uniprot(
+        self,
+        query: str,
+        max_results: int = 10,
+        db_config: Optional[PublicDatabase] = None
+    ) -> List[Dict]:
         """
         搜索UniProt数据库
         
         Args:
             query: 查询问题
             max_results: 最大结果数
+            db_config: 公共数据库配置（提供缓存有效期）
             
         Returns:
             搜索结果列表
@@ -99,9 +318,11 @@ class PublicDatabaseClient:
                 "size": max_results
             }
             
-            response = await self.http_client.get(search_url, params=params)
-            response.raise_for_status()
-            data = response.json()
+            body = await self._cached_get(
+                search_url, params, db_config,
+                is_negative=lambda body: not json.loads(body).get("results")
+            )
+            data = json.loads(body)
             
             results = []
             if "results" in data:
@@ -137,16 +358,21 @@ class PublicDatabaseClient:
         db_name = db_config.name.lower()
         
         if "pubmed" in db_name:
-            return await self.search_pubmed(query, max_results)
+            return await self.search_pubmed(query, max_results, db_config)
         elif "uniprot" in db_name:
-            return await self.search_uniprot(query, max_results)
+            return await self.search_uniprot(query, max_results, db_config)
         else:
             # 通用API调用
             if db_config.api_endpoint:
                 try:
-                    response = await self.http_client.get(
-                        db_config.api_endpoint,
-                        params={"query": query, "limit": max_results}
+                    response = await self.resilience.call(
+                        db_config.name,
+                        lambda: self.http_client.get(
+                            db_config.api_endpoint,
+                            params={"query": query, "limit": max_results}
+                        ),
+                        db_config,
+                        throttle=lambda: get_http_client().acquire_rate_limit(db_config.api_endpoint)
                     )
                     response.raise_for_status()
                     return [{"content": response.text, "source": db_config.name}]
@@ -156,5 +382,5 @@ class PublicDatabaseClient:
                 return [{"error": f"未实现该数据库的搜索方法: {db_config.name}"}]
     
     async def close(self):
-        """关闭HTTP客户端"""
-        await self.http_client.aclose()
+        """释放资源（共享HTTP客户端由close_http_client统一关闭）"""
+        pass
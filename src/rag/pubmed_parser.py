@@ -0,0 +1,75 @@
+"""
+PubMed XML解析模块
+增量解析efetch返回的XML（仅依赖标准库）：响应数据块到达时即喂入解析器，
+每解析完一篇文献即产出并释放其元素树，内存占用与响应大小无关
+"""
+from typing import Dict, Iterable, Iterator, List
+from xml.etree import ElementTree
+
+
+class PubmedArticleParser:
+    """efetch XML的增量解析器（非线程安全，同一实例的feed调用应依次执行）"""
+
+    def __init__(self):
+        self._parser = ElementTree.XMLPullParser(events=("end",))
+
+    def feed(self, data: bytes) -> List[Dict]:
+        """
+        喂入一块响应数据
+
+        Args:
+            data: 响应数据块
+
+        Returns:
+            本次解析完成的文献（包含pmid、title、abstract和mesh_terms）
+        """
+        self._parser.feed(data)
+        return list(self._read_articles())
+
+    def close(self) -> List[Dict]:
+        """结束解析，返回剩余解析完成的文献"""
+        self._parser.close()
+        return list(self._read_articles())
+
+    def _read_articles(self) -> Iterator[Dict]:
+        """读取解析器中已完成的文献元素"""
+        for _, elem in self._parser.read_events():
+            if elem.tag != "PubmedArticle":
+                continue
+
+            abstract_parts = []
+            for abstract_text in elem.iterfind(".//Abstract/AbstractText"):
+                text = "".join(abstract_text.itertext()).strip()
+                label = abstract_text.get("Label")
+                if text:
+                    abstract_parts.append(f"{label}: {text}" if label else text)
+
+            title = elem.find(".//ArticleTitle")
+            yield {
+                "pmid": elem.findtext(".//MedlineCitation/PMID", default=""),
+                "title": "".join(title.itertext()).strip() if title is not None else "",
+                "abstract": "\n".join(abstract_parts),
+                "mesh_terms": [
+                    descriptor.text
+                    for descriptor in elem.iterfind(".//MeshHeading/DescriptorName")
+                    if descriptor.text
+                ]
+            }
+            # 释放已处理文献的元素树，保持内存占用恒定
+            elem.clear()
+
+
+def iter_pubmed_articles(chunks: Iterable[bytes]) -> Iterator[Dict]:
+    """
+    增量解析efetch返回的XML数据块，每解析完一篇文献即产出
+
+    Args:
+        chunks: 响应数据块（按到达顺序）
+
+    Yields:
+        包含pmid、title、abstract和mesh_terms的文献字典
+    """
+    parser = PubmedArticleParser()
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+    yield from parser.close()
@@ -0,0 +1,209 @@
+"""
+查询过滤条件模块
+从问题中提取（或由请求直接指定）基因、变异和样本约束，并转换为biobank API的filtersIn条件，
+使分页拉取和排序只在匹配的子集上进行
+"""
+import re
+from typing import Any, Dict, Hashable, List, Optional, Union
+
+from src.rag.variant_index import parse_variants
+
+# 边界只看ASCII字母数字（\b会把中文字符当作单词字符，“什么是BRCA1基因突变”中的基因将无法匹配）
+_START = r"(?<![A-Za-z0-9_-])"
+_END = r"(?![A-Za-z0-9_-])"
+# “基因 BRAF”、“gene: TP53”、“BRCA1基因”
+_GENE_PATTERNS = [
+    re.compile(r"(?:" + _START + r"(?i:gene)|基因)\s*[:：]?\s*([A-Z][A-Z0-9]{1,9}(?:-[A-Z0-9]+)?)" + _END),
+    re.compile(_START + r"([A-Z][A-Z0-9]{1,9}(?:-[A-Z0-9]+)?)\s*基因")
+]
+# “样本：S001”、“sample: NA12878”、“样品编号 P-023”：必须有冒号或编号/ID限定，且编号中含数字，
+# 避免把“a sample of tumor”、“样本 BRAF V600E”中的普通单词当作样本编号
+_SAMPLE_PATTERN = re.compile(
+    r"(?:" + _START + r"sample|样本|样品)(?:\s*(?:编号|号|ID)\s*[:：]?|\s*[:：])\s*"
+    r"((?=[A-Za-z0-9_.\-]*\d)[A-Za-z0-9][A-Za-z0-9_.\-]*[A-Za-z0-9])",
+    re.IGNORECASE
+)
+# 变异限定前缀中表示转录本（而非基因符号）的前缀
+_TRANSCRIPT_PREFIXES = ("NM_", "NR_", "ENST")
+# filtersIn条件的默认形状（"$field"、"$values"分别替换为字段名和取值列表）
+DEFAULT_FILTER_TEMPLATE = {"field": "$field", "values": "$values"}
+
+# filter_fields中单个维度的配置：字段名，或 {"field": 字段名, "template": filtersIn条件形状}
+FieldSpec = Union[str, Dict[str, Any]]
+
+
+def _field_name(spec: Optional[FieldSpec]) -> Optional[str]:
+    """维度配置中的字段名"""
+    return spec.get("field") if isinstance(spec, dict) else spec
+
+
+def _fill_template(template: Any, field: str, values: List[str]) -> Any:
+    """将条件形状中的"$field"、"$values"替换为字段名和取值列表"""
+    if template == "$field":
+        return field
+    if template == "$values":
+        return values
+    if isinstance(template, dict):
+        return {key: _fill_template(value, field, values) for key, value in template.items()}
+    if isinstance(template, list):
+        return [_fill_template(value, field, values) for value in template]
+    return template
+
+
+def _value_matches(value: Any, wanted: set, parse: bool) -> bool:
+    """
+    记录字段值（或其中任一元素）是否与任一取值相同（不区分大小写）
+
+    Args:
+        value: 记录字段值
+        wanted: 小写的取值集合
+        parse: 是否同时比较字段值中解析出的变异标识符
+    """
+    for element in value if isinstance(value, list) else [value]:
+        if element is None:
+            continue
+        text = str(element)
+        if text.lower() in wanted:
+            return True
+        if parse and any(
+            key.lower() in wanted
+            for variant in parse_variants(text)
+            for key in (variant.key, variant.bare_key)
+            if key
+        ):
+            return True
+    return False
+
+
+class QueryFilters:
+    """查询过滤条件（各维度内为“或”，维度之间为“且”）"""
+
+    # 过滤维度 -> 属性名
+    DIMENSIONS = {"gene": "genes", "variant": "variants", "sample": "samples"}
+
+    def __init__(
+        self,
+        genes: Optional[List[str]] = None,
+        variants: Optional[List[str]] = None,
+        samples: Optional[List[str]] = None
+    ):
+        """
+        Args:
+            genes: 基因符号列表
+            variants: 变异标识符列表（rsID、p./c.改变、染色体:坐标:参考>替代）
+            samples: 样本编号列表
+        """
+        self.genes = list(dict.fromkeys(genes or []))
+        self.variants = list(dict.fromkeys(variants or []))
+        self.samples = list(dict.fromkeys(samples or []))
+
+    def is_empty(self) -> bool:
+        """是否没有任何过滤条件"""
+        return not (self.genes or self.variants or self.samples)
+
+    def as_dict(self) -> Dict[str, List[str]]:
+        """按维度返回过滤条件"""
+        return {dimension: getattr(self, attr) for dimension, attr in self.DIMENSIONS.items()}
+
+    def cache_key(self) -> Hashable:
+        """用于语义缓存作用域的键"""
+        return tuple(tuple(sorted(values)) for values in self.as_dict().values())
+
+    def _mapped(self, field_mapping: Dict[str, FieldSpec]) -> List[tuple]:
+        """有取值且已映射字段的维度：(维度, 维度配置, 字段名, 取值列表)"""
+        mapped = []
+        for dimension, values in self.as_dict().items():
+            spec = field_mapping.get(dimension)
+            field = _field_name(spec)
+            if values and field:
+                mapped.append((dimension, spec, field, values))
+        return mapped
+
+    def to_filters_in(self, field_mapping: Dict[str, FieldSpec]) -> List[Dict]:
+        """
+        转换为biobank API的filtersIn条件
+
+        Args:
+            field_mapping: 过滤维度（gene、variant、sample） -> 字段名或 {"field", "template"} 配置，
+                未映射的维度不下推
+
+        Returns:
+            filtersIn条件列表，每项默认为 {"field": 字段名, "values": 取值列表}，
+            配置了template时按template的形状生成
+        """
+        filters_in = []
+        for _, spec, field, values in self._mapped(field_mapping):
+            template = DEFAULT_FILTER_TEMPLATE
+            if isinstance(spec, dict):
+                template = spec.get("template", DEFAULT_FILTER_TEMPLATE)
+            filters_in.append(_fill_template(template, field, values))
+        return filters_in
+
+    def matches(self, item: Any, field_mapping: Dict[str, FieldSpec]) -> bool:
+        """
+        记录是否满足已映射维度的过滤条件（在本地镜像上过滤，语义与filtersIn一致）
+
+        记录的字段值（或其中任一元素）与任一取值相同即满足该维度，不区分大小写；
+        变异维度还比较字段值中解析出的变异标识符（例如 "BRAF p.V600E" 满足 "p.V600E"）
+
+        Args:
+            item: 原始记录
+            field_mapping: 过滤维度 -> 字段名或 {"field", "template"} 配置，未映射的维度不过滤
+
+        Returns:
+            是否满足全部已映射维度
+        """
+        for dimension, _, field, values in self._mapped(field_mapping):
+            if not isinstance(item, dict):
+                return False
+            wanted = {str(value).lower() for value in values}
+            if not _value_matches(item.get(field), wanted, dimension == "variant"):
+                return False
+        return True
+
+    def __repr__(self) -> str:
+        return f"QueryFilters({self.as_dict()})"
+
+
+def derive_filters(
+    question: str,
+    genes: Optional[List[str]] = None,
+    variants: Optional[List[str]] = None,
+    samples: Optional[List[str]] = None
+) -> QueryFilters:
+    """
+    推导查询过滤条件：请求中指定的维度直接使用，未指定的维度从问题中提取
+
+    Args:
+        question: 用户问题
+        genes: 请求指定的基因列表
+        variants: 请求指定的变异列表
+        samples: 请求指定的样本列表
+
+    Returns:
+        查询过滤条件
+    """
+    parsed = parse_variants(question)
+
+    if genes is None:
+        genes = []
+        for variant in parsed:
+            # BRAF:p.V600E 的限定前缀即基因符号
+            if variant.key and variant.bare_key:
+                qualifier = variant.key.split(":", 1)[0]
+                if not qualifier.startswith(_TRANSCRIPT_PREFIXES):
+                    genes.append(qualifier)
+        for pattern in _GENE_PATTERNS:
+            genes.extend(match.group(1) for match in pattern.finditer(question))
+
+    if variants is None:
+        variants = [
+            variant.bare_key or variant.key
+            for variant in parsed
+            if variant.bare_key or variant.key
+        ]
+
+    if samples is None:
+        samples = [match.group(1) for match in _SAMPLE_PATTERN.finditer(question)]
+
+    return QueryFilters(genes, variants, samples)
@@ -2,18 +2,32 @@
 RAG引擎核心模块
 整合向量检索和生成功能
 """
-from typing import List, Dict, Optional
-from langchain_openai import ChatOpenAI
-from langchain_core.prompts import PromptTemplate
+import asyncio
+import threading
+import time
+from typing import List, Dict, Optional, Tuple, Coroutine, AsyncIterator
 import os
 from dotenv import load_dotenv
 
 from src.config.database_manager import DatabaseManager, LocalDatabase, PublicDatabase
 from src.rag.vector_store import VectorStoreManager
 from src.rag.public_db_client import PublicDatabaseClient
+from src.rag.semantic_cache import SemanticCache
+from src.rag.query_filters import QueryFilters, derive_filters
+from src.rag.context_packer import ContextPacker
+from src.rag.completion_cache import CompletionCache
+from src.rag.generator import (
+    GeneratorBackend, GenerationScheduler, LangChainBackend, SimulatedBackend,
+    PRIORITY_BATCH, PRIORITY_INTERACTIVE
+)
+from src.rag.executors import get_executors, shutdown_executors
+from src.rag.http_transport import close_http_client, get_http_client
 
 load_dotenv()
 
+# 答案生成失败时返回的答案前缀（此类结果不写入语义缓存）
+GENERATION_ERROR_PREFIX = "生成答案时出错"
+
 
 class RAGEngine:
     """RAG引擎"""
@@ -34,43 +48,164 @@ class RAGEngine:
         """
         self.database_manager = database_manager
         self.vector_store_manager = VectorStoreManager()
-        self.public_db_client = PublicDatabaseClient()
+        self.public_db_client = PublicDatabaseClient(
+            self.vector_store_manager.embedding_service
+        )
         self.use_local_model = use_local_model
         self.model_name = model_name
+        self.temperature = float(os.getenv("LLM_TEMPERATURE", "0.7"))
+        # 检索阶段的全局截止时间和单个数据源的超时时间（秒）
+        self.query_deadline = float(os.getenv("QUERY_DEADLINE", "20"))
+        self.source_timeout = float(os.getenv("SOURCE_TIMEOUT", "15"))
+        # 批量查询时公共数据库检索和答案生成的最大并发数
+        self.batch_concurrency = int(os.getenv("BATCH_CONCURRENCY", "8"))
+        # 按问题语义缓存查询结果
+        self.semantic_cache = SemanticCache()
+        # 按模型token预算打包写入提示词的上下文
+        self.context_packer = ContextPacker(
+            self.vector_store_manager.embedding_service, model_name
+        )
+        # 按模型、温度和提示词精确缓存LLM答案（多进程共享）
+        self.completion_cache = (
+            CompletionCache() if os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true" else None
+        )
+        
+        # 生成后端在首次使用（或预热）时创建，避免启动时导入LangChain
+        self._generator: Optional[GeneratorBackend] = None
+        self._generator_initialized = False
+        self._generator_lock = threading.Lock()
+        # 并发生成数、每分钟token数和排队优先级
+        self.generation_scheduler = GenerationScheduler()
+        
+        # 预热状态（由warmup在后台更新）
+        self.ready = False
+        self.warmup_seconds: Optional[float] = None
+        self.warmup_errors: Dict[str, str] = {}
         
-        # 初始化LLM
-        if use_local_model:
-            # 使用本地模型（需要根据实际情况配置）
-            self.llm = None  # 需要配置本地模型
+        # 登记所有本地数据库（文件系统数据库推迟到首次使用或预热时加载）
+        self._register_local_databases()
+        # 按数据库配置设置对外请求的主机速率上限
+        self._configure_rate_limits()
+    
+    @property
+    def generator(self) -> Optional[GeneratorBackend]:
+        """生成后端（首次访问时创建，未配置时为None）"""
+        if not self._generator_initialized:
+            with self._generator_lock:
+                if not self._generator_initialized:
+                    self._generator = self._create_generator()
+                    self._generator_initialized = True
+        return self._generator
+    
+    @generator.setter
+    def generator(self, value: Optional[GeneratorBackend]):
+        self._generator = value
+        self._generator_initialized = True
+    
+    def _create_generator(self) -> Optional[GeneratorBackend]:
+        """
+        初始化生成后端
+        
+        使用本地模型时：设置了LOCAL_MODEL_BASE_URL则连接兼容OpenAI接口的本地模型服务（vLLM、Ollama等），
+        否则使用本地模拟后端；不使用本地模型时使用OpenAI
+        """
+        if self.use_local_model:
+            base_url = os.getenv("LOCAL_MODEL_BASE_URL")
+            if not base_url:
+                print(f"未设置LOCAL_MODEL_BASE_URL，使用本地模拟生成后端: {self.model_name}")
+                return SimulatedBackend(self.model_name)
+            api_key = os.getenv("LOCAL_MODEL_API_KEY", "EMPTY")
         else:
+            base_url = None
             api_key = os.getenv("OPENAI_API_KEY")
-            if api_key:
-                try:
-                    self.llm = ChatOpenAI(
-                        model=model_name,
-                        temperature=0.7,
-                        api_key=api_key
-                    )
-                    print(f"LLM初始化成功: {model_name}")
-                except Exception as e:
-                    print(f"LLM初始化失败: {str(e)}，将仅返回检索结果")
-                    self.llm = None
-            else:
+            if not api_key:
                 print("警告: 未设置OPENAI_API_KEY环境变量，将仅返回检索结果，不生成答案")
-                self.llm = None
+                return None
         
-        # 加载所有本地数据库
-        self._load_all_local_databases()
+        try:
+            from langchain_openai import ChatOpenAI
+            
+            llm = ChatOpenAI(
+                model=self.model_name,
+                temperature=self.temperature,
+                api_key=api_key,
+                base_url=base_url
+            )
+            print(f"LLM初始化成功: {self.model_name}")
+            return LangChainBackend(llm, self.model_name)
+        except Exception as e:
+            print(f"LLM初始化失败: {str(e)}，将仅返回检索结果")
+            return None
     
-    def _load_all_local_databases(self):
-        """加载所有本地数据库"""
+    def _register_local_databases(self):
+        """登记所有本地数据库"""
         local_dbs = self.database_manager.get_local_databases()
         for db_config in local_dbs:
             try:
-                self.vector_store_manager.load_local_database(db_config)
-                print(f"已加载本地数据库: {db_config.name}")
+                self.vector_store_manager.register_local_database(db_config)
             except Exception as e:
-                print(f"加载数据库 {db_config.name} 失败: {str(e)}")
+                print(f"登记数据库 {db_config.name} 失败: {str(e)}")
+    
+    def _configure_rate_limits(self):
+        """按公共数据库和HTTP API本地数据库的rate_limit配置，为其所在主机设置令牌桶限流"""
+        http_client = get_http_client()
+        for db_config in self.database_manager.get_public_databases():
+            if db_config.api_endpoint:
+                http_client.set_rate_limit(db_config.api_endpoint, db_config.rate_limit, db_config.rate_burst)
+        for db_config in self.database_manager.get_local_databases():
+            if db_config.type.lower() == "http_api" and db_config.base_url:
+                http_client.set_rate_limit(db_config.base_url, db_config.rate_limit, db_config.rate_burst)
+    
+    async def warmup(self) -> None:
+        """
+        后台预热：加载嵌入模型、创建生成后端、加载所有尚未加载的本地数据库，并预建对外HTTP连接
+        
+        各项并发执行，单项失败只记录在warmup_errors中；全部结束后ready置为True
+        """
+        start = time.perf_counter()
+        executors = get_executors()
+        vector_store_manager = self.vector_store_manager
+        
+        steps: Dict[str, Coroutine] = {
+            "embedding_model": executors.run_in_thread(vector_store_manager.embedding_service.warmup),
+            "llm": executors.run_in_thread(lambda: self.generator)
+        }
+        for db_name in list(vector_store_manager.pending_databases):
+            steps[f"local_db:{db_name}"] = vector_store_manager.ensure_loaded(db_name)
+        steps["http_connections"] = get_http_client().prewarm(self._outbound_urls())
+        
+        results = await asyncio.gather(*steps.values(), return_exceptions=True)
+        self.warmup_errors = {
+            name: str(result)
+            for name, result in zip(steps, results)
+            if isinstance(result, Exception)
+        }
+        self.warmup_seconds = time.perf_counter() - start
+        self.ready = True
+        print(f"RAG引擎预热完成，耗时 {self.warmup_seconds:.2f} 秒")
+    
+    def _outbound_urls(self) -> List[str]:
+        """所有对外请求的目标地址（公共数据库API和HTTP API本地数据库），用于预建连接"""
+        urls = [
+            db_config.api_endpoint
+            for db_config in self.database_manager.get_public_databases()
+            if db_config.api_endpoint
+        ]
+        urls.extend(
+            db_config.base_url
+            for db_config in self.database_manager.get_local_databases()
+            if db_config.type.lower() == "http_api" and db_config.base_url
+        )
+        return urls
+    
+    def warmup_status(self) -> Dict:
+        """预热状态"""
+        return {
+            "ready": self.ready,
+            "warmup_seconds": self.warmup_seconds,
+            "warmup_errors": self.warmup_errors,
+            "pending_databases": list(self.vector_store_manager.pending_databases)
+        }
     
     async def query(
         self,
@@ -79,11 +214,21 @@ class RAGEngine:
         use_public_db: bool = True,
         local_db_names: Optional[List[str]] = None,
         public_db_names: Optional[List[str]] = None,
-        top_k: int = 5
+        top_k: int = 5,
+        deadline: Optional[float] = None,
+        use_cache: bool = True,
+        genes: Optional[List[str]] = None,
+        variants: Optional[List[str]] = None,
+        samples: Optional[List[str]] = None
     ) -> Dict:
         """
         执行RAG查询
         
+        所有数据源并发检索；超过单源超时或全局截止时间的数据源标记为超时，
+        答案基于已返回的结果生成。语义相近的问题（且数据库选择、top_k和过滤条件相同）
+        直接返回缓存的结果。基因、变异和样本过滤条件未指定时从问题中提取，
+        对配置了filter_fields的HTTP API数据库在镜像上过滤（未启用镜像时下推到API）
+        
         Args:
             question: 用户问题
             use_local_db: 是否使用本地数据库
@@ -91,37 +236,219 @@ class RAGEngine:
             local_db_names: 指定使用的本地数据库名称列表（None表示使用全部）
             public_db_names: 指定使用的公共数据库名称列表（None表示使用全部）
             top_k: 每个数据库返回的top k结果
+            deadline: 检索阶段的全局截止时间（秒，None表示使用query_deadline）
+            use_cache: 是否使用语义缓存
+            genes: 基因过滤条件（None表示从问题中提取）
+            variants: 变异过滤条件（None表示从问题中提取）
+            samples: 样本过滤条件（None表示从问题中提取）
             
         Returns:
             包含检索结果和生成答案的字典
         """
+        filters = derive_filters(question, genes, variants, samples)
+        
+        if use_cache:
+            cache_scope = SemanticCache.make_scope(
+                use_local_db, use_public_db, local_db_names, public_db_names, top_k,
+                filters.cache_key()
+            )
+            question_embedding = await self.vector_store_manager.embedding_service.encode(question)
+            cached = self.semantic_cache.lookup(question_embedding, cache_scope)
+            if cached:
+                cached["question"] = question
+                cached["cache_hit"] = True
+                return cached
+        
         results = {
             "question": question,
             "local_db_results": {},
             "public_db_results": {},
-            "answer": ""
+            "answer": "",
+            "timed_out_sources": [],
+            "cache_hit": False
         }
         
-        # 检索本地数据库
+        # 并发检索所有数据源
+        sources = self._build_sources(
+            question, use_local_db, use_public_db,
+            local_db_names, public_db_names, top_k, filters
+        )
+        await self._gather_sources(sources, results, deadline)
+        
+        # 生成答案
+        results["answer"] = await self._generate_answer(question, results)
+        
+        # 有数据源超时、检索出错或生成失败的结果不写入缓存
+        if use_cache and self._is_cacheable(results):
+            self.semantic_cache.store(question_embedding, cache_scope, results)
+        
+        return results
+    
+    async def query_many(
+        self,
+        questions: List[str],
+        use_local_db: bool = True,
+        use_public_db: bool = True,
+        local_db_names: Optional[List[str]] = None,
+        public_db_names: Optional[List[str]] = None,
+        top_k: int = 5,
+        genes: Optional[List[str]] = None,
+        variants: Optional[List[str]] = None,
+        samples: Optional[List[str]] = None,
+        deadline: Optional[float] = None
+    ) -> List[Dict]:
+        """
+        批量执行RAG查询
+        
+        所有问题一次性批量编码；每个本地数据库只获取一次数据，
+        相似度通过一次矩阵乘法计算；公共数据库检索和答案生成按batch_concurrency并发。
+        每次检索（本地数据库的一次批量检索、公共数据库对单个问题的检索，排队时间不计入）
+        受source_timeout限制，整个检索阶段受deadline限制，超时的数据源标记为超时，
+        答案基于已返回的结果生成
+        
+        Args:
+            questions: 用户问题列表
+            deadline: 检索阶段的全局截止时间（秒，None表示使用query_deadline）
+            其余参数含义与query相同
+            
+        Returns:
+            与questions一一对应的查询结果列表
+        """
+        all_results = [
+            {
+                "question": question,
+                "local_db_results": {},
+                "public_db_results": {},
+                "answer": "",
+                "timed_out_sources": [],
+                "cache_hit": False
+            }
+            for question in questions
+        ]
+        if not questions:
+            return all_results
+        
+        semaphore = asyncio.Semaphore(self.batch_concurrency)
+        deadline = deadline if deadline is not None else self.query_deadline
+        source_timeout = min(self.source_timeout, deadline)
+        
+        def mark_timed_out(results: Dict, group: str, db_name: str, message: str):
+            results[group][db_name] = self._error_result(group, message, timed_out=True)
+            results["timed_out_sources"].append(db_name)
+        
+        async def search_local(db_name: str):
+            try:
+                batch_results = await asyncio.wait_for(
+                    self.vector_store_manager.search_local_database_many(
+                        db_name, questions, question_embeddings, top_k, filters
+                    ),
+                    source_timeout
+                )
+            except asyncio.TimeoutError:
+                for results in all_results:
+                    mark_timed_out(
+                        results, "local_db_results", db_name, f"检索超时（超过{source_timeout}秒）"
+                    )
+                return
+            except Exception as e:
+                batch_results = [[{"error": str(e)}] for _ in questions]
+            for results, db_results in zip(all_results, batch_results):
+                results["local_db_results"][db_name] = db_results
+        
+        async def search_public(results: Dict, db_config: PublicDatabase):
+            async with semaphore:
+                try:
+                    results["public_db_results"][db_config.name] = await asyncio.wait_for(
+                        self.public_db_client.search_public_database(
+                            db_config, results["question"], top_k
+                        ),
+                        source_timeout
+                    )
+                except asyncio.TimeoutError:
+                    mark_timed_out(
+                        results, "public_db_results", db_config.name,
+                        f"检索超时（超过{source_timeout}秒）"
+                    )
+                except Exception as e:
+                    results["public_db_results"][db_config.name] = {"error": str(e)}
+        
+        async def generate(results: Dict):
+            async with semaphore:
+                results["answer"] = await self._generate_answer(
+                    results["question"], results, PRIORITY_BATCH
+                )
+        
+        # 检索任务 -> (结果分组, 数据库名称, 该任务写入的查询结果)
+        tasks: Dict[asyncio.Future, Tuple[str, str, List[Dict]]] = {}
+        
+        # 本地数据库：每个数据库一次批量检索
+        if use_local_db:
+            filters = [
+                derive_filters(question, genes, variants, samples) for question in questions
+            ]
+            question_embeddings = await self.vector_store_manager.embedding_service.encode(questions)
+            db_names = local_db_names or self.vector_store_manager.list_local_databases()
+            for db_name in db_names:
+                tasks[asyncio.ensure_future(search_local(db_name))] = \
+                    ("local_db_results", db_name, all_results)
+        
+        # 公共数据库：按问题逐个检索
+        if use_public_db:
+            public_dbs = self.database_manager.get_public_databases()
+            if public_db_names:
+                public_dbs = [
+                    db for db in public_dbs if db.name in public_db_names
+                ]
+            for results in all_results:
+                for db_config in public_dbs:
+                    tasks[asyncio.ensure_future(search_public(results, db_config))] = \
+                        ("public_db_results", db_config.name, [results])
+        
+        if tasks:
+            _, pending = await asyncio.wait(tasks, timeout=deadline)
+            # 超过全局截止时间仍未完成的检索
+            for task in pending:
+                task.cancel()
+                group, db_name, task_results = tasks[task]
+                for results in task_results:
+                    if db_name not in results[group]:
+                        mark_timed_out(
+                            results, group, db_name, f"检索超时（超过全局截止时间{deadline}秒）"
+                        )
+        
+        # 生成答案
+        await asyncio.gather(*(generate(results) for results in all_results))
+        
+        return all_results
+    
+    def _build_sources(
+        self,
+        question: str,
+        use_local_db: bool,
+        use_public_db: bool,
+        local_db_names: Optional[List[str]],
+        public_db_names: Optional[List[str]],
+        top_k: int,
+        filters: Optional[QueryFilters] = None
+    ) -> Dict[Tuple[str, str], Coroutine]:
+        """
+        构建各数据源的检索协程（过滤条件只作用于本地数据库）
+        
+        Returns:
+            (结果分组, 数据库名称) -> 检索协程
+        """
+        sources = {}
+        
+        # 本地数据库
         if use_local_db:
-            if local_db_names:
-                # 搜索指定的本地数据库
-                for db_name in local_db_names:
-                    try:
-                        results["local_db_results"][db_name] = \
-                            await self.vector_store_manager.search_local_database(
-                                db_name, question, top_k
-                            )
-                    except Exception as e:
-                        results["local_db_results"][db_name] = [{"error": str(e)}]
-            else:
-                # 搜索所有本地数据库
-                results["local_db_results"] = \
-                    await self.vector_store_manager.search_all_local_databases(
-                        question, top_k
+            db_names = local_db_names or self.vector_store_manager.list_local_databases()
+            for db_name in db_names:
+                sources[("local_db_results", db_name)] = \
+                    self.vector_store_manager.search_local_database(
+                        db_name, question, top_k, filters
                     )
         
-        # 检索公共数据库
+        # 公共数据库
         if use_public_db:
             public_dbs = self.database_manager.get_public_databases()
             if public_db_names:
@@ -130,60 +457,207 @@ class RAGEngine:
                 ]
             
             for db_config in public_dbs:
-                try:
-                    results["public_db_results"][db_config.name] = \
-                        await self.public_db_client.search_public_database(
-                            db_config, question, top_k
-                        )
-                except Exception as e:
-                    results["public_db_results"][db_config.name] = {
-                        "error": str(e)
-                    }
+                sources[("public_db_results", db_config.name)] = \
+                    self.public_db_client.search_public_database(
+                        db_config, question, top_k
+                    )
         
-        # 生成答案
-        results["answer"] = await self._generate_answer(question, results)
+        return sources
+    
+    @staticmethod
+    def _is_cacheable(results: Dict) -> bool:
+        """查询结果是否可写入语义缓存（没有超时的数据源、没有出错的检索结果且答案生成成功）"""
+        if results["timed_out_sources"] or results["answer"].startswith(GENERATION_ERROR_PREFIX):
+            return False
+        for group in ("local_db_results", "public_db_results"):
+            for db_results in results[group].values():
+                items = db_results if isinstance(db_results, list) else [db_results]
+                if any(isinstance(item, dict) and "error" in item for item in items):
+                    return False
+        return True
+    
+    def _error_result(self, group: str, message: str, timed_out: bool = False):
+        """按结果分组构建错误结果（本地数据库为列表，公共数据库为字典）"""
+        error = {"error": message}
+        if timed_out:
+            error["timed_out"] = True
+        return [error] if group == "local_db_results" else error
+    
+    async def _iter_sources(
+        self,
+        sources: Dict[Tuple[str, str], Coroutine],
+        deadline: Optional[float] = None
+    ) -> AsyncIterator[Tuple[str, str, object, bool]]:
+        """
+        并发执行所有检索协程，按完成顺序逐个产出结果
         
-        return results
+        每个数据源受source_timeout限制，整体受deadline限制；
+        未按时完成的数据源产出超时错误结果
+        
+        Args:
+            sources: _build_sources返回的检索协程
+            deadline: 全局截止时间（秒，None表示使用query_deadline）
+            
+        Yields:
+            (结果分组, 数据库名称, 检索结果, 是否超时)
+        """
+        if not sources:
+            return
+        
+        deadline = deadline if deadline is not None else self.query_deadline
+        source_timeout = min(self.source_timeout, deadline)
+        tasks = {
+            asyncio.ensure_future(asyncio.wait_for(coro, source_timeout)): key
+            for key, coro in sources.items()
+        }
+        
+        loop = asyncio.get_running_loop()
+        end_time = loop.time() + deadline
+        pending = set(tasks)
+        
+        try:
+            while pending:
+                remaining = end_time - loop.time()
+                if remaining <= 0:
+                    break
+                
+                done, pending = await asyncio.wait(
+                    pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    group, db_name = tasks[task]
+                    if isinstance(task.exception(), asyncio.TimeoutError):
+                        yield group, db_name, self._error_result(
+                            group, f"检索超时（超过{source_timeout}秒）", timed_out=True
+                        ), True
+                    elif task.exception() is not None:
+                        yield group, db_name, self._error_result(
+                            group, str(task.exception())
+                        ), False
+                    else:
+                        yield group, db_name, task.result(), False
+            
+            # 超过全局截止时间仍未完成的数据源
+            for task in pending:
+                task.cancel()
+                group, db_name = tasks[task]
+                yield group, db_name, self._error_result(
+                    group, f"检索超时（超过全局截止时间{deadline}秒）", timed_out=True
+                ), True
+        finally:
+            for task in pending:
+                task.cancel()
     
-    async def _generate_answer(
+    async def _gather_sources(
+        self,
+        sources: Dict[Tuple[str, str], Coroutine],
+        results: Dict,
+        deadline: Optional[float] = None
+    ) -> None:
+        """
+        并发执行所有检索协程，结果按数据源顺序写入results
+        
+        Args:
+            sources: _build_sources返回的检索协程
+            results: 查询结果字典
+            deadline: 全局截止时间（秒）
+        """
+        collected = {}
+        async for group, db_name, result, timed_out in self._iter_sources(sources, deadline):
+            collected[(group, db_name)] = (result, timed_out)
+        
+        for group, db_name in sources:
+            result, timed_out = collected[(group, db_name)]
+            results[group][db_name] = result
+            if timed_out:
+                results["timed_out_sources"].append(db_name)
+    
+    async def query_stream(
+        self,
+        question: str,
+        use_local_db: bool = True,
+        use_public_db: bool = True,
+        local_db_names: Optional[List[str]] = None,
+        public_db_names: Optional[List[str]] = None,
+        top_k: int = 5,
+        deadline: Optional[float] = None,
+        genes: Optional[List[str]] = None,
+        variants: Optional[List[str]] = None,
+        samples: Optional[List[str]] = None
+    ) -> AsyncIterator[Dict]:
+        """
+        流式执行RAG查询：每个数据源完成后立即产出其结果，随后逐段产出答案
+        
+        参数含义与query相同
+        
+        Yields:
+            事件字典，event字段为source（单个数据源结果）、token（答案片段）或done（结束）
+        """
+        results = {
+            "question": question,
+            "local_db_results": {},
+            "public_db_results": {},
+            "answer": "",
+            "timed_out_sources": []
+        }
+        
+        sources = self._build_sources(
+            question, use_local_db, use_public_db,
+            local_db_names, public_db_names, top_k,
+            derive_filters(question, genes, variants, samples)
+        )
+        async for group, db_name, result, timed_out in self._iter_sources(sources, deadline):
+            results[group][db_name] = result
+            if timed_out:
+                results["timed_out_sources"].append(db_name)
+            yield {
+                "event": "source",
+                "group": group,
+                "database": db_name,
+                "results": result,
+                "timed_out": timed_out
+            }
+        
+        answer_parts = []
+        async for token in self._stream_answer(question, results):
+            answer_parts.append(token)
+            yield {"event": "token", "content": token}
+        
+        yield {
+            "event": "done",
+            "answer": "".join(answer_parts),
+            "timed_out_sources": results["timed_out_sources"],
+            "context_stats": results.get("context_stats"),
+            "completion_cache_hit": results.get("completion_cache_hit", False)
+        }
+    
+    async def _build_prompt(
         self,
         question: str,
         retrieval_results: Dict
-    ) -> str:
+    ) -> Tuple[str, int]:
         """
-        基于检索结果生成答案
+        基于检索结果构建提示词
+        
+        上下文经过打包：去除重复和近似重复的记录，按MMR在各数据源之间选择，
+        截断过长的记录，总量不超过模型的token预算。打包统计写入retrieval_results["context_stats"]
         
         Args:
             question: 用户问题
             retrieval_results: 检索结果
             
         Returns:
-            生成的答案
+            (提示词, 上下文条数)
         """
-        # 构建上下文
-        context_parts = []
-        
-        # 添加本地数据库结果
-        for db_name, results in retrieval_results["local_db_results"].items():
-            if isinstance(results, list):
-                for result in results:
-                    if "content" in result:
-                        context_parts.append(
-                            f"[{db_name}] {result['content']}"
-                        )
-        
-        # 添加公共数据库结果
-        for db_name, results in retrieval_results["public_db_results"].items():
-            if isinstance(results, list):
-                for result in results:
-                    if "content" in result:
-                        context_parts.append(
-                            f"[{db_name}] {result['content']}"
-                        )
+        context_parts, retrieval_results["context_stats"] = await self.context_packer.pack(
+            question, retrieval_results
+        )
         
         context = "\n\n".join(context_parts)
         
         # 构建提示词
+        from langchain_core.prompts import PromptTemplate
+        
         prompt_template = PromptTemplate(
             input_variables=["context", "question"],
             template="""基于以下检索到的上下文信息，回答用户的问题。
@@ -198,23 +672,128 @@ class RAGEngine:
         )
         
         prompt = prompt_template.format(context=context, question=question)
+        return prompt, len(context_parts)
+    
+    async def _generate_answer(
+        self,
+        question: str,
+        retrieval_results: Dict,
+        priority: int = PRIORITY_INTERACTIVE
+    ) -> str:
+        """
+        基于检索结果生成答案
+        
+        提示词与之前某次生成完全相同（同一模型和温度）时直接返回缓存的答案，
+        是否命中写入retrieval_results["completion_cache_hit"]。
+        未命中时经生成调度器排队（受并发数和每分钟token数限制）后调用生成后端
+        
+        Args:
+            question: 用户问题
+            retrieval_results: 检索结果
+            priority: 排队优先级（数值越小越优先）
+            
+        Returns:
+            生成的答案
+        """
+        prompt, context_count = await self._build_prompt(question, retrieval_results)
+        retrieval_results["completion_cache_hit"] = False
+        generator = self.generator
         
         # 生成答案
-        if self.llm:
+        if generator:
+            cache_key = CompletionCache.make_key(generator.model_name, self.temperature, prompt)
+            cached = await self._cached_completion(cache_key)
+            if cached is not None:
+                retrieval_results["completion_cache_hit"] = True
+                return cached
+            
             try:
-                from langchain_core.messages import HumanMessage
-                messages = [HumanMessage(content=prompt)]
-                response = await self.llm.ainvoke(messages)
-                if hasattr(response, 'content'):
-                    return response.content
-                return str(response)
+                prompt_tokens = self.context_packer.counter.count(prompt)
+                async with self.generation_scheduler.slot(prompt_tokens, priority):
+                    answer = await generator.generate(prompt)
             except Exception as e:
-                return f"生成答案时出错: {str(e)}"
+                return f"{GENERATION_ERROR_PREFIX}: {str(e)}"
+            
+            await self._store_completion(cache_key, generator.model_name, answer)
+            return answer
         else:
-            # 如果没有LLM，返回检索到的内容摘要
-            return f"检索到 {len(context_parts)} 条相关信息。请查看检索结果获取详细信息。"
+            # 如果没有生成后端，返回检索到的内容摘要
+            return f"检索到 {context_count} 条相关信息。请查看检索结果获取详细信息。"
+    
+    async def _stream_answer(
+        self,
+        question: str,
+        retrieval_results: Dict
+    ) -> AsyncIterator[str]:
+        """
+        基于检索结果流式生成答案（使用生成后端的流式接口）
+        
+        命中LLM补全缓存时一次性产出缓存的答案；生成期间一直占用生成调度器的名额
+        
+        Args:
+            question: 用户问题
+            retrieval_results: 检索结果
+            
+        Yields:
+            答案片段
+        """
+        prompt, context_count = await self._build_prompt(question, retrieval_results)
+        retrieval_results["completion_cache_hit"] = False
+        generator = self.generator
+        
+        if generator:
+            cache_key = CompletionCache.make_key(generator.model_name, self.temperature, prompt)
+            cached = await self._cached_completion(cache_key)
+            if cached is not None:
+                retrieval_results["completion_cache_hit"] = True
+                yield cached
+                return
+            
+            parts = []
+            try:
+                prompt_tokens = self.context_packer.counter.count(prompt)
+                async with self.generation_scheduler.slot(prompt_tokens, PRIORITY_INTERACTIVE):
+                    async for content in generator.stream(prompt):
+                        parts.append(content)
+                        yield content
+            except Exception as e:
+                yield f"{GENERATION_ERROR_PREFIX}: {str(e)}"
+                return
+            
+            await self._store_completion(cache_key, generator.model_name, "".join(parts))
+        else:
+            # 如果没有生成后端，返回检索到的内容摘要
+            yield f"检索到 {context_count} 条相关信息。请查看检索结果获取详细信息。"
+    
+    async def _cached_completion(self, cache_key: str) -> Optional[str]:
+        """读取LLM补全缓存（未启用或读取失败时返回None）"""
+        if self.completion_cache is None:
+            return None
+        try:
+            return await self.completion_cache.get(cache_key)
+        except Exception as e:
+            print(f"读取LLM补全缓存失败: {str(e)}")
+            return None
+    
+    async def _store_completion(self, cache_key: str, model_name: str, answer: str) -> None:
+        """写入LLM补全缓存（空答案不缓存，写入失败只记录）"""
+        if self.completion_cache is None or not answer:
+            return
+        try:
+            await self.completion_cache.put(cache_key, model_name, self.temperature, answer)
+        except Exception as e:
+            print(f"写入LLM补全缓存失败: {str(e)}")
+    
+    def generation_stats(self) -> Dict:
+        """生成后端和调度指标（不会触发生成后端的创建）"""
+        stats = self.generation_scheduler.stats()
+        stats["backend"] = self._generator.name if self._generator else None
+        stats["model"] = self._generator.model_name if self._generator else None
+        return stats
     
     async def close(self):
         """关闭资源"""
         await self.public_db_client.close()
         await self.vector_store_manager.close()
+        await close_http_client()
+        shutdown_executors()
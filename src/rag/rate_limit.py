@@ -0,0 +1,142 @@
+"""
+上游限流与请求合并模块
+按主机的令牌桶限制对外请求速率（例如NCBI E-utilities按IP限速），
+并将相同的并发请求合并为一次网络调用（single-flight）
+"""
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, Hashable, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class TokenBucket:
+    """令牌桶：平均速率为rate，允许burst个请求的突发；等待令牌的请求按先后顺序放行"""
+
+    def __init__(self, rate: float, burst: int):
+        """
+        Args:
+            rate: 每秒补充的令牌数（每秒请求数上限）
+            burst: 桶容量（允许的突发请求数）
+        """
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.throttled = 0
+        self.total_wait = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _get_lock(self) -> asyncio.Lock:
+        """获取当前事件循环的锁（事件循环变化时重新创建）"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    def _refill(self) -> None:
+        """按经过的时间补充令牌"""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, tokens: float = 1.0) -> float:
+        """
+        获取令牌，令牌不足时等待
+
+        Args:
+            tokens: 需要的令牌数（超过桶容量时按桶容量计算）
+
+        Returns:
+            等待的时间（秒）
+        """
+        tokens = min(tokens, self.burst)
+        async with self._get_lock():
+            self._refill()
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return 0.0
+
+            wait = (tokens - self.tokens) / self.rate
+            self.throttled += 1
+            self.total_wait += wait
+            await asyncio.sleep(wait)
+            self._refill()
+            self.tokens = max(self.tokens - tokens, 0.0)
+            return wait
+
+    def try_acquire(self, tokens: float = 1.0) -> float:
+        """
+        不等待地获取令牌：令牌足够时扣除并返回0，否则不扣除，返回还需等待的时间
+        （供自行排队的调用方使用，例如按优先级放行的生成调度器）
+
+        Args:
+            tokens: 需要的令牌数（超过桶容量时按桶容量计算）
+
+        Returns:
+            还需等待的时间（秒），0表示已获取
+        """
+        tokens = min(tokens, self.burst)
+        self._refill()
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return 0.0
+        return (tokens - self.tokens) / self.rate
+
+    def stats(self) -> Dict:
+        """限流指标"""
+        return {
+            "rate": self.rate,
+            "burst": self.burst,
+            "throttled": self.throttled,
+            "total_wait_seconds": round(self.total_wait, 3)
+        }
+
+
+class SingleFlight:
+    """请求合并：同一个键同时只执行一次调用，期间的重复调用等待并共享同一个结果（或异常）"""
+
+    def __init__(self):
+        self.calls: Dict[Hashable, asyncio.Future] = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        执行调用（相同键的调用正在进行时直接等待其结果）
+
+        某个等待者被取消不会取消共享的调用，其他等待者仍能拿到结果
+
+        Args:
+            key: 请求的键（例如方法 + URL + 参数）
+            fn: 发起调用的函数
+
+        Returns:
+            调用结果
+        """
+        future = self.calls.get(key)
+        if future is None:
+            future = asyncio.ensure_future(fn())
+            self.calls[key] = future
+            future.add_done_callback(lambda done: self._finish(key, done))
+            self.executed += 1
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(future)
+
+    def _finish(self, key: Hashable, future: asyncio.Future) -> None:
+        """调用结束后移除键；读取异常，避免所有等待者都已取消时出现未读取异常的警告"""
+        if self.calls.get(key) is future:
+            del self.calls[key]
+        if not future.cancelled():
+            future.exception()
+
+    def stats(self) -> Dict:
+        """请求合并指标"""
+        return {
+            "in_flight": len(self.calls),
+            "executed": self.executed,
+            "coalesced": self.coalesced
+        }
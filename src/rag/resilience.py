@@ -0,0 +1,295 @@
+"""
+请求容错模块
+为公共数据库的幂等GET请求提供对冲请求（超过近期p95延迟时发出重复请求）、
+指数退避加随机抖动的重试，以及按数据源的熔断器，用于限制尾延迟
+"""
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, Optional
+
+import httpx
+
+from src.config.database_manager import (
+    PublicDatabase, DEFAULT_REQUEST_TIMEOUT, DEFAULT_MAX_RETRIES,
+    DEFAULT_CIRCUIT_FAILURE_THRESHOLD, DEFAULT_CIRCUIT_RESET_TIMEOUT
+)
+
+# 可重试的HTTP状态码
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+# 重试退避的基准延迟和上限（秒）
+RETRY_BASE_DELAY = 0.2
+RETRY_MAX_DELAY = 5.0
+# 计算p95延迟使用的最近成功请求数，以及开始对冲所需的最少样本数
+LATENCY_WINDOW = 200
+HEDGE_MIN_SAMPLES = 20
+# 样本不足时的对冲延迟，以及对冲延迟下限（秒）
+HEDGE_DEFAULT_DELAY = 2.0
+HEDGE_MIN_DELAY = 0.05
+
+
+class CircuitOpenError(Exception):
+    """数据源处于熔断状态，请求被直接拒绝"""
+
+
+class CircuitBreaker:
+    """熔断器：连续失败达到阈值后熔断，熔断期满后放行一个探测请求，探测成功则恢复"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        """
+        Args:
+            failure_threshold: 连续失败多少次后熔断
+            reset_timeout: 熔断持续时间（秒）
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self._probing = False
+
+    def allow(self) -> bool:
+        """是否放行请求（半开状态下同时只放行一个探测请求）"""
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+            self._probing = False
+        if self.state == self.HALF_OPEN:
+            if self._probing:
+                return False
+            self._probing = True
+            return True
+        return self.state == self.CLOSED
+
+    def record_success(self) -> None:
+        """记录一次成功请求"""
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self._probing = False
+
+    def record_failure(self) -> None:
+        """记录一次失败请求"""
+        self.consecutive_failures += 1
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.times_opened += 1
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+            self._probing = False
+
+    def release_probe(self) -> None:
+        """探测请求被取消（没有结果）时释放探测名额"""
+        self._probing = False
+
+
+class SourceResilience:
+    """单个数据源的容错状态和统计"""
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.latencies: deque = deque(maxlen=LATENCY_WINDOW)
+        self.calls = 0
+        self.failures = 0
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.rejected = 0
+
+    def p95_latency(self) -> Optional[float]:
+        """最近成功请求的p95延迟（样本不足时为None）"""
+        if len(self.latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)]
+
+    def hedge_delay(self) -> float:
+        """发出对冲请求前的等待时间"""
+        p95 = self.p95_latency()
+        return HEDGE_DEFAULT_DELAY if p95 is None else max(p95, HEDGE_MIN_DELAY)
+
+    def stats(self) -> Dict:
+        """容错指标"""
+        p95 = self.p95_latency()
+        return {
+            "circuit_state": self.breaker.state,
+            "circuit_opened": self.breaker.times_opened,
+            "consecutive_failures": self.breaker.consecutive_failures,
+            "calls": self.calls,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "p95_latency": round(p95, 4) if p95 is not None else None
+        }
+
+
+def _is_retryable(error: Exception) -> bool:
+    """网络错误、超时和429/5xx响应可以重试"""
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code in RETRYABLE_STATUS
+    return isinstance(error, httpx.TransportError)
+
+
+def _backoff_delay(attempt: int, error: Exception) -> float:
+    """第attempt次重试前的等待时间：全抖动指数退避，429响应遵循Retry-After（不超过上限）"""
+    delay = random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+    if isinstance(error, httpx.HTTPStatusError):
+        retry_after = error.response.headers.get("Retry-After", "")
+        if retry_after.isdigit():
+            delay = max(delay, min(float(retry_after), RETRY_MAX_DELAY))
+    return delay
+
+
+class ResilienceManager:
+    """按数据源管理容错状态"""
+
+    def __init__(self):
+        self.sources: Dict[str, SourceResilience] = {}
+
+    def get(self, name: str, db_config: Optional[PublicDatabase] = None) -> SourceResilience:
+        """获取（必要时创建）数据源的容错状态"""
+        if name not in self.sources:
+            self.sources[name] = SourceResilience(
+                name,
+                db_config.circuit_failure_threshold if db_config else DEFAULT_CIRCUIT_FAILURE_THRESHOLD,
+                db_config.circuit_reset_timeout if db_config else DEFAULT_CIRCUIT_RESET_TIMEOUT
+            )
+        return self.sources[name]
+
+    async def call(
+        self,
+        name: str,
+        send: Callable[[], Awaitable[httpx.Response]],
+        db_config: Optional[PublicDatabase] = None,
+        throttle: Optional[Callable[[], Awaitable[float]]] = None
+    ) -> httpx.Response:
+        """
+        发送幂等请求：熔断时直接拒绝，否则按配置对冲和重试
+
+        Args:
+            name: 数据源名称（熔断和延迟统计按数据源划分）
+            send: 发送一次请求的函数（可能被调用多次）
+            db_config: 公共数据库配置（提供超时、重试、对冲和熔断参数）
+            throttle: 获取限流令牌的函数（每次发出请求前调用，等待时间不计入超时、对冲延迟和延迟统计）
+
+        Returns:
+            HTTP响应（429/5xx之外的状态码原样返回，由调用方处理）
+
+        Raises:
+            CircuitOpenError: 数据源处于熔断状态
+        """
+        source = self.get(name, db_config)
+        if not source.breaker.allow():
+            source.rejected += 1
+            raise CircuitOpenError(f"数据源 {name} 熔断中，{source.breaker.reset_timeout:.0f} 秒内暂停请求")
+
+        source.calls += 1
+        timeout = db_config.request_timeout if db_config else DEFAULT_REQUEST_TIMEOUT
+        max_retries = db_config.max_retries if db_config else DEFAULT_MAX_RETRIES
+        hedge = db_config.hedge_requests if db_config else True
+
+        try:
+            response = await self._call_with_retries(source, send, timeout, max_retries, hedge, throttle)
+        except asyncio.CancelledError:
+            source.breaker.release_probe()
+            raise
+        except Exception:
+            source.failures += 1
+            source.breaker.record_failure()
+            raise
+
+        source.breaker.record_success()
+        return response
+
+    async def _call_with_retries(
+        self,
+        source: SourceResilience,
+        send: Callable[[], Awaitable[httpx.Response]],
+        timeout: float,
+        max_retries: int,
+        hedge: bool,
+        throttle: Optional[Callable[[], Awaitable[float]]] = None
+    ) -> httpx.Response:
+        """可重试的失败按指数退避加随机抖动重试"""
+        attempt = 0
+        while True:
+            try:
+                return await self._hedged_attempt(source, send, timeout, hedge, throttle)
+            except Exception as e:
+                if attempt >= max_retries or not _is_retryable(e):
+                    raise
+                source.retries += 1
+                await asyncio.sleep(_backoff_delay(attempt, e))
+                attempt += 1
+
+    async def _hedged_attempt(
+        self,
+        source: SourceResilience,
+        send: Callable[[], Awaitable[httpx.Response]],
+        timeout: float,
+        hedge: bool,
+        throttle: Optional[Callable[[], Awaitable[float]]] = None
+    ) -> httpx.Response:
+        """
+        一次（可能对冲的）请求：首个请求超过hedge_delay仍未返回时再发出一个相同请求，
+        取先成功的结果并取消另一个；两个都失败时抛出最后一个错误
+
+        首个请求在计时开始之前获取限流令牌，对冲请求在其自身计时开始之前获取，
+        排队等待的时间不会触发超时或对冲，也不计入延迟统计
+        """
+        async def single() -> httpx.Response:
+            start = time.perf_counter()
+            try:
+                response = await asyncio.wait_for(send(), timeout)
+            except asyncio.TimeoutError:
+                raise httpx.TimeoutException(f"请求超过 {timeout} 秒未返回")
+            if response.status_code in RETRYABLE_STATUS:
+                # 流式响应的响应体未读取，关闭以归还连接
+                await response.aclose()
+                response.raise_for_status()
+            source.latencies.append(time.perf_counter() - start)
+            return response
+
+        async def throttled_single() -> httpx.Response:
+            if throttle is not None:
+                await throttle()
+            return await single()
+
+        if throttle is not None:
+            await throttle()
+        if not hedge:
+            return await single()
+
+        first = asyncio.ensure_future(single())
+        pending = {first}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=source.hedge_delay())
+            if not done:
+                source.hedges += 1
+                pending.add(asyncio.ensure_future(throttled_single()))
+
+            error: Optional[BaseException] = None
+            while True:
+                for task in done:
+                    if task.exception() is None:
+                        if task is not first:
+                            source.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+                if not pending:
+                    raise error
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self) -> Dict:
+        """各数据源的容错指标"""
+        return {name: source.stats() for name, source in self.sources.items()}
@@ -0,0 +1,147 @@
+"""
+语义答案缓存模块
+以问题嵌入向量为键缓存RAG查询结果，相似问题（余弦相似度超过阈值）直接复用已有答案
+"""
+import copy
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Optional
+
+import numpy as np
+
+
+class SemanticCacheEntry:
+    """语义缓存条目"""
+
+    def __init__(self, scope: Hashable, response: Dict, expires_at: float):
+        self.scope = scope
+        self.response = response
+        self.expires_at = expires_at
+
+
+class SemanticCache:
+    """内存中的语义缓存（向量矩阵 + TTL + LRU淘汰）"""
+
+    def __init__(
+        self,
+        similarity_threshold: Optional[float] = None,
+        ttl: Optional[float] = None,
+        max_entries: Optional[int] = None
+    ):
+        """
+        初始化语义缓存
+
+        Args:
+            similarity_threshold: 命中所需的最小余弦相似度（默认读取SEMANTIC_CACHE_THRESHOLD环境变量）
+            ttl: 条目有效期（秒，默认读取SEMANTIC_CACHE_TTL环境变量）
+            max_entries: 最大条目数（默认读取SEMANTIC_CACHE_SIZE环境变量）
+        """
+        self.similarity_threshold = similarity_threshold or float(
+            os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95")
+        )
+        self.ttl = ttl or float(os.getenv("SEMANTIC_CACHE_TTL", "3600"))
+        self.max_entries = max_entries or int(os.getenv("SEMANTIC_CACHE_SIZE", "1000"))
+
+        # 行号 -> 条目，按最近使用顺序排列（最久未使用的在前）
+        self.entries: "OrderedDict[int, SemanticCacheEntry]" = OrderedDict()
+        self.vectors: Optional[np.ndarray] = None
+        self.free_slots: List[int] = []
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_scope(
+        use_local_db: bool,
+        use_public_db: bool,
+        local_db_names: Optional[List[str]],
+        public_db_names: Optional[List[str]],
+        top_k: int,
+        filters: Hashable = None
+    ) -> Hashable:
+        """根据数据库选择、top_k和查询过滤条件构建缓存作用域，只有作用域相同的查询才能互相命中"""
+        return (
+            use_local_db,
+            use_public_db,
+            tuple(sorted(local_db_names)) if local_db_names else None,
+            tuple(sorted(public_db_names)) if public_db_names else None,
+            top_k,
+            filters
+        )
+
+    @staticmethod
+    def _normalize(embedding: np.ndarray) -> np.ndarray:
+        """归一化向量，使点积即为余弦相似度"""
+        embedding = np.asarray(embedding, dtype=np.float32)
+        return embedding / (np.linalg.norm(embedding) + 1e-8)
+
+    def _evict_expired(self) -> None:
+        """删除所有过期条目"""
+        now = time.time()
+        for slot in [slot for slot, entry in self.entries.items() if entry.expires_at <= now]:
+            del self.entries[slot]
+            self.free_slots.append(slot)
+
+    def lookup(self, embedding: np.ndarray, scope: Hashable) -> Optional[Dict]:
+        """
+        查找与问题语义相似的缓存结果
+
+        Args:
+            embedding: 问题嵌入向量
+            scope: make_scope构建的缓存作用域
+
+        Returns:
+            缓存的查询结果副本，未命中返回None
+        """
+        self._evict_expired()
+
+        slots = [slot for slot, entry in self.entries.items() if entry.scope == scope]
+        if not slots:
+            self.misses += 1
+            return None
+
+        similarities = self.vectors[slots] @ self._normalize(embedding)
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.similarity_threshold:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.entries.move_to_end(slots[best])
+        return copy.deepcopy(self.entries[slots[best]].response)
+
+    def store(self, embedding: np.ndarray, scope: Hashable, response: Dict) -> None:
+        """
+        写入缓存，容量不足时淘汰最久未使用的条目
+
+        Args:
+            embedding: 问题嵌入向量
+            scope: make_scope构建的缓存作用域
+            response: 查询结果
+        """
+        embedding = self._normalize(embedding)
+        if self.vectors is None:
+            self.vectors = np.zeros((self.max_entries, embedding.shape[0]), dtype=np.float32)
+            self.free_slots = list(range(self.max_entries - 1, -1, -1))
+
+        self._evict_expired()
+        if self.free_slots:
+            slot = self.free_slots.pop()
+        else:
+            slot, _ = self.entries.popitem(last=False)
+
+        self.vectors[slot] = embedding
+        self.entries[slot] = SemanticCacheEntry(
+            scope, copy.deepcopy(response), time.time() + self.ttl
+        )
+
+    def stats(self) -> Dict:
+        """缓存统计信息"""
+        total = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0
+        }
@@ -0,0 +1,326 @@
+"""
+变异结构化索引模块
+从问题和记录中解析变异记号（rsID、基因 + 蛋白改变、HGVS c./g.写法、染色体坐标），
+并提供标识符哈希查找和基因组坐标区间查找，作为向量检索之前的快速路径
+"""
+import re
+import threading
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# 三字母氨基酸缩写 -> 单字母缩写
+_AMINO_ACIDS = {
+    "Ala": "A", "Arg": "R", "Asn": "N", "Asp": "D", "Cys": "C",
+    "Gln": "Q", "Glu": "E", "Gly": "G", "His": "H", "Ile": "I",
+    "Leu": "L", "Lys": "K", "Met": "M", "Phe": "F", "Pro": "P",
+    "Ser": "S", "Thr": "T", "Trp": "W", "Tyr": "Y", "Val": "V",
+    "Sec": "U", "Ter": "*"
+}
+_AA = r"(?:" + "|".join(_AMINO_ACIDS) + r"|[ACDEFGHIKLMNPQRSTUVWY])"
+# 基因符号，例如 BRAF、TP53、HLA-B
+_GENE = r"[A-Z][A-Z0-9]{1,9}(?:-[A-Z0-9]+)?"
+# 转录本编号，例如 NM_000546.5、NM_000546.5(TP53)、ENST00000269305
+_TRANSCRIPT = r"(N[MR]_\d+|ENST\d+)(?:\.\d+)?(?:\([A-Za-z0-9-]+\))?"
+# 记号边界只看ASCII字母数字：\b会把中文字符当作单词字符，“解释BRAF V600E突变”中的记号将无法匹配
+_START = r"(?<![A-Za-z0-9_])"
+_END = r"(?![A-Za-z0-9_])"
+
+_RSID_PATTERN = re.compile(_START + r"rs(\d+)" + _END, re.IGNORECASE)
+# 蛋白改变：p.V600E、p.Arg175His、p.(Arg175His)；没有p.前缀时必须跟在基因符号之后（BRAF V600E）
+_PROTEIN_PATTERN = re.compile(
+    r"(?:" + _START + r"(" + _GENE + r")[\s:]+)?(p\.)?\(?(" + _AA + r")(\d+)(" + _AA + r"|\*|=|fs)"
+    r"(fs)?(?:Ter|\*)?\d*\)?(?![A-Za-z0-9])"
+)
+# cDNA改变：c.215C>G、c.68_69delAG、c.1A>G，可带转录本或基因前缀
+_CDNA_PATTERN = re.compile(
+    r"(?:" + _START + _TRANSCRIPT + r":|" + _START + r"(" + _GENE + r")[\s:]+)?" + _START + r"c\."
+    r"([-*]?\d+(?:[+-]\d+)?(?:_[-*]?\d+(?:[+-]\d+)?)?"
+    r"(?:[ACGT]+>[ACGT]+|delins[ACGT]+|del[ACGT]*|dup[ACGT]*|ins[ACGT]+|[ACGT]?=)?)"
+)
+# 染色体坐标：chr7:140453136A>T、7:g.140453136A>T、chr7:140,453,136-140,453,200
+_GENOMIC_PATTERN = re.compile(
+    r"(?<![A-Za-z0-9_.])(chr)?(\d{1,2}|[XYM]|MT):(g\.)?(\d[\d,]*)(?:[-_](\d[\d,]*))?"
+    r"(?:\s*([ACGT]+)\s*>\s*([ACGT]+))?",
+    re.IGNORECASE
+)
+# VCF风格坐标：7-140453136-A-T、chr7-140453136-A-T
+_VCF_PATTERN = re.compile(
+    r"(?<![A-Za-z0-9_.])(?:chr)?(\d{1,2}|[XYM]|MT)-(\d+)-([ACGT]+)-([ACGT]+)" + _END,
+    re.IGNORECASE
+)
+# RefSeq染色体HGVS：NC_000007.13:g.140453136A>T
+_REFSEQ_PATTERN = re.compile(
+    _START + r"NC_0*(\d+)\.\d+:g\.(\d+)(?:_(\d+))?(?:([ACGT]+)>([ACGT]+))?"
+)
+_REFSEQ_CHROMOSOMES = {"23": "X", "24": "Y", "12920": "MT"}
+# 没有基因/转录本限定的蛋白/cDNA改变在索引中额外登记的键前缀
+_UNQUALIFIED_PREFIX = "?:"
+
+# 记录中可能存放基因和坐标的结构化字段
+_GENE_FIELDS = ("gene", "gene_symbol", "genesymbol", "symbol")
+_CHROM_FIELDS = ("chrom", "chr", "chromosome", "#chrom")
+_POS_FIELDS = ("pos", "position", "start")
+_REF_FIELDS = ("ref", "reference")
+_ALT_FIELDS = ("alt", "alternate")
+
+
+class Variant:
+    """解析出的变异记号"""
+
+    def __init__(
+        self,
+        key: Optional[str] = None,
+        bare_key: Optional[str] = None,
+        chrom: Optional[str] = None,
+        start: Optional[int] = None,
+        end: Optional[int] = None
+    ):
+        """
+        Args:
+            key: 规范化标识符，例如 rs121913529、BRAF:p.V600E、NM_000546:c.215C>G、7:140453136:A>T
+            bare_key: 去掉基因/转录本限定的标识符（例如 p.V600E）
+            chrom: 染色体（不带chr前缀）
+            start: 起始坐标
+            end: 终止坐标（含）
+        """
+        self.key = key
+        self.bare_key = bare_key
+        self.chrom = chrom
+        self.start = start
+        self.end = end
+
+    def __repr__(self) -> str:
+        location = f" {self.chrom}:{self.start}-{self.end}" if self.chrom else ""
+        return f"Variant({self.key or self.bare_key}{location})"
+
+
+def _normalize_chrom(chrom: str) -> str:
+    """染色体名称规范化：去掉chr前缀，M统一为MT"""
+    chrom = chrom.upper()
+    if chrom.startswith("CHR"):
+        chrom = chrom[3:]
+    return "MT" if chrom == "M" else chrom
+
+
+def _genomic_variant(
+    chrom: str,
+    start: int,
+    end: Optional[int] = None,
+    ref: Optional[str] = None,
+    alt: Optional[str] = None
+) -> Variant:
+    """构建基因组坐标变异（有参考/替代碱基时同时生成标识符）"""
+    chrom = _normalize_chrom(chrom)
+    if end is None:
+        end = start + len(ref) - 1 if ref else start
+    key = f"{chrom}:{start}:{ref.upper()}>{alt.upper()}" if ref and alt else None
+    return Variant(key=key, chrom=chrom, start=start, end=max(start, end))
+
+
+def parse_variants(text: str, gene: Optional[str] = None) -> List[Variant]:
+    """
+    从文本中解析变异记号
+
+    Args:
+        text: 问题或记录文本
+        gene: 已知的基因符号（例如记录的gene字段），用于限定没有基因前缀的蛋白/cDNA改变
+
+    Returns:
+        变异列表（按在文本中出现的顺序）
+    """
+    found: List[Tuple[int, Variant]] = []
+
+    for match in _RSID_PATTERN.finditer(text):
+        found.append((match.start(), Variant(key=f"rs{match.group(1)}")))
+
+    for match in _PROTEIN_PATTERN.finditer(text):
+        symbol, prefix, ref, position, alt, frameshift = match.groups()
+        if not symbol and not prefix:
+            continue
+        # 移码写法（p.K123fs、p.Lys123ArgfsTer5）统一为 p.K123fs
+        alt = "fs" if frameshift else _AMINO_ACIDS.get(alt, alt)
+        change = "p." + _AMINO_ACIDS.get(ref, ref) + position + alt
+        qualifier = symbol or gene
+        key = f"{qualifier.upper()}:{change}" if qualifier else None
+        found.append((match.start(), Variant(key=key, bare_key=change)))
+
+    for match in _CDNA_PATTERN.finditer(text):
+        transcript, symbol, change = match.groups()
+        change = "c." + change
+        qualifier = transcript or symbol or gene
+        key = f"{qualifier.upper()}:{change}" if qualifier else None
+        found.append((match.start(), Variant(key=key, bare_key=change)))
+
+    for match in _GENOMIC_PATTERN.finditer(text):
+        chr_prefix, chrom, hgvs_prefix, start, end, ref, alt = match.groups()
+        # 没有chr、g.前缀也没有碱基改变的“数字:数字”（例如时间）不视为坐标
+        if not (chr_prefix or hgvs_prefix or ref):
+            continue
+        start = int(start.replace(",", ""))
+        end = int(end.replace(",", "")) if end else None
+        found.append((match.start(), _genomic_variant(chrom, start, end, ref, alt)))
+
+    for match in _VCF_PATTERN.finditer(text):
+        chrom, start, ref, alt = match.groups()
+        found.append((match.start(), _genomic_variant(chrom, int(start), None, ref, alt)))
+
+    for match in _REFSEQ_PATTERN.finditer(text):
+        number, start, end, ref, alt = match.groups()
+        chrom = _REFSEQ_CHROMOSOMES.get(number, number)
+        found.append((
+            match.start(),
+            _genomic_variant(chrom, int(start), int(end) if end else None, ref, alt)
+        ))
+
+    found.sort(key=lambda entry: entry[0])
+    return [variant for _, variant in found]
+
+
+def _field(metadata: Dict, names: Tuple[str, ...]) -> Optional[str]:
+    """按候选字段名（不区分大小写）读取记录的标量字段"""
+    for key, value in metadata.items():
+        if key.lower() in names and isinstance(value, (str, int)) and str(value).strip():
+            return str(value).strip()
+    return None
+
+
+def record_variants(content: str, metadata: Dict) -> List[Variant]:
+    """
+    解析一条记录中的变异：内容和标量元数据中的记号，以及chrom/pos/ref/alt等结构化字段
+
+    Args:
+        content: 记录内容
+        metadata: 记录元数据
+
+    Returns:
+        变异列表
+    """
+    values = [
+        str(value) for value in metadata.values()
+        if isinstance(value, (str, int, float)) and not isinstance(value, bool)
+    ]
+    gene = _field(metadata, _GENE_FIELDS)
+    variants = parse_variants(" ".join([content or ""] + values), gene)
+
+    chrom = _field(metadata, _CHROM_FIELDS)
+    position = _field(metadata, _POS_FIELDS)
+    if chrom and position and position.isdigit():
+        variants.append(_genomic_variant(
+            chrom, int(position), None,
+            _field(metadata, _REF_FIELDS), _field(metadata, _ALT_FIELDS)
+        ))
+
+    return variants
+
+
+class VariantIndex:
+    """
+    变异结构化索引：标识符 -> 记录id的哈希表，以及按染色体分组、按起始坐标排序的区间数组
+    记录id按插入顺序递增，支持增量插入
+    """
+
+    def __init__(self):
+        # 标识符 -> 记录id数组
+        self.ids: Dict[str, array] = {}
+        # 染色体 -> (起始坐标数组, 终止坐标数组, 记录id数组)，按插入顺序
+        self.intervals: Dict[str, Tuple[array, array, array]] = {}
+        # 染色体 -> 按起始坐标排序后的NumPy数组及最长区间长度（插入后失效，查询时重建）
+        self._sorted: Dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray, int]] = {}
+        self.size = 0
+        self._lock = threading.Lock()
+
+    def add(self, variant_lists: List[List[Variant]]) -> None:
+        """
+        追加记录
+
+        Args:
+            variant_lists: 每条记录解析出的变异列表
+        """
+        with self._lock:
+            for variants in variant_lists:
+                record_id = self.size
+                keys = set()
+                for variant in variants:
+                    keys.update(key for key in (variant.key, variant.bare_key) if key)
+                    if variant.bare_key and not variant.key:
+                        # 没有基因/转录本限定的记录，限定查询未命中时可以匹配
+                        keys.add(_UNQUALIFIED_PREFIX + variant.bare_key)
+                    if variant.chrom is not None:
+                        if variant.chrom not in self.intervals:
+                            self.intervals[variant.chrom] = (array("q"), array("q"), array("q"))
+                        starts, ends, ids = self.intervals[variant.chrom]
+                        starts.append(variant.start)
+                        ends.append(variant.end)
+                        ids.append(record_id)
+                        self._sorted.pop(variant.chrom, None)
+                for key in keys:
+                    self.ids.setdefault(key, array("q")).append(record_id)
+                self.size += 1
+
+    def clear(self) -> None:
+        """清空索引"""
+        with self._lock:
+            self.ids = {}
+            self.intervals = {}
+            self._sorted = {}
+            self.size = 0
+
+    def lookup(self, variants: List[Variant], k: int) -> List[int]:
+        """
+        查找与变异匹配的记录：先按标识符精确查找（限定标识符未命中时匹配没有限定的记录，
+        例如 BRAF p.V600E 可以匹配只写了 p.V600E 的记录，但不匹配 NRAS p.V600E），
+        再按坐标区间查找重叠的记录（离查询坐标越近越靠前）。查询坐标给出了完整的参考/替代碱基时
+        只做精确匹配，不返回同一位置的其他等位基因
+
+        Args:
+            variants: 查询中的变异
+            k: 返回结果数
+
+        Returns:
+            去重后的记录id列表
+        """
+        hits: Dict[int, None] = {}
+        with self._lock:
+            for variant in variants:
+                if variant.key:
+                    ids = self.ids.get(variant.key)
+                    if not ids and variant.bare_key:
+                        ids = self.ids.get(_UNQUALIFIED_PREFIX + variant.bare_key)
+                else:
+                    ids = self.ids.get(variant.bare_key)
+                hits.update(dict.fromkeys(ids or ()))
+            for variant in variants:
+                if variant.chrom is not None and not variant.key:
+                    hits.update(dict.fromkeys(self._overlapping(variant).tolist()))
+
+        return list(hits)[:k]
+
+    def _overlapping(self, variant: Variant) -> np.ndarray:
+        """
+        区间查找（调用方持有锁）：二分定位起始坐标不晚于查询终点、且不早于查询起点减去最长区间长度的记录，
+        再筛选终止坐标不早于查询起点的记录，复杂度O(log n + 候选数)
+
+        Args:
+            variant: 带坐标的查询变异
+
+        Returns:
+            与查询区间重叠的记录id，按与查询起点的距离升序
+        """
+        if variant.chrom not in self.intervals:
+            return np.zeros(0, dtype=np.int64)
+
+        if variant.chrom not in self._sorted:
+            starts, ends, ids = (np.frombuffer(column, dtype=np.int64) for column in self.intervals[variant.chrom])
+            order = np.argsort(starts, kind="stable")
+            self._sorted[variant.chrom] = (
+                starts[order], ends[order], ids[order], int((ends - starts).max())
+            )
+        starts, ends, ids, max_length = self._sorted[variant.chrom]
+
+        lo = np.searchsorted(starts, variant.start - max_length, side="left")
+        hi = np.searchsorted(starts, variant.end, side="right")
+        candidates = np.arange(lo, hi)[ends[lo:hi] >= variant.start]
+        candidates = candidates[np.argsort(np.abs(starts[candidates] - variant.start), kind="stable")]
+        return ids[candidates]
@@ -3,22 +3,34 @@
 负责管理本地向量数据库的连接和查询
 支持文件系统路径和HTTP API两种访问方式
 """
-from typing import List, Dict, Optional
+import asyncio
+import json
+from typing import List, Dict, Optional, Tuple, TYPE_CHECKING
 from pathlib import Path
-import chromadb
-from chromadb.config import Settings
-from sentence_transformers import SentenceTransformer
-from langchain_community.vectorstores import Chroma
-from langchain_community.embeddings import HuggingFaceEmbeddings
+import numpy as np
 
 from src.config.database_manager import LocalDatabase
 from src.rag.local_db_client import LocalDatabaseClient
+from src.rag.ann_index import FlatIndex, load_index
+from src.rag.lexical_index import BM25Index, reciprocal_rank_fusion, result_key
+from src.rag.variant_index import Variant, VariantIndex, parse_variants, record_variants
+from src.rag.query_filters import QueryFilters
+from src.rag.embedding_service import DEFAULT_EMBEDDING_MODEL, get_embedding_service
+from src.rag.executors import get_executors
+
+if TYPE_CHECKING:
+    from langchain_community.vectorstores import Chroma
+
+# 从Chroma导出向量（或文档）构建索引时每批读取的记录数
+CHROMA_EXPORT_BATCH_SIZE = 5000
+# 混合检索时向量检索和词法检索各取top k的倍数作为融合候选
+HYBRID_CANDIDATE_FACTOR = 3
 
 
 class VectorStoreManager:
     """向量存储管理器"""
     
-    def __init__(self, embedding_model: str = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"):
+    def __init__(self, embedding_model: str = DEFAULT_EMBEDDING_MODEL):
         """
         初始化向量存储管理器
         
@@ -26,13 +38,66 @@ class VectorStoreManager:
             embedding_model: 嵌入模型名称
         """
         self.embedding_model = embedding_model
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name=embedding_model,
-            model_kwargs={'device': 'cpu'}
-        )
-        self.vector_stores: Dict[str, Chroma] = {}  # 文件系统向量数据库
+        # 进程级共享嵌入服务，Chroma和HTTP API客户端复用同一份模型
+        self.embedding_service = get_embedding_service(embedding_model)
+        self.vector_stores: Dict[str, "Chroma"] = {}  # 文件系统向量数据库
         self.http_clients: Dict[str, LocalDatabaseClient] = {}  # HTTP API客户端
         self.http_databases: Dict[str, LocalDatabase] = {}  # HTTP数据库配置
+        # Chroma数据库的量化索引及索引下标对应的Chroma记录id
+        self.chroma_indexes: Dict[str, Tuple[FlatIndex, List[str]]] = {}
+        # Chroma数据库的BM25索引及索引下标对应的Chroma记录id
+        self.chroma_lexical_indexes: Dict[str, Tuple[BM25Index, List[str]]] = {}
+        # Chroma数据库的变异结构化索引及索引下标对应的Chroma记录id
+        self.chroma_variant_indexes: Dict[str, Tuple[VariantIndex, List[str]]] = {}
+        # 已加载数据库的配置
+        self.local_configs: Dict[str, LocalDatabase] = {}
+        # 已登记、首次使用时才加载的文件系统数据库配置
+        self.pending_databases: Dict[str, LocalDatabase] = {}
+        self._load_locks: Dict[str, asyncio.Lock] = {}
+    
+    def register_local_database(self, db_config: LocalDatabase) -> None:
+        """
+        登记本地数据库：HTTP API数据库直接可用，文件系统数据库推迟到首次使用（或预热）时加载
+        
+        Args:
+            db_config: 本地数据库配置
+        """
+        if db_config.type.lower() == "http_api":
+            self.load_local_database(db_config)
+        else:
+            self.pending_databases[db_config.name] = db_config
+    
+    async def ensure_loaded(self, db_name: str) -> None:
+        """
+        确保数据库已加载，未加载的文件系统数据库在线程池中加载（同一数据库只加载一次）
+        
+        加载失败的数据库会被移出登记列表，之后不再参与检索
+        
+        Args:
+            db_name: 数据库名称
+        """
+        if db_name in self.vector_stores or db_name in self.http_databases:
+            return
+        if db_name not in self.pending_databases:
+            raise ValueError(f"数据库未加载: {db_name}")
+        
+        lock = self._load_locks.setdefault(db_name, asyncio.Lock())
+        async with lock:
+            db_config = self.pending_databases.get(db_name)
+            if db_config is None:
+                # 等待期间已被其他请求加载（或加载失败）
+                if db_name not in self.vector_stores:
+                    raise ValueError(f"数据库未加载: {db_name}")
+                return
+            
+            try:
+                await get_executors().run_in_thread(self.load_local_database, db_config)
+                print(f"已加载本地数据库: {db_name}")
+            except Exception as e:
+                print(f"加载数据库 {db_name} 失败: {str(e)}")
+                raise
+            finally:
+                self.pending_databases.pop(db_name, None)
     
     def load_local_database(self, db_config: LocalDatabase):
         """
@@ -49,8 +114,9 @@ class VectorStoreManager:
         if db_type == "http_api":
             # HTTP API方式，不需要加载，只需要保存配置
             if db_config.name not in self.http_clients:
-                self.http_clients[db_config.name] = LocalDatabaseClient()
+                self.http_clients[db_config.name] = LocalDatabaseClient(self.embedding_service)
             self.http_databases[db_config.name] = db_config
+            self.local_configs[db_config.name] = db_config
             return None
         elif db_type in ["chroma", "faiss"]:
             # 文件系统方式
@@ -63,26 +129,413 @@ class VectorStoreManager:
                 raise FileNotFoundError(f"数据库路径不存在: {db_path}")
             
             if db_type == "chroma":
+                from langchain_community.vectorstores import Chroma
+                
                 vector_store = Chroma(
                     persist_directory=str(db_path),
-                    embedding_function=self.embeddings
+                    embedding_function=self.embedding_service.langchain_embeddings
                 )
                 self.vector_stores[db_config.name] = vector_store
+                if db_config.index_type.lower() == "quantized":
+                    self.chroma_indexes[db_config.name] = self._load_chroma_index(
+                        db_config, vector_store
+                    )
+                if db_config.hybrid_search or db_config.variant_index:
+                    self._build_chroma_text_indexes(db_config, vector_store)
+                self.local_configs[db_config.name] = db_config
                 return vector_store
             else:
                 raise ValueError(f"暂不支持的文件系统数据库类型: {db_config.type}")
         else:
             raise ValueError(f"不支持的数据库类型: {db_config.type}")
     
+    def _load_chroma_index(
+        self,
+        db_config: LocalDatabase,
+        vector_store: "Chroma"
+    ) -> Tuple[FlatIndex, List[str]]:
+        """
+        加载Chroma数据库的量化索引，记录数与集合不一致时从集合中重新导出向量
+        
+        Args:
+            db_config: 本地数据库配置
+            vector_store: Chroma向量存储对象
+            
+        Returns:
+            (量化索引, 索引下标对应的Chroma记录id列表)
+        """
+        directory = Path(db_config.mirror_dir) / db_config.name / "index"
+        index = load_index(db_config, directory, self.embedding_model)
+        ids_path = directory / "ids.json"
+        collection = vector_store._collection
+        
+        ids: List[str] = []
+        if index.size and ids_path.exists():
+            with open(ids_path, 'r', encoding='utf-8') as f:
+                ids = json.load(f)
+        
+        if index.size == len(ids) == collection.count():
+            return index, ids
+        
+        print(f"正在为数据库 {db_config.name} 构建量化索引...")
+        index.clear()
+        ids = []
+        while True:
+            batch = collection.get(
+                include=["embeddings"],
+                limit=CHROMA_EXPORT_BATCH_SIZE,
+                offset=len(ids)
+            )
+            if not batch["ids"]:
+                break
+            index.add(np.asarray(batch["embeddings"], dtype=np.float32))
+            ids.extend(batch["ids"])
+        
+        directory.mkdir(parents=True, exist_ok=True)
+        with open(ids_path, 'w', encoding='utf-8') as f:
+            json.dump(ids, f)
+        
+        return index, ids
+    
+    def _build_chroma_text_indexes(self, db_config: LocalDatabase, vector_store: "Chroma") -> None:
+        """
+        从Chroma集合的文档和元数据构建BM25索引（hybrid_search）和变异结构化索引（variant_index）
+        
+        Args:
+            db_config: 本地数据库配置
+            vector_store: Chroma向量存储对象
+        """
+        collection = vector_store._collection
+        lexical_index = BM25Index() if db_config.hybrid_search else None
+        variant_index = VariantIndex() if db_config.variant_index else None
+        ids: List[str] = []
+        while True:
+            batch = collection.get(
+                include=["documents", "metadatas"],
+                limit=CHROMA_EXPORT_BATCH_SIZE,
+                offset=len(ids)
+            )
+            if not batch["ids"]:
+                break
+            documents = [document or "" for document in batch["documents"]]
+            if lexical_index is not None:
+                lexical_index.add(documents)
+            if variant_index is not None:
+                variant_index.add([
+                    record_variants(document, metadata or {})
+                    for document, metadata in zip(documents, batch["metadatas"])
+                ])
+            ids.extend(batch["ids"])
+        
+        if lexical_index is not None:
+            self.chroma_lexical_indexes[db_config.name] = (lexical_index, ids)
+        if variant_index is not None:
+            self.chroma_variant_indexes[db_config.name] = (variant_index, ids)
+    
+    async def _get_chroma_records(
+        self,
+        db_name: str,
+        record_ids: List[str]
+    ) -> Dict[str, Tuple[str, Dict]]:
+        """按id从Chroma读取文档和元数据"""
+        response = await get_executors().run_in_thread(
+            self.vector_stores[db_name]._collection.get,
+            ids=record_ids,
+            include=["documents", "metadatas"]
+        )
+        return {
+            record_id: (document, metadata or {})
+            for record_id, document, metadata in zip(
+                response["ids"], response["documents"], response["metadatas"]
+            )
+        }
+    
+    async def _search_chroma_index(
+        self,
+        db_name: str,
+        query_embeddings: np.ndarray,
+        k: int
+    ) -> List[List[Dict]]:
+        """
+        在Chroma数据库的量化索引上检索，只从Chroma读取最终命中记录的文档和元数据
+        
+        Args:
+            db_name: 数据库名称
+            query_embeddings: 查询向量矩阵（每行一个查询）
+            k: 每个查询返回结果数量
+            
+        Returns:
+            与查询一一对应的搜索结果列表
+        """
+        index, ids = self.chroma_indexes[db_name]
+        top_k = await get_executors().run_in_thread(index.search, query_embeddings, k)
+        
+        hit_ids = list(dict.fromkeys(ids[i] for top_indices, _ in top_k for i in top_indices))
+        records = await self._get_chroma_records(db_name, hit_ids)
+        
+        return [
+            [
+                {
+                    "content": records[ids[i]][0],
+                    "metadata": records[ids[i]][1],
+                    "score": float(score)
+                }
+                for i, score in zip(top_indices, scores)
+                if ids[i] in records
+            ]
+            for top_indices, scores in top_k
+        ]
+    
+    def list_local_databases(self) -> List[str]:
+        """列出所有可用的本地数据库名称（包括尚未加载的，文件系统数据库在前）"""
+        return list(self.vector_stores) + list(self.pending_databases) + list(self.http_databases)
+    
+    def _get_config(self, db_name: str) -> Optional[LocalDatabase]:
+        """获取已加载或已登记的数据库配置"""
+        return self.local_configs.get(db_name) or self.pending_databases.get(db_name)
+    
+    def _hybrid_enabled(self, db_name: str) -> bool:
+        """数据库是否启用混合检索"""
+        db_config = self._get_config(db_name)
+        return db_config is not None and db_config.hybrid_search
+    
+    def _query_variants(self, db_name: str, query: str) -> List[Variant]:
+        """解析查询中的变异记号（数据库未启用变异索引时返回空列表）"""
+        db_config = self._get_config(db_name)
+        if db_config is None or not db_config.variant_index:
+            return []
+        return parse_variants(query)
+    
+    def _applies_filters(self, db_name: str, filters: Optional[QueryFilters]) -> bool:
+        """
+        过滤条件是否对数据库生效（HTTP API数据库且配置了对应维度的字段映射）：
+        启用镜像时在镜像记录上过滤，否则下推到API
+        """
+        return (
+            filters is not None
+            and db_name in self.http_databases
+            and bool(filters.to_filters_in(self.http_databases[db_name].filter_fields))
+        )
+    
     async def search_local_database(
         self, 
         db_name: str, 
         query: str, 
-        k: int = 5
+        k: int = 5,
+        filters: Optional[QueryFilters] = None
     ) -> List[Dict]:
         """
         在本地数据库中搜索（支持文件系统和HTTP API两种方式）
         
+        过滤条件对HTTP API数据库生效时，只在匹配的子集（镜像中筛出的记录或API返回的记录）上检索；
+        否则查询包含变异记号（rsID、基因 + 蛋白改变、HGVS、染色体坐标）时先在变异结构化索引中查找，
+        命中的记录排在最前，不足k条时由向量/混合检索结果补足
+        
+        Args:
+            db_name: 数据库名称
+            query: 查询问题
+            k: 返回结果数量
+            filters: 查询过滤条件（只对配置了filter_fields的HTTP API数据库生效）
+            
+        Returns:
+            搜索结果列表
+        """
+        if self._applies_filters(db_name, filters):
+            return await self.http_clients[db_name].search_database(
+                self.http_databases[db_name], query, k, filters
+            )
+        
+        variants = self._query_variants(db_name, query)
+        if variants:
+            hits = await self.variant_search(db_name, variants, k)
+            if len(hits) >= k:
+                return hits
+            return await self._ranked_search(db_name, query, k, hits)
+        
+        return await self._ranked_search(db_name, query, k)
+    
+    async def variant_search(
+        self,
+        db_name: str,
+        variants: List[Variant],
+        k: int = 5
+    ) -> List[Dict]:
+        """
+        按变异标识符（哈希查找）和基因组坐标（区间查找）检索本地数据库
+        
+        Args:
+            db_name: 数据库名称
+            variants: 查询中解析出的变异
+            k: 返回结果数量
+            
+        Returns:
+            匹配的记录列表（score为向量检索所用尺度上的最优值：Chroma原生检索的距离为0.0，
+            其余为相似度1.0；没有命中或数据库未建立变异索引时为空）
+        """
+        if db_name in self.http_databases:
+            return await self.http_clients[db_name].variant_search(
+                self.http_databases[db_name], variants, k
+            )
+        
+        await self.ensure_loaded(db_name)
+        if db_name not in self.chroma_variant_indexes:
+            return []
+        
+        index, ids = self.chroma_variant_indexes[db_name]
+        record_ids = await get_executors().run_in_thread(index.lookup, variants, k)
+        if not record_ids:
+            return []
+        
+        records = await self._get_chroma_records(db_name, [ids[i] for i in record_ids])
+        return [
+            {
+                "content": records[ids[i]][0],
+                "metadata": records[ids[i]][1],
+                "score": self._exact_hit_score(db_name, fused=False)
+            }
+            for i in record_ids
+            if ids[i] in records
+        ]
+    
+    def _exact_hit_score(self, db_name: str, fused: bool) -> float:
+        """
+        变异精确命中的score：取检索结果所用尺度上的最优值。Chroma原生检索（未使用量化索引）
+        返回的是距离（越小越相关），为0.0；索引相似度和融合得分越大越相关，为1.0
+        """
+        distance = db_name not in self.http_databases and db_name not in self.chroma_indexes
+        return 0.0 if distance and not fused else 1.0
+    
+    async def _ranked_search(
+        self, 
+        db_name: str, 
+        query: str, 
+        k: int = 5,
+        exact_hits: Optional[List[Dict]] = None
+    ) -> List[Dict]:
+        """
+        向量检索；启用混合检索时，向量检索和BM25词法检索各取候选，按倒数排名融合后返回top k
+        （有词法命中时score为融合得分）
+        
+        Args:
+            db_name: 数据库名称
+            query: 查询问题
+            k: 返回结果数量
+            exact_hits: 变异精确命中的记录（排在最前，其余名额由检索结果补足，
+                score按检索结果的尺度取最优值）
+            
+        Returns:
+            搜索结果列表
+        """
+        exact_hits = exact_hits or []
+        # 多取与精确命中数相同的结果，去掉重复记录后仍能补足k条
+        n = k + len(exact_hits)
+        if not self._hybrid_enabled(db_name) or not query.strip():
+            results = await self._vector_search(db_name, query, n)
+            fused = False
+        else:
+            candidates = n * HYBRID_CANDIDATE_FACTOR
+            vector_results, lexical_results = await asyncio.gather(
+                self._vector_search(db_name, query, candidates),
+                self.lexical_search(db_name, query, candidates)
+            )
+            results = self._fuse(db_name, vector_results, lexical_results, n)
+            fused = self._fused(vector_results, lexical_results)
+        
+        if not exact_hits:
+            return results[:k]
+        return self._merge_exact_hits(
+            exact_hits, results, k, self._exact_hit_score(db_name, fused)
+        )
+    
+    @staticmethod
+    def _merge_exact_hits(
+        exact_hits: List[Dict],
+        results: List[Dict],
+        k: int,
+        score: float
+    ) -> List[Dict]:
+        """精确命中在前（score替换为score），检索结果中不重复且没有出错的记录补足k条"""
+        merged = [dict(hit, score=score) for hit in exact_hits[:k]]
+        seen = {result_key(hit) for hit in merged}
+        for result in results:
+            if len(merged) >= k:
+                break
+            if "error" in result or result_key(result) in seen:
+                continue
+            seen.add(result_key(result))
+            merged.append(result)
+        return merged
+    
+    @staticmethod
+    def _fused(vector_results: List[Dict], lexical_results: List[Dict]) -> bool:
+        """是否融合词法检索结果（向量检索出错或没有词法命中时直接使用向量检索结果）"""
+        return bool(lexical_results) and not any("error" in result for result in vector_results)
+    
+    def _fuse(
+        self,
+        db_name: str,
+        vector_results: List[Dict],
+        lexical_results: List[Dict],
+        k: int
+    ) -> List[Dict]:
+        """融合向量检索和词法检索结果（向量检索出错或没有词法命中时直接返回向量检索结果）"""
+        if not self._fused(vector_results, lexical_results):
+            return vector_results[:k]
+        return reciprocal_rank_fusion(
+            [vector_results, lexical_results], k, self.local_configs[db_name].rrf_k
+        )
+    
+    async def lexical_search(
+        self,
+        db_name: str,
+        query: str,
+        k: int = 5
+    ) -> List[Dict]:
+        """
+        在本地数据库中进行BM25词法检索
+        
+        Args:
+            db_name: 数据库名称
+            query: 查询问题
+            k: 返回结果数量
+            
+        Returns:
+            按BM25得分降序的结果列表（数据库未启用混合检索时为空）
+        """
+        if db_name in self.http_databases:
+            return await self.http_clients[db_name].lexical_search(
+                self.http_databases[db_name], query, k
+            )
+        
+        await self.ensure_loaded(db_name)
+        if db_name not in self.chroma_lexical_indexes:
+            return []
+        
+        index, ids = self.chroma_lexical_indexes[db_name]
+        top_ids, scores = await get_executors().run_in_thread(index.search, query, k)
+        if not len(top_ids):
+            return []
+        
+        records = await self._get_chroma_records(db_name, [ids[i] for i in top_ids])
+        return [
+            {
+                "content": records[ids[i]][0],
+                "metadata": records[ids[i]][1],
+                "score": float(score)
+            }
+            for i, score in zip(top_ids, scores)
+            if ids[i] in records
+        ]
+    
+    async def _vector_search(
+        self, 
+        db_name: str, 
+        query: str, 
+        k: int = 5
+    ) -> List[Dict]:
+        """
+        在本地数据库中进行向量检索
+        
         Args:
             db_name: 数据库名称
             query: 查询问题
@@ -97,12 +550,19 @@ class VectorStoreManager:
             client = self.http_clients[db_name]
             return await client.search_database(db_config, query, k)
         
-        # 文件系统数据库
-        if db_name not in self.vector_stores:
-            raise ValueError(f"数据库未加载: {db_name}")
+        # 文件系统数据库（首次使用时加载）
+        await self.ensure_loaded(db_name)
         
+        if db_name in self.chroma_indexes:
+            query_embedding = await self.embedding_service.encode(query)
+            results = await self._search_chroma_index(db_name, query_embedding[np.newaxis, :], k)
+            return results[0]
+        
+        # Chroma检索是同步阻塞调用，放到线程池中执行
         vector_store = self.vector_stores[db_name]
-        results = vector_store.similarity_search_with_score(query, k=k)
+        results = await get_executors().run_in_thread(
+            vector_store.similarity_search_with_score, query, k=k
+        )
         
         return [
             {
@@ -113,6 +573,161 @@ class VectorStoreManager:
             for doc, score in results
         ]
     
+    async def search_local_database_many(
+        self,
+        db_name: str,
+        queries: List[str],
+        query_embeddings: np.ndarray,
+        k: int = 5,
+        filters: Optional[List[QueryFilters]] = None
+    ) -> List[List[Dict]]:
+        """
+        批量搜索本地数据库：过滤条件生效的查询逐个在匹配的子集上检索，
+        包含变异记号的查询先走变异结构化索引（命中不足k条时逐个补足），其余查询批量进行向量/混合检索
+        
+        Args:
+            db_name: 数据库名称
+            queries: 查询问题列表
+            query_embeddings: 与queries一一对应的查询向量矩阵
+            k: 每个查询返回结果数量
+            filters: 与queries一一对应的查询过滤条件
+            
+        Returns:
+            与queries一一对应的搜索结果列表
+        """
+        all_results: List[Optional[List[Dict]]] = [None] * len(queries)
+        filtered = [
+            i for i, query_filters in enumerate(filters or [])
+            if self._applies_filters(db_name, query_filters)
+        ]
+        if filtered:
+            filtered_results = await asyncio.gather(
+                *(self.search_local_database(db_name, queries[i], k, filters[i]) for i in filtered)
+            )
+            for i, results in zip(filtered, filtered_results):
+                all_results[i] = results
+        
+        variant_queries = [
+            (i, variants) for i, variants in
+            enumerate(self._query_variants(db_name, query) for query in queries)
+            if variants and all_results[i] is None
+        ]
+        if variant_queries:
+            variant_results = await asyncio.gather(
+                *(self.variant_search(db_name, variants, k) for _, variants in variant_queries)
+            )
+            # 命中不足k条的查询逐个用检索结果补足
+            partial = [
+                (i, hits) for (i, _), hits in zip(variant_queries, variant_results)
+                if 0 < len(hits) < k
+            ]
+            filled = await asyncio.gather(
+                *(self._ranked_search(db_name, queries[i], k, hits) for i, hits in partial)
+            )
+            for (i, _), results in zip(variant_queries, variant_results):
+                all_results[i] = results or None
+            for (i, _), results in zip(partial, filled):
+                all_results[i] = results
+        
+        remaining = [i for i, results in enumerate(all_results) if results is None]
+        if remaining:
+            ranked_results = await self._ranked_search_many(
+                db_name,
+                [queries[i] for i in remaining],
+                query_embeddings[remaining],
+                k
+            )
+            for i, results in zip(remaining, ranked_results):
+                all_results[i] = results
+        
+        return all_results
+    
+    async def _ranked_search_many(
+        self,
+        db_name: str,
+        queries: List[str],
+        query_embeddings: np.ndarray,
+        k: int = 5
+    ) -> List[List[Dict]]:
+        """
+        批量向量检索（启用混合检索时逐个查询融合词法检索结果）
+        
+        Args:
+            db_name: 数据库名称
+            queries: 查询问题列表
+            query_embeddings: 与queries一一对应的查询向量矩阵
+            k: 每个查询返回结果数量
+            
+        Returns:
+            与queries一一对应的搜索结果列表
+        """
+        if not self._hybrid_enabled(db_name):
+            return await self._vector_search_many(db_name, queries, query_embeddings, k)
+        
+        candidates = k * HYBRID_CANDIDATE_FACTOR
+        vector_results, *lexical_results = await asyncio.gather(
+            self._vector_search_many(db_name, queries, query_embeddings, candidates),
+            *(self.lexical_search(db_name, query, candidates) for query in queries)
+        )
+        return [
+            self._fuse(db_name, vector, lexical, k)
+            for vector, lexical in zip(vector_results, lexical_results)
+        ]
+    
+    async def _vector_search_many(
+        self,
+        db_name: str,
+        queries: List[str],
+        query_embeddings: np.ndarray,
+        k: int = 5
+    ) -> List[List[Dict]]:
+        """
+        批量向量检索：数据只获取一次，查询向量由调用方批量计算
+        
+        Args:
+            db_name: 数据库名称
+            queries: 查询问题列表
+            query_embeddings: 与queries一一对应的查询向量矩阵
+            k: 每个查询返回结果数量
+            
+        Returns:
+            与queries一一对应的搜索结果列表
+        """
+        # 检查是否是HTTP API数据库
+        if db_name in self.http_databases:
+            db_config = self.http_databases[db_name]
+            client = self.http_clients[db_name]
+            return await client.search_database_many(db_config, queries, query_embeddings, k)
+        
+        # 文件系统数据库（首次使用时加载）
+        await self.ensure_loaded(db_name)
+        
+        if db_name in self.chroma_indexes:
+            return await self._search_chroma_index(db_name, query_embeddings, k)
+        
+        # 所有查询向量一次性提交给Chroma集合
+        vector_store = self.vector_stores[db_name]
+        response = await get_executors().run_in_thread(
+            vector_store._collection.query,
+            query_embeddings=np.asarray(query_embeddings).tolist(),
+            n_results=k,
+            include=["documents", "metadatas", "distances"]
+        )
+        
+        return [
+            [
+                {
+                    "content": document,
+                    "metadata": metadata or {},
+                    "score": distance
+                }
+                for document, metadata, distance in zip(documents, metadatas, distances)
+            ]
+            for documents, metadatas, distances in zip(
+                response["documents"], response["metadatas"], response["distances"]
+            )
+        ]
+    
     async def search_all_local_databases(
         self, 
         query: str, 
@@ -128,27 +743,25 @@ class VectorStoreManager:
         Returns:
             按数据库名称组织的搜索结果
         """
-        all_results = {}
+        db_names = self.list_local_databases()
         
-        # 搜索文件系统数据库
-        for db_name in self.vector_stores:
-            try:
-                results = await self.search_local_database(db_name, query, k)
-                all_results[db_name] = results
-            except Exception as e:
-                all_results[db_name] = [{"error": str(e)}]
+        # 并发搜索文件系统数据库和HTTP API数据库
+        results = await asyncio.gather(
+            *(self.search_local_database(db_name, query, k) for db_name in db_names),
+            return_exceptions=True
+        )
         
-        # 搜索HTTP API数据库
-        for db_name in self.http_databases:
-            try:
-                results = await self.search_local_database(db_name, query, k)
-                all_results[db_name] = results
-            except Exception as e:
-                all_results[db_name] = [{"error": str(e)}]
+        all_results = {}
+        for db_name, result in zip(db_names, results):
+            if isinstance(result, Exception):
+                all_results[db_name] = [{"error": str(result)}]
+            else:
+                all_results[db_name] = result
         
         return all_results
     
     async def close(self):
-        """关闭所有HTTP客户端"""
+        """关闭所有HTTP客户端和嵌入服务"""
         for client in self.http_clients.values():
             await client.close()
+        await self.embedding_service.close()
@@ -0,0 +1,133 @@
+"""
+向量索引测试脚本（不启动服务，不访问网络）
+验证IVF-Flat索引的召回率、增量插入和重新训练，索引持久化后重新加载的结果一致，以及量化索引的top k与精确检索一致
+"""
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+from src.config.database_manager import LocalDatabase
+from src.rag.ann_index import IVFFlatIndex, QuantizedIndex, load_index
+
+
+def _clustered_vectors(n: int, dim: int = 32, clusters: int = 24, seed: int = 0) -> np.ndarray:
+    """围绕若干中心分布的向量（模拟嵌入向量按主题聚集）"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    labels = rng.integers(0, clusters, n)
+    return (centers[labels] + 0.35 * rng.normal(size=(n, dim))).astype(np.float32)
+
+
+def _recall(index, queries: np.ndarray, k: int) -> float:
+    """近似检索相对精确检索的recall@k"""
+    approximate = index.search(queries, k)
+    exact = index.search(queries, k, exact=True)
+    hits = sum(len(np.intersect1d(a, e)) for (a, _), (e, _) in zip(approximate, exact))
+    return hits / (k * len(queries))
+
+
+def test_ivf_recall():
+    """IVF检索的recall@10不低于0.9"""
+    vectors = _clustered_vectors(4050)
+    index = IVFFlatIndex(Path(tempfile.mkdtemp()), "test-model", nlist=16, nprobe=4)
+    index.add(vectors[:4000])
+    assert index.centroids is not None
+    # 查询取自同一分布、但不在索引中的向量
+    assert _recall(index, vectors[4000:], 10) >= 0.9
+
+
+def test_ivf_incremental_append_and_retrain():
+    """新向量追加到所属列表；向量数增长到上次训练的retrain_factor倍时重新训练"""
+    vectors = _clustered_vectors(1200)
+    index = IVFFlatIndex(Path(tempfile.mkdtemp()), "test-model", nlist=16, nprobe=4, retrain_factor=2.0)
+    index.add(vectors[:300])
+    assert index.trained_size == 300
+
+    index.add(vectors[300:500])
+    assert index.trained_size == 300
+    listed = np.sort(np.concatenate(index.lists))
+    assert np.array_equal(listed, np.arange(500))
+    for i, ids in enumerate(index.lists):
+        assert np.all(index.assignments[ids] == i)
+
+    index.add(vectors[500:700])
+    assert index.trained_size == 700
+    assert np.array_equal(np.sort(np.concatenate(index.lists)), np.arange(700))
+
+
+def test_ivf_reload_round_trip():
+    """IVF索引重新加载后聚类和检索结果不变"""
+    directory = Path(tempfile.mkdtemp())
+    db_config = LocalDatabase(name="db", type="http_api", index_type="ivf", ivf_nlist=16, ivf_nprobe=4)
+    vectors = _clustered_vectors(1020)
+    vectors, queries = vectors[:1000], vectors[1000:]
+
+    index = load_index(db_config, directory, "test-model")
+    index.add(vectors[:600])
+    index.add(vectors[600:])
+    reloaded = load_index(db_config, directory, "test-model")
+
+    assert reloaded.size == 1000 and reloaded.trained_size == index.trained_size
+    assert np.array_equal(reloaded.centroids, index.centroids)
+    for (ids, scores), (reloaded_ids, reloaded_scores) in zip(
+        index.search(queries, 10), reloaded.search(queries, 10)
+    ):
+        assert np.array_equal(ids, reloaded_ids)
+        assert np.allclose(scores, reloaded_scores)
+
+
+def test_quantized_top_k_matches_exact():
+    """量化索引粗排后精确重排，top k与精确检索一致（启用PCA时recall@10不低于0.95）"""
+    vectors = _clustered_vectors(3050)
+    vectors, queries = vectors[:3000], vectors[3000:]
+    for quantization, pca_dims in (("int8", 0), ("float16", 0), ("int8", 16)):
+        index = QuantizedIndex(
+            Path(tempfile.mkdtemp()), "test-model", quantization=quantization, pca_dims=pca_dims
+        )
+        index.add(vectors)
+        assert index.codes is not None
+        if pca_dims:
+            assert _recall(index, queries, 10) >= 0.95
+            continue
+        for (ids, scores), (exact_ids, exact_scores) in zip(
+            index.search(queries, 10), index.search(queries, 10, exact=True)
+        ):
+            assert np.array_equal(ids, exact_ids)
+            assert np.allclose(scores, exact_scores, atol=1e-5)
+
+
+def test_quantized_pca_dims_validated():
+    """PCA目标维度大于向量维度时拒绝写入"""
+    index = QuantizedIndex(Path(tempfile.mkdtemp()), "test-model", pca_dims=64)
+    try:
+        index.add(_clustered_vectors(10, dim=32))
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("pca_dims大于向量维度时应抛出ValueError")
+    assert index.size == 0
+
+
+if __name__ == "__main__":
+    tests = [
+        test_ivf_recall,
+        test_ivf_incremental_append_and_retrain,
+        test_ivf_reload_round_trip,
+        test_quantized_top_k_matches_exact,
+        test_quantized_pca_dims_validated,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__doc__}")
+        except AssertionError:
+            failed += 1
+            print(f"✗ {test.__doc__}")
+    print(f"\n总计: {len(tests) - failed}/{len(tests)} 测试通过")
+    sys.exit(1 if failed else 0)
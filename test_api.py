@@ -206,6 +206,97 @@ async def test_specific_database():
             return False
 
 
+async def test_query_stream():
+    """测试流式查询接口"""
+    print("\n" + "="*50)
+    print("测试6: 流式查询（Server-Sent Events）")
+    print("="*50)
+    
+    query_data = {
+        "question": "SNV突变",
+        "use_local_db": True,
+        "use_public_db": True,
+        "top_k": 2
+    }
+    
+    async with httpx.AsyncClient(timeout=60.0) as client:
+        try:
+            print(f"发送查询: {query_data['question']}")
+            loop = asyncio.get_running_loop()
+            start = loop.time()
+            events = []
+            
+            async with client.stream("POST", f"{BASE_URL}/query/stream", json=query_data) as response:
+                print(f"状态码: {response.status_code}")
+                if response.status_code != 200:
+                    print(f"错误响应: {await response.aread()}")
+                    return False
+                
+                async for line in response.aiter_lines():
+                    if not line.startswith("data: "):
+                        continue
+                    event = json.loads(line[len("data: "):])
+                    events.append(event)
+                    if event["event"] == "source":
+                        print(f"  [{loop.time() - start:.2f}s] 数据库完成: {event['database']}"
+                              f"{'（超时）' if event['timed_out'] else ''}")
+            
+            token_count = sum(1 for event in events if event["event"] == "token")
+            print(f"\n答案片段数量: {token_count}")
+            
+            if events and events[-1]["event"] == "done":
+                answer = events[-1].get("answer", "")
+                print(f"生成的答案 (前200字符):")
+                print(f"  {answer[:200]}")
+                return True
+            return False
+        except Exception as e:
+            print(f"错误: {str(e)}")
+            import traceback
+            traceback.print_exc()
+            return False
+
+
+async def test_query_batch():
+    """测试批量查询接口"""
+    print("\n" + "="*50)
+    print("测试7: 批量查询")
+    print("="*50)
+    
+    query_data = {
+        "questions": ["什么是SNV？", "SNV突变", "基因突变"],
+        "use_local_db": True,
+        "use_public_db": False,
+        "top_k": 2
+    }
+    
+    async with httpx.AsyncClient(timeout=120.0) as client:
+        try:
+            print(f"发送 {len(query_data['questions'])} 个问题")
+            response = await client.post(
+                f"{BASE_URL}/query/batch",
+                json=query_data
+            )
+            print(f"状态码: {response.status_code}")
+            
+            if response.status_code == 200:
+                results = response.json().get("results", [])
+                for result in results:
+                    print(f"  问题: {result.get('question')}，"
+                          f"本地数据库结果数量: {len(result.get('local_db_results', {}))}")
+                
+                # 结果应与问题一一对应且顺序一致
+                return [r.get("question") for r in results] == query_data["questions"]
+            else:
+                print(f"错误响应: {response.text}")
+                return False
+        except Exception as e:
+            print(f"错误: {str(e)}")
+            import traceback
+            traceback.print_exc()
+            return False
+
+
 async def run_all_tests():
     """运行所有测试"""
     print("\n" + "="*60)
@@ -234,6 +325,14 @@ async def run_all_tests():
     
     # 测试5: 指定数据库查询
     results["指定数据库查询"] = await test_specific_database()
+    await asyncio.sleep(1)
+    
+    # 测试6: 流式查询
+    results["流式查询"] = await test_query_stream()
+    await asyncio.sleep(1)
+    
+    # 测试7: 批量查询
+    results["批量查询"] = await test_query_batch()
     
     # 打印测试总结
     print("\n" + "="*60)
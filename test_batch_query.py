@@ -0,0 +1,118 @@
+"""
+批量查询超时测试脚本（不启动服务，不访问网络）
+验证批量查询中慢数据源按单源超时和全局截止时间标记为超时，不阻塞其他数据源和答案生成
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+# 缓存文件写入临时目录，避免污染 ./data
+_tmp_dir = tempfile.mkdtemp()
+os.environ["HTTP_CACHE_PATH"] = os.path.join(_tmp_dir, "http_cache.sqlite3")
+os.environ["LLM_CACHE_PATH"] = os.path.join(_tmp_dir, "llm_cache.sqlite3")
+os.environ["EMBEDDING_CACHE_DIR"] = os.path.join(_tmp_dir, "embedding_cache")
+
+from src.config.database_manager import DatabaseManager, PublicDatabase
+from src.rag.rag_engine import RAGEngine
+
+QUESTIONS = ["BRAF V600E 的临床意义", "KRAS G12D 的功能影响"]
+SLOW_SECONDS = 5.0
+
+
+def _make_engine() -> RAGEngine:
+    """构建检索被替换为快/慢数据源的RAG引擎（slow数据源在SLOW_SECONDS秒后才返回）"""
+    engine = RAGEngine(DatabaseManager("config/database_config.yaml"))
+    public_dbs = [
+        PublicDatabase(name=name, type="api", official_url="https://example.org")
+        for name in ("FastPub", "SlowPub")
+    ]
+
+    async def encode(texts):
+        return np.ones((len(texts), 8), dtype=np.float32)
+
+    async def search_local_many(db_name, queries, query_embeddings, k=5, filters=None):
+        if db_name == "slow":
+            await asyncio.sleep(SLOW_SECONDS)
+        return [[{"content": f"{db_name}: {query}"}] for query in queries]
+
+    async def search_public(db_config, question, top_k=5):
+        if db_config.name == "SlowPub":
+            await asyncio.sleep(SLOW_SECONDS)
+        return {"results": [question]}
+
+    async def generate_answer(question, results, priority=0):
+        return f"答案: {question}"
+
+    engine.vector_store_manager.embedding_service.encode = encode
+    engine.vector_store_manager.search_local_database_many = search_local_many
+    engine.public_db_client.search_public_database = search_public
+    engine.database_manager.get_public_databases = lambda: public_dbs
+    engine._generate_answer = generate_answer
+    return engine
+
+
+def _run_batch(engine: RAGEngine, deadline=None):
+    """执行批量查询，返回(结果列表, 耗时)"""
+    async def run():
+        start = time.perf_counter()
+        results = await engine.query_many(
+            QUESTIONS, local_db_names=["fast", "slow"], deadline=deadline
+        )
+        return results, time.perf_counter() - start
+
+    return asyncio.run(run())
+
+
+def _check_results(results, message):
+    """快数据源的结果保留，慢数据源标记为超时，答案照常生成"""
+    for question, result in zip(QUESTIONS, results):
+        assert result["local_db_results"]["fast"] == [{"content": f"fast: {question}"}]
+        assert result["public_db_results"]["FastPub"] == {"results": [question]}
+        assert result["local_db_results"]["slow"][0]["timed_out"]
+        assert result["public_db_results"]["SlowPub"]["timed_out"]
+        assert message in result["public_db_results"]["SlowPub"]["error"]
+        assert sorted(result["timed_out_sources"]) == ["SlowPub", "slow"]
+        assert result["answer"] == f"答案: {question}"
+
+
+def test_slow_source_hits_source_timeout():
+    """慢数据源超过单源超时后被标记为超时，不阻塞批量查询"""
+    engine = _make_engine()
+    engine.source_timeout = 0.2
+    results, elapsed = _run_batch(engine)
+    assert elapsed < 1.0
+    _check_results(results, "超过0.2秒")
+
+
+def test_slow_source_hits_batch_deadline():
+    """整个检索阶段超过全局截止时间时，未完成的数据源被标记为超时"""
+    engine = _make_engine()
+    engine.source_timeout = 30.0
+    results, elapsed = _run_batch(engine, deadline=0.3)
+    assert elapsed < 1.0
+    _check_results(results, "全局截止时间0.3秒")
+
+
+if __name__ == "__main__":
+    tests = [
+        test_slow_source_hits_source_timeout,
+        test_slow_source_hits_batch_deadline,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__doc__}")
+        except AssertionError:
+            failed += 1
+            print(f"✗ {test.__doc__}")
+    print(f"\n总计: {len(tests) - failed}/{len(tests)} 测试通过")
+    sys.exit(1 if failed else 0)
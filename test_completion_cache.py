@@ -0,0 +1,102 @@
+"""
+LLM补全缓存测试脚本（不启动服务，不访问网络）
+验证条目过期、按总大小淘汰最久未使用的条目，以及缓存键区分模型和温度
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+from src.rag.completion_cache import CompletionCache
+
+PROMPT = "根据检索结果回答：BRAF V600E 的临床意义？"
+
+
+def _cache(**kwargs) -> CompletionCache:
+    return CompletionCache(os.path.join(tempfile.mkdtemp(), "llm_cache.sqlite3"), **kwargs)
+
+
+def test_entry_expires_after_ttl():
+    """超过TTL的条目不再命中"""
+    cache = _cache(ttl=0.2)
+    key = CompletionCache.make_key("model-a", 0.7, PROMPT)
+
+    async def run():
+        await cache.put(key, "model-a", 0.7, "答案")
+        fresh = await cache.get(key)
+        await asyncio.sleep(0.3)
+        return fresh, await cache.get(key)
+
+    fresh, expired = asyncio.run(run())
+    assert fresh == "答案"
+    assert expired is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_size_bounded_lru_eviction():
+    """总大小超过上限时淘汰最久未使用的条目，最近读取过的条目保留"""
+    cache = _cache(max_bytes=30)
+    keys = {name: CompletionCache.make_key("model-a", 0.7, name) for name in "abc"}
+
+    async def run():
+        await cache.put(keys["a"], "model-a", 0.7, "a" * 10)
+        time.sleep(0.01)
+        await cache.put(keys["b"], "model-a", 0.7, "b" * 10)
+        time.sleep(0.01)
+        # 读取a使其成为最近使用的条目
+        assert await cache.get(keys["a"]) == "a" * 10
+        time.sleep(0.01)
+        await cache.put(keys["c"], "model-a", 0.7, "c" * 15)
+        return {name: await cache.get(key) for name, key in keys.items()}
+
+    entries = asyncio.run(run())
+    assert entries == {"a": "a" * 10, "b": None, "c": "c" * 15}
+    assert cache.evictions == 1
+
+
+def test_keys_separate_model_and_temperature():
+    """缓存键区分模型名称、温度和提示词；同一模型和温度的相同提示词命中同一条目"""
+    key = CompletionCache.make_key("model-a", 0.7, PROMPT)
+    assert key == CompletionCache.make_key("model-a", 0.7, PROMPT)
+    assert key == CompletionCache.make_key("model-a", 0.70000001, PROMPT)
+    assert len({
+        key,
+        CompletionCache.make_key("model-b", 0.7, PROMPT),
+        CompletionCache.make_key("model-a", 0.0, PROMPT),
+        CompletionCache.make_key("model-a", 0.7, PROMPT + " "),
+    }) == 4
+
+    cache = _cache()
+
+    async def run():
+        await cache.put(key, "model-a", 0.7, "答案")
+        return (
+            await cache.get(CompletionCache.make_key("model-b", 0.7, PROMPT)),
+            await cache.get(CompletionCache.make_key("model-a", 0.0, PROMPT)),
+            await cache.get(key),
+        )
+
+    assert asyncio.run(run()) == (None, None, "答案")
+
+
+if __name__ == "__main__":
+    tests = [
+        test_entry_expires_after_ttl,
+        test_size_bounded_lru_eviction,
+        test_keys_separate_model_and_temperature,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__doc__}")
+        except AssertionError:
+            failed += 1
+            print(f"✗ {test.__doc__}")
+    print(f"\n总计: {len(tests) - failed}/{len(tests)} 测试通过")
+    sys.exit(1 if failed else 0)
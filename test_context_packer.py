@@ -0,0 +1,144 @@
+"""
+上下文打包测试脚本（不启动服务，不访问网络）
+验证打包结果不超过token预算、重复和近似重复记录被去除、MMR兼顾多样性，以及截断长记录时保留变异字段
+"""
+import asyncio
+import sys
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+from src.rag.context_packer import ContextPacker, TokenCounter
+
+QUESTION = "BRAF 和 KRAS 变异的临床意义"
+
+
+class _FakeEmbeddings:
+    """指定文本使用给定向量，其余文本按词哈希（代替句向量模型）"""
+
+    model_name = "test-packer"
+
+    def __init__(self, vectors=None):
+        self.vectors = vectors or {}
+
+    async def encode(self, texts):
+        rows = []
+        for text in texts:
+            if text in self.vectors:
+                rows.append(np.asarray(self.vectors[text], dtype=np.float32))
+                continue
+            vector = np.zeros(64, dtype=np.float32)
+            for token in text.split():
+                vector[zlib.crc32(token.encode("utf-8")) % 64] += 1.0
+            rows.append(vector)
+        return np.stack(rows)
+
+
+def _records(contents, metadata=None):
+    return [{"content": content, "metadata": dict(metadata or {}), "score": 1.0} for content in contents]
+
+
+def _pack(packer: ContextPacker, local=None, public=None):
+    return asyncio.run(packer.pack(
+        QUESTION, {"local_db_results": local or {}, "public_db_results": public or {}}
+    ))
+
+
+def test_packed_context_within_budget():
+    """选中片段的token总数不超过预算，放不下的记录被跳过"""
+    contents = [
+        f"样本{i} 检出 {'BRAF' if i % 2 else 'KRAS'} 变异 " + "附加说明 " * (i % 7) + f"编号{i}"
+        for i in range(40)
+    ]
+    packer = ContextPacker(_FakeEmbeddings(), "gpt-4o", token_budget=150, max_record_tokens=40)
+    parts, stats = _pack(packer, local={"biobank": _records(contents[:20])},
+                         public={"ClinVar": _records(contents[20:])})
+
+    used = sum(packer.counter.count(part) for part in parts)
+    assert 0 < used <= 150
+    assert stats["tokens_after"] == used
+    assert 0 < stats["selected"] < stats["candidates"] == 40
+    assert all(packer.counter.count(part) <= 40 + packer.counter.count("[biobank] ") for part in parts)
+
+
+def test_dedup_and_mmr_diversity():
+    """完全重复和近似重复的记录被去除；预算只够两条时MMR选择不同主题的记录"""
+    b1, b2, k = "BRAF 记录一", "BRAF 记录二", "KRAS 记录三"
+    vectors = {
+        QUESTION: [1.0, 1.0, 0.0],
+        b1: [1.0, 0.2, 0.0],
+        b1 + " 。": [1.0, 0.19, 0.01],
+        b2: [1.0, 0.0, 0.3],
+        k: [0.0, 1.0, 0.5],
+    }
+    local = {"biobank": _records([b1, b2, k, b1 + " 。"])}
+    # 只有大小写和空白不同的记录视为完全重复
+    public = {"Other": _records(["braf   记录一"])}
+
+    # 三条记录的token数相同，预算只够其中两条
+    budget = 3 * TokenCounter("gpt-4o").count(f"[biobank] {b1}") - 1
+
+    def pack(mmr_lambda):
+        packer = ContextPacker(_FakeEmbeddings(vectors), "gpt-4o", token_budget=budget, mmr_lambda=mmr_lambda)
+        parts, stats = _pack(packer, local=local, public=public)
+        assert sum(packer.counter.count(part) for part in parts) <= budget
+        return parts, stats
+
+    parts, stats = pack(0.5)
+    assert parts == [f"[biobank] {b1}", f"[biobank] {k}"]
+    assert stats["candidates"] == 5
+    assert stats["duplicates_removed"] == 2
+
+    # 只看相关性时选择两条BRAF记录
+    parts, _ = pack(1.0)
+    assert parts == [f"[biobank] {b1}", f"[biobank] {b2}"]
+
+
+def test_truncation_keeps_variant_fields():
+    """超过单条上限的记录被截断到上限以内，变异字段和截断部分中的变异标识符保留"""
+    metadata = {"gene": "BRAF", "hgvs_p": "p.V600E", "chrom": "7", "pos": 140453136, "note": "备注"}
+    long_text = "该样本的测序报告描述 " * 80 + "另见 rs113488022"
+    packer = ContextPacker(_FakeEmbeddings(), "gpt-4o", token_budget=2000, max_record_tokens=60)
+    parts, stats = _pack(packer, local={"biobank": _records([long_text], metadata)})
+
+    assert len(parts) == 1 and stats["truncated"] == 1
+    text = parts[0][len("[biobank] "):]
+    assert packer.counter.count(text) <= 60
+    for field in ("gene: BRAF", "hgvs_p: p.V600E", "chrom: 7", "pos: 140453136", "rs113488022"):
+        assert field in text
+    assert "note" not in text
+
+
+def test_dict_fallback_lists_variant_fields_first():
+    """没有内容字段的记录改写为字段列表，变异字段排在前面，截断后仍然保留"""
+    item = {"description_long": "说明" * 200, "sample_id": "S001", "gene": "KRAS", "hgvs_p": "p.G12D"}
+    packer = ContextPacker(_FakeEmbeddings(), "gpt-4o", token_budget=2000, max_record_tokens=40)
+    parts, stats = _pack(packer, local={"biobank": [{"content": str(item), "metadata": item}]})
+
+    text = parts[0][len("[biobank] "):]
+    assert stats["truncated"] == 1
+    assert packer.counter.count(text) <= 40
+    assert text.startswith("sample_id: S001; gene: KRAS; hgvs_p: p.G12D; description_long: ")
+
+
+if __name__ == "__main__":
+    tests = [
+        test_packed_context_within_budget,
+        test_dedup_and_mmr_diversity,
+        test_truncation_keeps_variant_fields,
+        test_dict_fallback_lists_variant_fields_first,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__doc__}")
+        except AssertionError:
+            failed += 1
+            print(f"✗ {test.__doc__}")
+    print(f"\n总计: {len(tests) - failed}/{len(tests)} 测试通过")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,98 @@
+"""
+嵌入向量缓存测试脚本（不启动服务，不访问网络）
+验证容量满时淘汰最久未使用的条目，以及向量维度或容量变化时按新形状重建缓存、其他实例重新映射
+"""
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+from src.rag.embedding_cache import EmbeddingCache
+
+
+def _vectors(n: int, dim: int, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+
+
+def test_lru_eviction():
+    """容量满时淘汰最久未使用的条目，最近读取过的条目保留"""
+    cache = EmbeddingCache("test-model", tempfile.mkdtemp(), capacity=3)
+    vectors = _vectors(4, 8)
+    cache.put_many(["a", "b", "c"], vectors[:3])
+    time.sleep(0.01)
+    # 读取a使其成为最近使用的条目
+    cached, missing = cache.get_many(["a"])
+    assert missing == [] and np.array_equal(cached[0], vectors[0])
+    time.sleep(0.01)
+
+    cache.put_many(["d"], vectors[3:])
+    cached, missing = cache.get_many(["a", "b", "c", "d"])
+    assert missing == [1]
+    for i in (0, 2, 3):
+        assert np.array_equal(cached[i], vectors[i])
+
+
+def test_shared_between_instances():
+    """同一目录的另一个实例（模拟其他工作进程）读到已写入的向量，相同文本不占用新的槽位"""
+    directory = tempfile.mkdtemp()
+    writer = EmbeddingCache("test-model", directory, capacity=10)
+    reader = EmbeddingCache("test-model", directory, capacity=10)
+    vectors = _vectors(3, 8)
+    writer.put_many(["a", "b", "c"], vectors)
+    writer.put_many(["a"], vectors[:1])
+
+    cached, missing = reader.get_many(["c", "x", "a"])
+    assert missing == [1]
+    assert np.array_equal(cached[0], vectors[2]) and np.array_equal(cached[2], vectors[0])
+    with writer._connect() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0] == 3
+
+
+def test_shape_change_rebuilds_cache():
+    """向量维度或容量变化时清空旧条目、换用新矩阵文件，已映射旧矩阵的实例按新版本重新映射"""
+    directory = tempfile.mkdtemp()
+    old = EmbeddingCache("test-model", directory, capacity=10)
+    old.put_many(["a", "b"], _vectors(2, 8))
+    assert old.get_many(["a"])[1] == []
+    old_shape = old.shape
+
+    # 另一个实例以新的维度写入
+    new = EmbeddingCache("test-model", directory, capacity=10)
+    vectors = _vectors(1, 16, seed=1)
+    new.put_many(["c"], vectors)
+    assert new.shape[:2] == (16, 10) and new.shape[2] == old_shape[2] + 1
+    assert not old._vectors_path(old_shape).exists()
+
+    cached, missing = old.get_many(["a", "c"])
+    assert old.shape == new.shape
+    assert missing == [0]
+    assert np.array_equal(cached[1], vectors[0])
+
+    # 容量变化同样重建
+    resized = EmbeddingCache("test-model", directory, capacity=20)
+    resized.put_many(["d"], _vectors(1, 16, seed=2))
+    assert resized.shape[:2] == (16, 20)
+    assert old.get_many(["c", "d"])[1] == [0]
+
+
+if __name__ == "__main__":
+    tests = [
+        test_lru_eviction,
+        test_shared_between_instances,
+        test_shape_change_rebuilds_cache,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__doc__}")
+        except AssertionError:
+            failed += 1
+            print(f"✗ {test.__doc__}")
+    print(f"\n总计: {len(tests) - failed}/{len(tests)} 测试通过")
+    sys.exit(1 if failed else 0)
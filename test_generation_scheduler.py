@@ -0,0 +1,152 @@
+"""
+生成调度器和模拟生成后端测试脚本（不启动服务，不访问网络）
+验证优先级排队、每分钟token数限流、取消时名额的转交，以及模拟后端输出的确定性
+"""
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+from src.rag.generator import (
+    GenerationScheduler, SimulatedBackend, PRIORITY_BATCH, PRIORITY_INTERACTIVE
+)
+
+
+async def _job(scheduler, name, priority, order, prompt_tokens=0, hold=0.0):
+    """获取名额后记录完成顺序"""
+    async with scheduler.slot(prompt_tokens, priority):
+        order.append(name)
+        await asyncio.sleep(hold)
+
+
+def test_priority_ordering():
+    """名额空出时交互式请求先于更早排队的批量请求"""
+    async def run():
+        scheduler = GenerationScheduler(max_concurrency=1, tokens_per_minute=0, max_output_tokens=0)
+        order = []
+        holder = asyncio.ensure_future(_job(scheduler, "holder", PRIORITY_BATCH, order, hold=0.05))
+        await asyncio.sleep(0)
+        batch = [
+            asyncio.ensure_future(_job(scheduler, f"batch{i}", PRIORITY_BATCH, order))
+            for i in range(3)
+        ]
+        await asyncio.sleep(0)
+        interactive = asyncio.ensure_future(_job(scheduler, "interactive", PRIORITY_INTERACTIVE, order))
+        await asyncio.gather(holder, interactive, *batch)
+        return order, scheduler
+
+    order, scheduler = asyncio.run(run())
+    assert order == ["holder", "interactive", "batch0", "batch1", "batch2"]
+    assert scheduler.active == 0
+
+
+def test_priority_when_token_limited():
+    """token不足时等待的批量请求不占用名额，交互式请求先取得补充的token"""
+    async def run():
+        # 每秒补充100个token
+        scheduler = GenerationScheduler(max_concurrency=2, tokens_per_minute=6000, max_output_tokens=0)
+        scheduler.token_bucket.tokens = 0.0
+        order = []
+        batch = [
+            asyncio.ensure_future(_job(scheduler, f"batch{i}", PRIORITY_BATCH, order, prompt_tokens=20))
+            for i in range(2)
+        ]
+        await asyncio.sleep(0.01)
+        assert scheduler.active == 0
+        interactive = asyncio.ensure_future(
+            _job(scheduler, "interactive", PRIORITY_INTERACTIVE, order, prompt_tokens=20)
+        )
+        await asyncio.gather(interactive, *batch)
+        return order
+
+    assert asyncio.run(run())[0] == "interactive"
+
+
+def test_tokens_per_minute_limit():
+    """每分钟token数耗尽后按补充速度放行"""
+    async def run():
+        scheduler = GenerationScheduler(max_concurrency=8, tokens_per_minute=6000, max_output_tokens=0)
+        scheduler.token_bucket.tokens = 0.0
+        finished = []
+        start = time.perf_counter()
+
+        async def job():
+            async with scheduler.slot(20):
+                finished.append(time.perf_counter() - start)
+
+        await asyncio.gather(*(job() for _ in range(3)))
+        return finished, scheduler
+
+    finished, scheduler = asyncio.run(run())
+    # 每个请求20个token，每秒补充100个：约0.2、0.4、0.6秒放行
+    assert 0.15 <= finished[0] < 0.35
+    assert 0.55 <= finished[-1] < 0.9
+    assert scheduler.stats()["token_limit"]["throttled"] == 3
+
+
+def test_cancelled_waiter_hands_slot_on():
+    """排队中被取消、或名额已分配后被取消的请求都会把名额交给下一个请求"""
+    async def run():
+        scheduler = GenerationScheduler(max_concurrency=1, tokens_per_minute=0, max_output_tokens=0)
+        order = []
+        holder = scheduler.slot(0)
+        await holder.__aenter__()
+        queued = asyncio.ensure_future(_job(scheduler, "cancelled", PRIORITY_INTERACTIVE, order))
+        granted = asyncio.ensure_future(_job(scheduler, "granted", PRIORITY_INTERACTIVE, order))
+        last = asyncio.ensure_future(_job(scheduler, "last", PRIORITY_BATCH, order))
+        await asyncio.sleep(0)
+
+        # 排队中取消
+        queued.cancel()
+        await asyncio.sleep(0)
+        # 名额已分配给granted、但其尚未恢复运行时取消
+        await holder.__aexit__(None, None, None)
+        granted.cancel()
+        await asyncio.gather(queued, granted, return_exceptions=True)
+        await asyncio.wait_for(last, 1.0)
+        return order, scheduler
+
+    order, scheduler = asyncio.run(run())
+    assert order == ["last"]
+    assert scheduler.active == 0
+
+
+def test_simulated_backend_is_deterministic():
+    """相同的提示词得到相同的答案和延迟，流式输出与完整输出一致"""
+    backend = SimulatedBackend("gpt-test", first_token_latency=0.01, tokens_per_second=10000)
+    prompt = "上下文信息：\n\nBRAF V600E 是常见的激活突变\n\n用户问题：BRAF V600E 的意义\n"
+
+    async def run():
+        first = await backend.generate(prompt)
+        second = await backend.generate(prompt)
+        streamed = "".join([chunk async for chunk in backend.stream(prompt)])
+        return first, second, streamed
+
+    first, second, streamed = asyncio.run(run())
+    assert first == second == streamed
+    assert "BRAF V600E 的意义" in first
+    assert backend._plan(prompt) == backend._plan(prompt)
+    assert backend._plan(prompt)[1] != backend._plan(prompt + "？")[1]
+
+
+if __name__ == "__main__":
+    tests = [
+        test_priority_ordering,
+        test_priority_when_token_limited,
+        test_tokens_per_minute_limit,
+        test_cancelled_waiter_hands_slot_on,
+        test_simulated_backend_is_deterministic,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__doc__}")
+        except AssertionError:
+            failed += 1
+            print(f"✗ {test.__doc__}")
+    print(f"\n总计: {len(tests) - failed}/{len(tests)} 测试通过")
+    sys.exit(1 if failed else 0)
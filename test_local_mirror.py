@@ -0,0 +1,182 @@
+"""
+本地镜像测试脚本（不启动服务，不访问网络）
+验证镜像的增量同步、重启后从磁盘加载、多个写入者在文件锁下并发追加，以及远端记录减少时全量重新同步
+"""
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import httpx
+import numpy as np
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+_TMP_DIR = tempfile.mkdtemp()
+os.environ.setdefault("EMBEDDING_CACHE_DIR", os.path.join(_TMP_DIR, "embeddings"))
+os.environ.setdefault("HTTP_CACHE_PATH", os.path.join(_TMP_DIR, "http_cache.db"))
+
+from src.config.database_manager import LocalDatabase
+from src.rag.local_db_client import LocalDatabaseClient
+from src.rag.local_mirror import LocalMirror
+
+
+class _HashingEmbeddings:
+    """按词哈希的确定性嵌入（代替句向量模型）"""
+
+    model_name = "test-hashing"
+
+    async def encode(self, texts):
+        single = isinstance(texts, str)
+        vectors = np.zeros((1 if single else len(texts), 32), dtype=np.float32)
+        for row, text in enumerate([texts] if single else texts):
+            for token in text.split():
+                vectors[row, zlib.crc32(token.encode("utf-8")) % 32] += 1.0
+        return vectors[0] if single else vectors
+
+
+def _records(n: int, prefix: str = "记录") -> list:
+    return [{"id": i, "content": f"{prefix} {i} BRAF"} for i in range(n)]
+
+
+def _db_config(name: str) -> LocalDatabase:
+    # sync_interval为0：每次查询都同步，便于测试增量拉取
+    return LocalDatabase(
+        name=name, type="http_api", base_url="http://biobank.test", database_id=name,
+        token="t", mirror_dir=os.path.join(_TMP_DIR, "mirrors"), sync_interval=0, page_size=100
+    )
+
+
+class _RemoteDatabase:
+    """模拟分页API：按请求体中的skip/limit返回记录和总数，并记录请求的页码"""
+
+    def __init__(self, records: list):
+        self.records = records
+        self.pages = []
+
+    def handler(self, request):
+        option = json.loads(request.content)["filterOption"]
+        self.pages.append(option["page"])
+        skip, limit = option["skip"], option["limit"]
+        return httpx.Response(
+            200, json={"results": self.records[skip:skip + limit], "total": len(self.records)}
+        )
+
+    def client(self) -> LocalDatabaseClient:
+        client = LocalDatabaseClient(_HashingEmbeddings())
+        client.http_client = httpx.AsyncClient(transport=httpx.MockTransport(self.handler))
+        return client
+
+
+def test_incremental_sync():
+    """再次同步只从已镜像记录所在页开始拉取，并只追加新增的记录"""
+    remote = _RemoteDatabase(_records(250))
+    db_config = _db_config("incremental")
+
+    async def run():
+        client = remote.client()
+        mirror = await client.sync_mirror(db_config)
+        assert mirror.items == remote.records
+        assert sorted(remote.pages) == [1, 2, 3]
+
+        remote.records = _records(280)
+        remote.pages.clear()
+        mirror = await client.sync_mirror(db_config)
+        await client.http_client.aclose()
+        return mirror
+
+    mirror = asyncio.run(run())
+    assert remote.pages == [3]
+    assert mirror.items == remote.records
+
+
+def test_reload_after_restart():
+    """重新创建镜像时从磁盘加载已确认的记录，丢弃未确认的尾部数据"""
+    db_config = _db_config("restart")
+    records = _records(30)
+    mirror = LocalMirror(db_config)
+    mirror.append(records[:20], 0)
+    mirror.mark_synced()
+
+    # 模拟写入中途进程退出：记录文件末尾有未写入meta的半行
+    with open(mirror.records_path, "ab") as f:
+        f.write(b'{"id": 20, "cont')
+
+    reloaded = LocalMirror(db_config)
+    assert reloaded.items == records[:20]
+    assert reloaded.last_sync == mirror.last_sync
+
+    reloaded.append(records[20:], 20)
+    assert LocalMirror(db_config).items == records
+
+
+def test_concurrent_writers():
+    """多个镜像实例（模拟多个工作进程）并发追加重叠的页时，记录不重复、不丢失、按下标有序"""
+    db_config = _db_config("concurrent")
+    records = _records(400)
+    page_size = 50
+
+    def writer(_) -> None:
+        # 每个写入者都追加全部页：其他写入者已写入的部分被跳过
+        mirror = LocalMirror(db_config)
+        for start in range(0, len(records), page_size):
+            mirror.append(records[start:start + page_size], start)
+        assert mirror.items == records
+
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        list(pool.map(writer, range(6)))
+
+    mirror = LocalMirror(db_config)
+    assert mirror.items == records
+    with open(mirror.records_path, "rb") as f:
+        assert sum(1 for _ in f) == len(records)
+
+
+def test_shrunk_remote_triggers_full_resync():
+    """远端总记录数少于镜像时清空镜像和索引，全量重新同步"""
+    remote = _RemoteDatabase(_records(250))
+    db_config = _db_config("shrunk")
+
+    async def run():
+        client = remote.client()
+        mirror = await client.sync_mirror(db_config)
+        index = await client.sync_index(db_config, mirror)
+        assert index.size == 250
+
+        # 远端删除了记录，剩余记录的下标与镜像不再对应
+        remote.records = _records(120, prefix="新记录")
+        remote.pages.clear()
+        mirror = await client.sync_mirror(db_config)
+        index = await client.sync_index(db_config, mirror)
+        await client.http_client.aclose()
+        return mirror, index
+
+    mirror, index = asyncio.run(run())
+    assert remote.pages[:2] == [3, 1]
+    assert mirror.items == remote.records
+    assert LocalMirror(db_config).items == remote.records
+    assert index.size == 120
+
+
+if __name__ == "__main__":
+    tests = [
+        test_incremental_sync,
+        test_reload_after_restart,
+        test_concurrent_writers,
+        test_shrunk_remote_triggers_full_resync,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__doc__}")
+        except AssertionError:
+            failed += 1
+            print(f"✗ {test.__doc__}")
+    print(f"\n总计: {len(tests) - failed}/{len(tests)} 测试通过")
+    sys.exit(1 if failed else 0)
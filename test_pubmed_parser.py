@@ -0,0 +1,112 @@
+"""
+PubMed XML增量解析测试脚本（不启动服务，不访问网络）
+验证文献随数据块到达逐篇产出，以及efetch响应流式解析后缓存提取出的文献字段
+"""
+import asyncio
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import httpx
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+_TMP_DIR = tempfile.mkdtemp()
+os.environ.setdefault("HTTP_CACHE_PATH", os.path.join(_TMP_DIR, "http_cache.db"))
+
+from src.config.database_manager import PublicDatabase
+from src.rag.public_db_client import PublicDatabaseClient
+from src.rag.pubmed_parser import iter_pubmed_articles
+
+ARTICLE = (
+    "<PubmedArticle><MedlineCitation><PMID>{pmid}</PMID><Article>"
+    "<ArticleTitle>BRAF <i>V600E</i> study {pmid}</ArticleTitle>"
+    "<Abstract><AbstractText Label=\"RESULTS\">Finding {pmid}.</AbstractText></Abstract>"
+    "</Article><MeshHeadingList><MeshHeading><DescriptorName>Melanoma</DescriptorName>"
+    "</MeshHeading></MeshHeadingList></MedlineCitation></PubmedArticle>"
+)
+
+
+def _xml_chunks(pmids, chunk_size=50):
+    """按固定大小切分的efetch响应"""
+    body = ("<PubmedArticleSet>" + "".join(ARTICLE.format(pmid=pmid) for pmid in pmids)
+            + "</PubmedArticleSet>").encode("utf-8")
+    return [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)]
+
+
+def test_articles_are_yielded_as_chunks_arrive():
+    """每篇文献在其数据块到达后即产出，不等待完整响应"""
+    chunks = _xml_chunks(["1", "2", "3"])
+    consumed = []
+
+    def source():
+        for chunk in chunks:
+            consumed.append(chunk)
+            yield chunk
+
+    articles = iter_pubmed_articles(source())
+    first = next(articles)
+    assert first == {
+        "pmid": "1",
+        "title": "BRAF V600E study 1",
+        "abstract": "RESULTS: Finding 1.",
+        "mesh_terms": ["Melanoma"],
+    }
+    assert len(consumed) < len(chunks)
+    assert [article["pmid"] for article in articles] == ["2", "3"]
+
+
+def test_efetch_response_is_streamed_and_cached():
+    """efetch响应按数据块流式解析，缓存提取出的文献字段，再次查询不访问网络"""
+    requests = []
+
+    async def stream(pmids):
+        for chunk in _xml_chunks(pmids):
+            yield chunk
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, content=stream(["11", "12"]))
+
+    async def run():
+        client = PublicDatabaseClient(embedding_service=object())
+        client.http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        db_config = PublicDatabase(
+            name="PubMed-test", type="pubmed", official_url="https://pubmed.ncbi.nlm.nih.gov",
+            hedge_requests=False
+        )
+        params = {"db": "pubmed", "id": "11,12", "retmode": "xml"}
+        bodies = [
+            await client._cached_get(
+                "https://eutils.test/efetch.fcgi", params, db_config,
+                read_body=client._read_pubmed_articles
+            )
+            for _ in range(2)
+        ]
+        await client.http_client.aclose()
+        return bodies
+
+    first, second = asyncio.run(run())
+    assert len(requests) == 1
+    assert first == second
+    assert [article["pmid"] for article in json.loads(first)] == ["11", "12"]
+
+
+if __name__ == "__main__":
+    tests = [
+        test_articles_are_yielded_as_chunks_arrive,
+        test_efetch_response_is_streamed_and_cached,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__doc__}")
+        except AssertionError:
+            failed += 1
+            print(f"✗ {test.__doc__}")
+    print(f"\n总计: {len(tests) - failed}/{len(tests)} 测试通过")
+    sys.exit(1 if failed else 0)
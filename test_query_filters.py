@@ -0,0 +1,185 @@
+"""
+查询过滤条件提取测试脚本（不启动服务，不访问网络）
+验证中英文问题中的基因和样本编号提取、filtersIn条件的形状，以及在本地镜像上的过滤
+"""
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import zlib
+from pathlib import Path
+
+import httpx
+import numpy as np
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+_TMP_DIR = tempfile.mkdtemp()
+os.environ.setdefault("EMBEDDING_CACHE_DIR", os.path.join(_TMP_DIR, "embeddings"))
+os.environ.setdefault("HTTP_CACHE_PATH", os.path.join(_TMP_DIR, "http_cache.db"))
+
+from src.config.database_manager import LocalDatabase
+from src.rag.local_db_client import LocalDatabaseClient
+from src.rag.local_mirror import LocalMirror
+from src.rag.query_filters import QueryFilters, derive_filters
+
+FIELDS = {"gene": "gene", "variant": "hgvs_p", "sample": "sample_id"}
+
+RECORDS = [
+    {"content": "BRAF V600E 黑色素瘤", "gene": "BRAF", "hgvs_p": "p.V600E", "sample_id": "S001"},
+    {"content": "BRAF V600K 黑色素瘤", "gene": "BRAF", "hgvs_p": "p.V600K", "sample_id": "S002"},
+    {"content": "KRAS G12D 胰腺癌", "gene": "KRAS", "hgvs_p": "p.G12D", "sample_id": "S001"},
+    {"content": "BRAF V600E 结直肠癌", "gene": "braf", "hgvs_p": ["BRAF p.V600E"], "sample_id": "S003"},
+]
+
+
+class _HashingEmbeddings:
+    """按词哈希的确定性嵌入（代替句向量模型）"""
+
+    model_name = "test-hashing"
+
+    async def encode(self, texts):
+        single = isinstance(texts, str)
+        vectors = np.zeros((1 if single else len(texts), 32), dtype=np.float32)
+        for row, text in enumerate([texts] if single else texts):
+            for token in text.split():
+                vectors[row, zlib.crc32(token.encode("utf-8")) % 32] += 1.0
+        return vectors[0] if single else vectors
+
+
+def _db_config(mirror: bool, filter_fields=None) -> LocalDatabase:
+    return LocalDatabase(
+        name="biobank", type="http_api", base_url="http://biobank.test", database_id="wf1",
+        token="t", mirror=mirror, mirror_dir=os.path.join(_TMP_DIR, "mirrors"),
+        filter_fields=FIELDS if filter_fields is None else filter_fields
+    )
+
+
+def test_gene_next_to_chinese():
+    """与中文相邻的基因符号能被提取"""
+    assert derive_filters("什么是BRCA1基因突变？").genes == ["BRCA1"]
+    assert derive_filters("解释BRAF V600E突变").genes == ["BRAF"]
+    assert derive_filters("基因BRAF突变的频率").genes == ["BRAF"]
+    assert derive_filters("gene: TP53").genes == ["TP53"]
+
+
+def test_ordinary_words_are_not_samples():
+    """问题中的普通单词不被当作样本编号"""
+    assert derive_filters("What is found in a sample of tumor tissue?").samples == []
+    assert derive_filters("样本 BRAF V600E 的频率").samples == []
+    assert derive_filters("KRAS G12D 在 sample set 中").samples == []
+
+
+def test_explicit_sample_ids():
+    """显式写出的样本编号能被提取"""
+    assert derive_filters("sample: NA12878 的BRAF突变").samples == ["NA12878"]
+    assert derive_filters("样本：S001的突变").samples == ["S001"]
+    assert derive_filters("样品编号 P-023 有哪些变异").samples == ["P-023"]
+
+
+def test_filters_in_shape():
+    """filtersIn条件默认为{"field", "values"}形状，配置template时按其形状生成"""
+    filters = QueryFilters(genes=["BRAF"], variants=["p.V600E"])
+    assert filters.to_filters_in(FIELDS) == [
+        {"field": "gene", "values": ["BRAF"]},
+        {"field": "hgvs_p", "values": ["p.V600E"]},
+    ]
+    custom = {
+        "gene": "gene",
+        "variant": {"field": "hgvs_p", "template": {"name": "$field", "operator": "in", "value": "$values"}},
+    }
+    assert filters.to_filters_in(custom) == [
+        {"field": "gene", "values": ["BRAF"]},
+        {"name": "hgvs_p", "operator": "in", "value": ["p.V600E"]},
+    ]
+    # 未映射的维度不生效
+    assert QueryFilters(samples=["S001"]).to_filters_in({"gene": "gene"}) == []
+
+
+def test_pushdown_request_payload():
+    """未启用镜像时过滤条件按配置的形状写入请求体的filterOption.filters.filtersIn"""
+    payloads = []
+
+    def handler(request):
+        payloads.append(json.loads(request.content))
+        return httpx.Response(200, json={"results": [RECORDS[0]], "total": 1})
+
+    async def run():
+        client = LocalDatabaseClient(_HashingEmbeddings())
+        client.http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        results = await client.search_database(
+            _db_config(mirror=False), "BRAF V600E", 5, QueryFilters(genes=["BRAF"], samples=["S001"])
+        )
+        await client.http_client.aclose()
+        return results
+
+    results = asyncio.run(run())
+    assert [result["content"] for result in results] == [RECORDS[0]["content"]]
+    assert payloads[0]["filterOption"]["filters"] == {
+        "workflow": "wf1",
+        "filtersIn": [
+            {"field": "gene", "values": ["BRAF"]},
+            {"field": "sample_id", "values": ["S001"]},
+        ],
+    }
+
+
+def test_matches_mapped_fields():
+    """镜像记录按已映射字段匹配：不区分大小写、列表任一元素、变异字段中解析出的标识符"""
+    filters = QueryFilters(genes=["BRAF"], variants=["p.V600E"])
+    assert [filters.matches(record, FIELDS) for record in RECORDS] == [True, False, False, True]
+    assert QueryFilters(samples=["S001"]).matches(RECORDS[2], FIELDS)
+    assert QueryFilters(samples=["S001"]).matches(RECORDS[1], {"gene": "gene"})
+
+
+def test_mirror_filters_locally():
+    """启用镜像时过滤条件在镜像记录上生效，不向API发送请求"""
+    def handler(request):
+        raise AssertionError("不应访问API")
+
+    async def run():
+        db_config = _db_config(mirror=True)
+        client = LocalDatabaseClient(_HashingEmbeddings())
+        client.http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        mirror = LocalMirror(db_config)
+        mirror.append(RECORDS, 0)
+        mirror.mark_synced()
+        client.mirrors[db_config.name] = mirror
+
+        filtered = await client.search_database(
+            db_config, "BRAF V600E 结直肠癌", 5, QueryFilters(genes=["BRAF"], variants=["p.V600E"])
+        )
+        sample = await client.search_database(db_config, "", 5, QueryFilters(samples=["S001"]))
+        unfiltered = await client.search_database(db_config, "BRAF V600E", 5, QueryFilters())
+        await client.http_client.aclose()
+        return filtered, sample, unfiltered
+
+    filtered, sample, unfiltered = asyncio.run(run())
+    assert [result["content"] for result in filtered] == [RECORDS[3]["content"], RECORDS[0]["content"]]
+    assert filtered[0]["score"] > filtered[1]["score"]
+    assert [result["metadata"]["sample_id"] for result in sample] == ["S001", "S001"]
+    assert len(unfiltered) == len(RECORDS)
+
+
+if __name__ == "__main__":
+    tests = [
+        test_gene_next_to_chinese,
+        test_ordinary_words_are_not_samples,
+        test_explicit_sample_ids,
+        test_filters_in_shape,
+        test_pushdown_request_payload,
+        test_matches_mapped_fields,
+        test_mirror_filters_locally,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__doc__}")
+        except AssertionError:
+            failed += 1
+            print(f"✗ {test.__doc__}")
+    print(f"\n总计: {len(tests) - failed}/{len(tests)} 测试通过")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,132 @@
+"""
+上游限流与请求合并测试脚本（不启动服务，不访问网络）
+验证相同的并发调用被合并为一次、等待者被取消不影响共享调用，以及令牌桶按速率放行
+"""
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+from src.rag.rate_limit import SingleFlight, TokenBucket
+
+
+def test_single_flight_coalesces_identical_calls():
+    """相同键的并发调用只执行一次并共享结果，不同键分别执行"""
+    async def run():
+        flight = SingleFlight()
+        calls = []
+
+        async def fetch(key):
+            calls.append(key)
+            await asyncio.sleep(0.05)
+            return f"result:{key}"
+
+        results = await asyncio.gather(
+            *(flight.do("a", lambda: fetch("a")) for _ in range(5)),
+            flight.do("b", lambda: fetch("b"))
+        )
+        return results, calls, flight
+
+    results, calls, flight = asyncio.run(run())
+    assert results == ["result:a"] * 5 + ["result:b"]
+    assert sorted(calls) == ["a", "b"]
+    assert flight.stats() == {"in_flight": 0, "executed": 2, "coalesced": 4}
+
+
+def test_single_flight_shares_exceptions():
+    """共享调用的异常传给所有等待者，结束后同一个键可以再次执行"""
+    async def run():
+        flight = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise ValueError("上游错误")
+
+        results = await asyncio.gather(
+            flight.do("a", fail), flight.do("a", fail), return_exceptions=True
+        )
+        retried = await flight.do("a", lambda: asyncio.sleep(0, result="ok"))
+        return results, retried
+
+    results, retried = asyncio.run(run())
+    assert all(isinstance(result, ValueError) for result in results)
+    assert retried == "ok"
+
+
+def test_cancelled_waiter_does_not_cancel_shared_call():
+    """某个等待者被取消后，共享调用继续执行，其他等待者仍拿到结果"""
+    async def run():
+        flight = SingleFlight()
+        finished = []
+
+        async def fetch():
+            await asyncio.sleep(0.05)
+            finished.append(True)
+            return "ok"
+
+        first = asyncio.ensure_future(flight.do("a", fetch))
+        second = asyncio.ensure_future(flight.do("a", fetch))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        result = await second
+        try:
+            await first
+        except asyncio.CancelledError:
+            pass
+        return result, finished, first
+
+    result, finished, first = asyncio.run(run())
+    assert result == "ok"
+    assert finished == [True]
+    assert first.cancelled()
+
+
+def test_token_bucket_throttles_to_rate():
+    """突发额度用完后按速率放行，等待时间计入统计"""
+    async def run():
+        bucket = TokenBucket(rate=20, burst=2)
+        start = time.perf_counter()
+        granted = []
+        for _ in range(6):
+            await bucket.acquire()
+            granted.append(time.perf_counter() - start)
+        return bucket, granted
+
+    bucket, granted = asyncio.run(run())
+    # 前2个立即放行，之后每个间隔约1/20秒：最后一个约在0.2秒时放行
+    assert granted[1] < 0.02
+    assert 0.18 <= granted[-1] < 0.4
+    stats = bucket.stats()
+    assert stats["throttled"] == 4
+    assert 0.18 <= stats["total_wait_seconds"] < 0.4
+
+
+def test_token_bucket_try_acquire():
+    """try_acquire不等待：令牌足够时扣除，否则返回还需等待的时间"""
+    bucket = TokenBucket(rate=10, burst=1)
+    assert bucket.try_acquire() == 0.0
+    wait = bucket.try_acquire()
+    assert 0.05 < wait <= 0.1
+
+
+if __name__ == "__main__":
+    tests = [
+        test_single_flight_coalesces_identical_calls,
+        test_single_flight_shares_exceptions,
+        test_cancelled_waiter_does_not_cancel_shared_call,
+        test_token_bucket_throttles_to_rate,
+        test_token_bucket_try_acquire,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__doc__}")
+        except AssertionError:
+            failed += 1
+            print(f"✗ {test.__doc__}")
+    print(f"\n总计: {len(tests) - failed}/{len(tests)} 测试通过")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,202 @@
+"""
+请求容错测试脚本（不启动服务，不访问网络）
+用模拟的请求函数验证对冲请求、Retry-After、熔断器的状态转换、探测请求取消，以及过期缓存兜底
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+_TMP_DIR = tempfile.mkdtemp()
+os.environ.setdefault("HTTP_CACHE_PATH", os.path.join(_TMP_DIR, "http_cache.db"))
+
+from src.config.database_manager import PublicDatabase
+from src.rag.http_cache import HttpResponseCache
+from src.rag.public_db_client import PublicDatabaseClient
+from src.rag.resilience import CircuitBreaker, CircuitOpenError, ResilienceManager
+
+URL = "https://api.test/search"
+
+
+def _db_config(**kwargs) -> PublicDatabase:
+    return PublicDatabase(name="TestDB", type="api", official_url="https://api.test", **kwargs)
+
+
+def _response(status: int = 200, headers=None) -> httpx.Response:
+    return httpx.Response(status, headers=headers, request=httpx.Request("GET", URL))
+
+
+def test_hedge_after_p95():
+    """首个请求超过近期p95延迟仍未返回时发出对冲请求，取先返回的结果"""
+    async def run():
+        manager = ResilienceManager()
+        source = manager.get("TestDB")
+        source.latencies.extend([0.05] * 20)
+        calls = []
+
+        async def send():
+            calls.append(time.perf_counter())
+            if len(calls) == 1:
+                await asyncio.sleep(2.0)
+                return _response(200, {"X-Attempt": "first"})
+            return _response(200, {"X-Attempt": "hedge"})
+
+        start = time.perf_counter()
+        response = await manager.call("TestDB", send, _db_config())
+        return response, calls, start, source
+
+    response, calls, start, source = asyncio.run(run())
+    assert response.headers["X-Attempt"] == "hedge"
+    assert len(calls) == 2
+    assert 0.04 <= calls[1] - start < 0.5
+    assert (source.hedges, source.hedge_wins) == (1, 1)
+
+
+def test_retry_after_is_honoured():
+    """429响应的Retry-After决定重试前的等待时间"""
+    async def run():
+        manager = ResilienceManager()
+        calls = []
+
+        async def send():
+            calls.append(time.perf_counter())
+            if len(calls) == 1:
+                return _response(429, {"Retry-After": "1"})
+            return _response(200)
+
+        response = await manager.call("TestDB", send, _db_config(hedge_requests=False))
+        return response, calls, manager.get("TestDB")
+
+    response, calls, source = asyncio.run(run())
+    assert response.status_code == 200
+    assert calls[1] - calls[0] >= 1.0
+    assert source.retries == 1
+
+
+def test_breaker_open_half_open_closed():
+    """连续失败后熔断；熔断期满后只放行一个探测请求，探测成功后恢复"""
+    async def run():
+        manager = ResilienceManager()
+        db_config = _db_config(
+            max_retries=0, hedge_requests=False,
+            circuit_failure_threshold=2, circuit_reset_timeout=0.1
+        )
+
+        async def failing():
+            return _response(500)
+
+        for _ in range(2):
+            try:
+                await manager.call("TestDB", failing, db_config)
+            except httpx.HTTPStatusError:
+                pass
+        breaker = manager.get("TestDB").breaker
+        assert breaker.state == CircuitBreaker.OPEN
+        try:
+            await manager.call("TestDB", failing, db_config)
+            raise AssertionError("熔断期间的请求应被拒绝")
+        except CircuitOpenError:
+            pass
+
+        await asyncio.sleep(0.15)
+
+        async def slow_success():
+            await asyncio.sleep(0.05)
+            return _response(200)
+
+        probe = asyncio.ensure_future(manager.call("TestDB", slow_success, db_config))
+        await asyncio.sleep(0)
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        try:
+            await manager.call("TestDB", slow_success, db_config)
+            raise AssertionError("探测期间的其他请求应被拒绝")
+        except CircuitOpenError:
+            pass
+        await probe
+        return breaker, manager.get("TestDB")
+
+    breaker, source = asyncio.run(run())
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.consecutive_failures == 0
+    assert source.rejected == 2
+
+
+def test_cancelled_probe_releases_slot():
+    """被取消的探测请求释放探测名额，下一个请求可以继续探测"""
+    async def run():
+        manager = ResilienceManager()
+        db_config = _db_config(max_retries=0, hedge_requests=False, circuit_reset_timeout=0.0)
+        # 熔断期已满：下一个请求成为探测请求
+        breaker = manager.get("TestDB", db_config).breaker
+        breaker.state, breaker.opened_at = CircuitBreaker.OPEN, 0.0
+
+        async def hang():
+            await asyncio.sleep(10)
+
+        probe = asyncio.ensure_future(manager.call("TestDB", hang, db_config))
+        await asyncio.sleep(0)
+        probe.cancel()
+        try:
+            await probe
+        except asyncio.CancelledError:
+            pass
+
+        async def success():
+            return _response(200)
+
+        response = await manager.call("TestDB", success, db_config)
+        return response, breaker
+
+    response, breaker = asyncio.run(run())
+    assert response.status_code == 200
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_stale_cache_fallback():
+    """数据源请求失败时返回过期的缓存内容"""
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        raise httpx.ConnectError("连接失败", request=request)
+
+    async def run():
+        client = PublicDatabaseClient(embedding_service=object())
+        client.http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        params = {"term": "BRAF"}
+        key = HttpResponseCache.make_key("GET", URL, params)
+        await client.response_cache.put(key, URL, b"stale", None, None, 0, False)
+
+        body = await client._cached_get(URL, params, _db_config(max_retries=1, hedge_requests=False))
+        await client.http_client.aclose()
+        return body
+
+    assert asyncio.run(run()) == b"stale"
+    assert len(requests) == 2
+
+
+if __name__ == "__main__":
+    tests = [
+        test_hedge_after_p95,
+        test_retry_after_is_honoured,
+        test_breaker_open_half_open_closed,
+        test_cancelled_probe_releases_slot,
+        test_stale_cache_fallback,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__doc__}")
+        except AssertionError:
+            failed += 1
+            print(f"✗ {test.__doc__}")
+    print(f"\n总计: {len(tests) - failed}/{len(tests)} 测试通过")
+    sys.exit(1 if failed else 0)
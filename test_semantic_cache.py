@@ -0,0 +1,98 @@
+"""
+语义缓存写入测试脚本（不启动服务，不访问网络）
+验证只有完整且成功的查询结果才会写入语义缓存
+"""
+import asyncio
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+# 缓存文件写入临时目录，避免污染 ./data
+_tmp_dir = tempfile.mkdtemp()
+os.environ["HTTP_CACHE_PATH"] = os.path.join(_tmp_dir, "http_cache.sqlite3")
+os.environ["LLM_CACHE_PATH"] = os.path.join(_tmp_dir, "llm_cache.sqlite3")
+os.environ["EMBEDDING_CACHE_DIR"] = os.path.join(_tmp_dir, "embedding_cache")
+
+from src.config.database_manager import DatabaseManager
+from src.rag.rag_engine import RAGEngine, GENERATION_ERROR_PREFIX
+
+
+def _make_engine(local_results, public_results, answer) -> RAGEngine:
+    """构建检索和生成均被替换为固定结果的RAG引擎"""
+    engine = RAGEngine(DatabaseManager("config/database_config.yaml"))
+
+    async def encode(text):
+        return np.ones(8, dtype=np.float32)
+
+    async def gather_sources(sources, results, deadline=None):
+        for source in sources.values():
+            source.close()
+        results["local_db_results"].update(local_results)
+        results["public_db_results"].update(public_results)
+
+    async def generate_answer(question, results, priority=0):
+        return answer
+
+    engine.vector_store_manager.embedding_service.encode = encode
+    engine._gather_sources = gather_sources
+    engine._generate_answer = generate_answer
+    return engine
+
+
+def _query_twice(engine: RAGEngine) -> bool:
+    """同一问题查询两次，返回第二次是否命中语义缓存"""
+    async def run():
+        await engine.query("BRAF V600E 的临床意义")
+        second = await engine.query("BRAF V600E 的临床意义")
+        return second["cache_hit"]
+
+    return asyncio.run(run())
+
+
+def test_successful_result_is_cached():
+    """检索和生成均成功的结果写入缓存"""
+    engine = _make_engine({"db": [{"content": "ok"}]}, {"PubMed": {"results": []}}, "答案")
+    assert _query_twice(engine)
+
+
+def test_generation_error_not_cached():
+    """生成失败的结果不写入缓存"""
+    engine = _make_engine({"db": [{"content": "ok"}]}, {}, f"{GENERATION_ERROR_PREFIX}: 超时")
+    assert not _query_twice(engine)
+
+
+def test_local_source_error_not_cached():
+    """本地数据库检索出错的结果不写入缓存"""
+    engine = _make_engine({"db": [{"error": "连接失败"}]}, {}, "答案")
+    assert not _query_twice(engine)
+
+
+def test_public_source_error_not_cached():
+    """公共数据库检索出错的结果不写入缓存"""
+    engine = _make_engine({"db": [{"content": "ok"}]}, {"PubMed": {"error": "429"}}, "答案")
+    assert not _query_twice(engine)
+
+
+if __name__ == "__main__":
+    tests = [
+        test_successful_result_is_cached,
+        test_generation_error_not_cached,
+        test_local_source_error_not_cached,
+        test_public_source_error_not_cached,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__doc__}")
+        except AssertionError:
+            failed += 1
+            print(f"✗ {test.__doc__}")
+    print(f"\n总计: {len(tests) - failed}/{len(tests)} 测试通过")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,140 @@
+"""
+流式top k检索测试脚本（不启动服务，不访问网络）
+验证逐页并入top k堆的结果与对全部记录打分后完整排序的结果一致
+"""
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import zlib
+from pathlib import Path
+
+import httpx
+import numpy as np
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+_TMP_DIR = tempfile.mkdtemp()
+os.environ.setdefault("EMBEDDING_CACHE_DIR", os.path.join(_TMP_DIR, "embeddings"))
+os.environ.setdefault("HTTP_CACHE_PATH", os.path.join(_TMP_DIR, "http_cache.db"))
+
+from src.config.database_manager import LocalDatabase
+from src.rag.local_db_client import LocalDatabaseClient
+
+DIM = 16
+
+
+def _embed(text: str) -> np.ndarray:
+    """由文本哈希决定的确定性向量"""
+    return np.random.default_rng(zlib.crc32(text.encode("utf-8"))).normal(size=DIM).astype(np.float32)
+
+
+class _FakeEmbeddings:
+    """确定性嵌入（代替句向量模型）"""
+
+    model_name = "test-stream"
+
+    async def encode(self, texts):
+        if isinstance(texts, str):
+            return _embed(texts)
+        return np.stack([_embed(text) for text in texts])
+
+
+def _records(n: int) -> list:
+    return [
+        {"id": i, "content": f"记录{i} {'BRAF' if i % 3 else 'KRAS'} 变异"}
+        for i in range(n)
+    ]
+
+
+def _stream(records: list, queries: np.ndarray, k: int, page_size: int, prefilter_terms=None):
+    """在模拟的分页API上执行stream_top_k，返回(结果, 请求的页数)"""
+    pages = []
+
+    def handler(request):
+        option = json.loads(request.content)["filterOption"]
+        pages.append(option["page"])
+        skip, limit = option["skip"], option["limit"]
+        return httpx.Response(200, json={"results": records[skip:skip + limit]})
+
+    async def run():
+        client = LocalDatabaseClient(_FakeEmbeddings())
+        client.http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        db_config = LocalDatabase(
+            name="stream", type="http_api", base_url="http://biobank.test", database_id="wf1",
+            token="t", mirror=False, page_size=page_size, fetch_concurrency=3
+        )
+        results = await client.stream_top_k(db_config, queries, k, prefilter_terms)
+        await client.http_client.aclose()
+        return results
+
+    return asyncio.run(run()), pages
+
+
+def _full_sort(records: list, queries: np.ndarray, k: int) -> list:
+    """对全部记录计算余弦相似度后完整排序，返回每个查询top k的(id, 得分)"""
+    vectors = np.stack([_embed(record["content"]) for record in records])
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-8
+    queries = queries / (np.linalg.norm(queries, axis=1, keepdims=True) + 1e-8)
+    expected = []
+    for scores in queries @ vectors.T:
+        order = np.argsort(-scores, kind="stable")[:k]
+        expected.append([(records[i]["id"], float(scores[i])) for i in order])
+    return expected
+
+
+def _check(results: list, expected: list) -> None:
+    assert len(results) == len(expected)
+    for result, top_k in zip(results, expected):
+        assert [item["metadata"]["id"] for item in result] == [item_id for item_id, _ in top_k]
+        assert np.allclose([item["score"] for item in result], [score for _, score in top_k], atol=1e-5)
+
+
+def test_stream_top_k_matches_full_sort():
+    """多页（含不满一页的末页）流式检索的top k与完整排序一致"""
+    records = _records(1037)
+    queries = np.random.default_rng(7).normal(size=(4, DIM)).astype(np.float32)
+    results, pages = _stream(records, queries, 10, page_size=100)
+    _check(results, _full_sort(records, queries, 10))
+    assert sorted(set(pages)) == list(range(1, 13))
+
+
+def test_stream_top_k_page_boundaries():
+    """记录数恰为页大小的整数倍、k大于记录数时结果仍与完整排序一致"""
+    queries = np.random.default_rng(8).normal(size=(2, DIM)).astype(np.float32)
+    records = _records(300)
+    results, _ = _stream(records, queries, 25, page_size=50)
+    _check(results, _full_sort(records, queries, 25))
+
+    records = _records(7)
+    results, _ = _stream(records, queries, 10, page_size=50)
+    _check(results, _full_sort(records, queries, 10))
+
+
+def test_stream_top_k_with_prefilter():
+    """启用词法预过滤时与只对包含查询记号的记录完整排序一致"""
+    records = _records(640)
+    queries = np.random.default_rng(9).normal(size=(3, DIM)).astype(np.float32)
+    results, _ = _stream(records, queries, 10, page_size=64, prefilter_terms={"kras"})
+    kras = [record for record in records if "KRAS" in record["content"]]
+    _check(results, _full_sort(kras, queries, 10))
+
+
+if __name__ == "__main__":
+    tests = [
+        test_stream_top_k_matches_full_sort,
+        test_stream_top_k_page_boundaries,
+        test_stream_top_k_with_prefilter,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__doc__}")
+        except AssertionError:
+            failed += 1
+            print(f"✗ {test.__doc__}")
+    print(f"\n总计: {len(tests) - failed}/{len(tests)} 测试通过")
+    sys.exit(1 if failed else 0)
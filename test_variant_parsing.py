@@ -0,0 +1,129 @@
+"""
+变异解析和变异索引测试脚本（不启动服务，不访问网络）
+验证与中文相邻的变异记号能被识别，完整等位基因查询只返回精确匹配，
+以及精确命中的得分尺度和不足k条时的补足
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+from src.config.database_manager import LocalDatabase
+from src.rag.vector_store import VectorStoreManager
+from src.rag.variant_index import VariantIndex, parse_variants, record_variants
+
+
+def _keys(text: str):
+    return [variant.key for variant in parse_variants(text)]
+
+
+def test_protein_change_next_to_chinese():
+    """蛋白改变与中文相邻时能被识别"""
+    assert _keys("解释BRAF V600E突变") == ["BRAF:p.V600E"]
+    assert _keys("BRAF V600E和BRAF V600K的区别") == ["BRAF:p.V600E", "BRAF:p.V600K"]
+
+
+def test_rsid_next_to_chinese():
+    """rsID与中文相邻时能被识别"""
+    assert _keys("请解释rs121913529的意义") == ["rs121913529"]
+
+
+def test_genomic_coordinate_next_to_chinese():
+    """染色体坐标与中文相邻时能被识别"""
+    variants = parse_variants("突变chr7:140453136A>T")
+    assert [variant.key for variant in variants] == ["7:140453136:A>T"]
+    assert (variants[0].chrom, variants[0].start) == ("7", 140453136)
+
+
+def test_cdna_change_next_to_chinese():
+    """cDNA改变与中文相邻时能被识别"""
+    assert _keys("TP53基因c.215C>G位点") == [None]
+    assert _keys("查询TP53 c.215C>G的频率") == ["TP53:c.215C>G"]
+
+
+def test_ascii_boundaries_still_apply():
+    """英文单词内部的片段不被识别为变异记号"""
+    assert _keys("hrs1234 and 17:30") == []
+
+
+def test_full_allele_lookup_is_exact():
+    """给出完整参考/替代碱基的坐标查询不返回同一位置的其他等位基因"""
+    index = VariantIndex()
+    index.add([
+        record_variants("", {"chrom": "7", "pos": 140453136, "ref": "A", "alt": "T"}),
+        record_variants("", {"chrom": "7", "pos": 140453136, "ref": "A", "alt": "G"}),
+        record_variants("", {"chrom": "7", "pos": 140453100}),
+    ])
+    assert index.lookup(parse_variants("chr7:140453136A>T"), 10) == [0]
+    assert index.lookup(parse_variants("chr7:140453136A>C"), 10) == []
+    # 只有坐标的查询仍按区间查找（离查询起点越近越靠前）
+    assert index.lookup(parse_variants("chr7:140453100-140453136"), 10) == [2, 0, 1]
+
+
+def _manager_with_results(hits, ranked):
+    """构建变异查找和向量检索结果固定的向量存储管理器（Chroma原生检索，score为距离）"""
+    manager = VectorStoreManager()
+    manager.local_configs["db"] = LocalDatabase(name="db", type="chroma", path="unused", hybrid_search=False)
+
+    async def variant_search(db_name, variants, k=5):
+        return [dict(hit, score=manager._exact_hit_score(db_name, fused=False)) for hit in hits]
+
+    async def vector_search(db_name, query, k=5):
+        return ranked[:k]
+
+    manager.variant_search = variant_search
+    manager._vector_search = vector_search
+    return manager
+
+
+def test_exact_hits_use_backend_scale_and_fill_to_k():
+    """精确命中按距离尺度得分0.0并排在最前，不足k条时由向量检索结果去重补足"""
+    hit = {"content": "BRAF V600E", "metadata": {"id": 1}}
+    ranked = [
+        {"content": "BRAF V600E", "metadata": {"id": 1}, "score": 0.12},
+        {"content": "BRAF V600K", "metadata": {"id": 2}, "score": 0.35},
+        {"content": "KRAS G12D", "metadata": {"id": 3}, "score": 0.8},
+    ]
+    manager = _manager_with_results([hit], ranked)
+    results = asyncio.run(manager.search_local_database("db", "BRAF V600E 的意义", 3))
+    assert [result["metadata"]["id"] for result in results] == [1, 2, 3]
+    assert [result["score"] for result in results] == [0.0, 0.35, 0.8]
+
+    batch = asyncio.run(manager.search_local_database_many(
+        "db", ["BRAF V600E 的意义"], None, 2
+    ))
+    assert [result["metadata"]["id"] for result in batch[0]] == [1, 2]
+
+
+def test_exact_hit_score_scales():
+    """索引相似度和融合得分的尺度上精确命中得分为1.0"""
+    manager = VectorStoreManager()
+    manager.http_databases["http_db"] = LocalDatabase(name="http_db", type="http_api")
+    assert manager._exact_hit_score("chroma_db", fused=False) == 0.0
+    assert manager._exact_hit_score("chroma_db", fused=True) == 1.0
+    assert manager._exact_hit_score("http_db", fused=False) == 1.0
+
+
+if __name__ == "__main__":
+    tests = [
+        test_protein_change_next_to_chinese,
+        test_rsid_next_to_chinese,
+        test_genomic_coordinate_next_to_chinese,
+        test_cdna_change_next_to_chinese,
+        test_ascii_boundaries_still_apply,
+        test_full_allele_lookup_is_exact,
+        test_exact_hits_use_backend_scale_and_fill_to_k,
+        test_exact_hit_score_scales,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__doc__}")
+        except AssertionError:
+            failed += 1
+            print(f"✗ {test.__doc__}")
+    print(f"\n总计: {len(tests) - failed}/{len(tests)} 测试通过")
+    sys.exit(1 if failed else 0)